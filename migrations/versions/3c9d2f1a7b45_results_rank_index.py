@@ -0,0 +1,26 @@
+"""results rank index
+
+Revision ID: 3c9d2f1a7b45
+Revises: 11b7453a0f23
+Create Date: 2026-10-18 09:12:30.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2f1a7b45'
+down_revision: Union[str, None] = '11b7453a0f23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_results_rank', 'results', ['discipline_id', 'average_dnf', 'average_time', 'best_time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_results_rank', table_name='results')
@@ -0,0 +1,50 @@
+"""results competition and user
+
+Revision ID: 5f0a93c1e8d7
+Revises: 8e41b6c0d2a9
+Create Date: 2026-10-18 11:21:03.574410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0a93c1e8d7'
+down_revision: Union[str, None] = '8e41b6c0d2a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('results', sa.Column('competition_id', sa.Integer(), nullable=True))
+    op.add_column('results', sa.Column('user_id', sa.Integer(), nullable=True))
+
+    # backfill from the owning participant, then enforce
+    results = sa.table('results', sa.column('participant_id'), sa.column('competition_id'), sa.column('user_id'))
+    participants = sa.table('participants', sa.column('id'), sa.column('competition_id'), sa.column('user_id'))
+    op.execute(
+        results.update()
+        .where(participants.c.id == results.c.participant_id)
+        .values(competition_id=participants.c.competition_id, user_id=participants.c.user_id)
+    )
+    op.alter_column('results', 'competition_id', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('results', 'user_id', existing_type=sa.Integer(), nullable=False)
+    op.create_foreign_key('results_competition_id_fkey', 'results', 'competitions', ['competition_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('results_user_id_fkey', 'results', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+
+    op.drop_index('ix_results_rank', table_name='results')
+    op.create_index('ix_results_comp_disc_rank', 'results',
+                    ['competition_id', 'discipline_id', 'average_dnf', 'average_time', 'best_time', 'user_id'], unique=False,
+                    postgresql_include=['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_results_comp_disc_rank', table_name='results')
+    op.create_index('ix_results_rank', 'results', ['discipline_id', 'average_dnf', 'average_time', 'best_time', 'participant_id'], unique=False)
+    op.drop_constraint('results_user_id_fkey', 'results', type_='foreignkey')
+    op.drop_constraint('results_competition_id_fkey', 'results', type_='foreignkey')
+    op.drop_column('results', 'user_id')
+    op.drop_column('results', 'competition_id')
@@ -0,0 +1,48 @@
+"""covering leaderboard indexes
+
+Revision ID: 8e41b6c0d2a9
+Revises: 3c9d2f1a7b45
+Create Date: 2026-10-18 10:05:47.362915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41b6c0d2a9'
+down_revision: Union[str, None] = '3c9d2f1a7b45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_results_participant_discipline', table_name='results')
+    op.create_index('ix_results_participant_discipline', 'results', ['participant_id', 'discipline_id'], unique=False,
+                    postgresql_include=['average_time', 'average_dnf', 'best_time', 'updated_at'])
+    op.drop_index('ix_results_rank', table_name='results')
+    op.create_index('ix_results_rank', 'results', ['discipline_id', 'average_dnf', 'average_time', 'best_time', 'participant_id'], unique=False)
+
+    op.drop_index('ix_leaderboards_comp_disc', table_name='leaderboards')
+    op.create_index('ix_leaderboards_comp_disc_order', 'leaderboards', ['competition_id', 'discipline_id', 'average_dnf', 'position', 'user_id'], unique=False)
+    op.create_index('ix_leaderboards_comp_user', 'leaderboards', ['competition_id', 'user_id'], unique=False,
+                    postgresql_include=['points'])
+
+    op.drop_index('ix_overall_competition', table_name='overall_leaderboard')
+    op.create_index('ix_overall_comp_position', 'overall_leaderboard', ['competition_id', 'position', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_overall_comp_position', table_name='overall_leaderboard')
+    op.create_index('ix_overall_competition', 'overall_leaderboard', ['competition_id'], unique=False)
+
+    op.drop_index('ix_leaderboards_comp_user', table_name='leaderboards')
+    op.drop_index('ix_leaderboards_comp_disc_order', table_name='leaderboards')
+    op.create_index('ix_leaderboards_comp_disc', 'leaderboards', ['competition_id', 'discipline_id'], unique=False)
+
+    op.drop_index('ix_results_rank', table_name='results')
+    op.create_index('ix_results_rank', 'results', ['discipline_id', 'average_dnf', 'average_time', 'best_time'], unique=False)
+    op.drop_index('ix_results_participant_discipline', table_name='results')
+    op.create_index('ix_results_participant_discipline', 'results', ['participant_id', 'discipline_id'], unique=False)
@@ -0,0 +1,55 @@
+"""packed result attempts
+
+Revision ID: a7d35e2b9c10
+Revises: 5f0a93c1e8d7
+Create Date: 2026-10-18 12:40:16.930271
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d35e2b9c10'
+down_revision: Union[str, None] = '5f0a93c1e8d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _slot(i: int) -> str:
+    # one attempt as 4 big-endian bytes, DNF as -1 (src.database.types.pack_attempts)
+    return f"int4send(CASE WHEN attempt_{i}_dnf OR attempt_{i}_time IS NULL THEN -1 ELSE attempt_{i}_time END)"
+
+
+def upgrade() -> None:
+    op.add_column('results', sa.Column('attempts', sa.LargeBinary(), nullable=True))
+    # the five old slots, cut to the discipline's attempts count
+    op.execute(
+        "UPDATE results SET attempts = substring("
+        + " || ".join(_slot(i) for i in range(1, 6))
+        + " FROM 1 FOR 4 * disciplines.attempts_count) "
+        "FROM disciplines WHERE disciplines.id = results.discipline_id"
+    )
+    op.alter_column('results', 'attempts', existing_type=sa.LargeBinary(), nullable=False)
+    op.drop_constraint('ck_result_attempt_1_time_non_negative', 'results', type_='check')
+    for i in range(1, 6):
+        op.drop_column('results', f'attempt_{i}_time')
+        op.drop_column('results', f'attempt_{i}_dnf')
+
+
+def downgrade() -> None:
+    for i in range(1, 6):
+        op.add_column('results', sa.Column(f'attempt_{i}_time', sa.Integer(), nullable=True))
+        op.add_column('results', sa.Column(f'attempt_{i}_dnf', sa.Boolean(), server_default=sa.true(), nullable=False))
+    for i in range(1, 6):
+        # missing slots (formats with fewer attempts) stay DNF, as before
+        value = f"('x' || encode(substring(attempts FROM {4 * i - 3} FOR 4), 'hex'))::bit(32)::integer"
+        op.execute(
+            f"UPDATE results SET attempt_{i}_time = NULLIF({value}, -1), attempt_{i}_dnf = ({value} = -1) "
+            f"WHERE length(attempts) >= {4 * i}"
+        )
+        op.alter_column('results', f'attempt_{i}_dnf', server_default=None)
+    op.create_check_constraint('ck_result_attempt_1_time_non_negative', 'results', 'attempt_1_time >= 0 OR attempt_1_time IS NULL')
+    op.drop_column('results', 'attempts')
@@ -0,0 +1,42 @@
+"""leaderboard subscriptions
+
+Revision ID: c52e8a4f1d36
+Revises: a7d35e2b9c10
+Create Date: 2026-10-18 15:02:47.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52e8a4f1d36'
+down_revision: Union[str, None] = 'a7d35e2b9c10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('leaderboard_subscriptions',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('competition_id', sa.Integer(), nullable=False),
+    sa.Column('discipline_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('chat_id', sa.BigInteger(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('text_hash', sa.String(length=40), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['competition_id'], ['competitions.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['discipline_id'], ['disciplines.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('chat_id', 'competition_id', 'discipline_id', name='uq_subscription_chat')
+    )
+    op.create_index('ix_subscriptions_comp_disc', 'leaderboard_subscriptions', ['competition_id', 'discipline_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subscriptions_comp_disc', table_name='leaderboard_subscriptions')
+    op.drop_table('leaderboard_subscriptions')
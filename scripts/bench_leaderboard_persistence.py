@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+
+# Settings are read at import time; the benchmark brings its own database
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from sqlalchemy import delete, insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import Base, Competition, Discipline, Leaderboard, Participant, Result, User  # noqa: E402
+from src.services.leaderboard_service import calculate_discipline_leaderboard  # noqa: E402
+
+
+async def seed(session: AsyncSession, entries: int) -> tuple[int, int]:
+	rng = random.Random(0)
+	await session.execute(insert(User), [
+		{"id": i, "telegram_id": 10**6 + i, "first_name": f"User{i}", "last_name": "Bench"} for i in range(1, entries + 1)
+	])
+	session.add(Competition(id=1, name="Bench", competition_code="BENCH001", organizer_id=1, status="active"))
+	session.add(Discipline(id=1, name="3x3", code="3x3", attempts_count=5, average_calculation_type="ao5", dnf_threshold=2))
+	await session.flush()
+	await session.execute(insert(Participant), [
+		{"id": i, "competition_id": 1, "user_id": i} for i in range(1, entries + 1)
+	])
+	results = []
+	for i in range(1, entries + 1):
+		dnf = rng.random() < 0.05
+		avg = None if dnf else rng.randint(5000, 60000)
+		results.append({
+			"participant_id": i, "discipline_id": 1, "competition_id": 1, "user_id": i,
+			"average_time": avg, "average_dnf": dnf, "best_time": avg and avg - 500,
+		})
+	await session.execute(insert(Result), results)
+	await session.commit()
+	return 1, 1
+
+
+async def store_per_row(session: AsyncSession, competition_id: int, discipline_id: int) -> int:
+	# persistence as it was before the bulk path: DELETE, then one ORM object per row
+	items = await calculate_discipline_leaderboard(session, competition_id, discipline_id, store=False)
+	await session.execute(
+		delete(Leaderboard).where(Leaderboard.competition_id == competition_id, Leaderboard.discipline_id == discipline_id)
+	)
+	for it in items:
+		session.add(Leaderboard(
+			competition_id=competition_id,
+			discipline_id=discipline_id,
+			user_id=it["user_id"],
+			position=it["position"] or 0,
+			average_time=it["average_time"],
+			average_dnf=it["average_dnf"],
+			best_time=it["best_time"],
+			points=it["points"],
+		))
+	await session.flush()
+	return len(items)
+
+
+async def store_bulk(session: AsyncSession, competition_id: int, discipline_id: int) -> int:
+	return len(await calculate_discipline_leaderboard(session, competition_id, discipline_id, store=True))
+
+
+async def measure(sessionmaker, fn, competition_id: int, discipline_id: int, repeat: int) -> float:
+	best = float("inf")
+	for _ in range(repeat):
+		async with sessionmaker() as session:
+			started = time.perf_counter()
+			rows = await fn(session, competition_id, discipline_id)
+			await session.commit()
+			best = min(best, time.perf_counter() - started)
+	return rows / best
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description="Leaderboard persistence throughput, per-row ORM vs bulk upsert")
+	parser.add_argument("--url", default="sqlite+aiosqlite://", help="empty database to run against")
+	parser.add_argument("--entries", type=int, default=10_000)
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+
+	engine = create_async_engine(args.url)
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.drop_all)
+		await conn.run_sync(Base.metadata.create_all)
+	sessionmaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+	async with sessionmaker() as session:
+		competition_id, discipline_id = await seed(session, args.entries)
+
+	# both variants include reading and ranking the results
+	before = await measure(sessionmaker, store_per_row, competition_id, discipline_id, args.repeat)
+	after = await measure(sessionmaker, store_bulk, competition_id, discipline_id, args.repeat)
+	print(f"entries: {args.entries}")
+	print(f"per-row session.add: {before:,.0f} rows/s")
+	print(f"bulk upsert:         {after:,.0f} rows/s ({after / before:.1f}x)")
+	await engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import Any, Awaitable, Callable, List
+
+# Settings are read at import time; the benchmark brings its own database
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from aiogram.fsm.context import FSMContext  # noqa: E402
+from aiogram.fsm.storage.base import StorageKey  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.bot.handlers.results_handlers import enter_results, my_position, my_results  # noqa: E402
+from src.database.models import Base, Competition, CompetitionDiscipline, Discipline, Participant, Result, User  # noqa: E402
+from src.services.leaderboard_service import calculate_discipline_leaderboard  # noqa: E402
+
+CODE = "BENCH001"
+
+
+class FakeUser:
+	def __init__(self, telegram_id: int) -> None:
+		self.id = telegram_id
+		self.username = None
+
+
+class FakeMessage:
+	# what the result handlers read from a Message; replies are dropped
+	def __init__(self, telegram_id: int, text: str) -> None:
+		self.from_user = FakeUser(telegram_id)
+		self.text = text
+		self.replies: List[str] = []
+
+	async def answer(self, text: str, **kwargs: Any) -> None:
+		self.replies.append(text)
+
+
+async def seed(session: AsyncSession, competitors: int) -> None:
+	rng = random.Random(0)
+	await session.execute(insert(User), [
+		{"id": i, "telegram_id": 10**6 + i, "first_name": f"User{i}", "last_name": "Bench"} for i in range(1, competitors + 1)
+	])
+	session.add(Competition(id=1, name="Bench", competition_code=CODE, organizer_id=1, status="active"))
+	session.add(Discipline(id=1, name="3x3", code="3x3", attempts_count=5, average_calculation_type="ao5", dnf_threshold=2))
+	await session.flush()
+	session.add(CompetitionDiscipline(competition_id=1, discipline_id=1))
+	await session.execute(insert(Participant), [
+		{"id": i, "competition_id": 1, "user_id": i} for i in range(1, competitors + 1)
+	])
+	rows = []
+	for i in range(1, competitors + 1):
+		avg = rng.randint(5000, 60000)
+		rows.append({
+			"participant_id": i, "discipline_id": 1, "competition_id": 1, "user_id": i,
+			"attempts": [avg] * 5, "average_time": avg, "average_dnf": False, "best_time": avg,
+		})
+	await session.execute(insert(Result), rows)
+	await calculate_discipline_leaderboard(session, 1, 1)
+	await session.commit()
+
+
+async def measure(sessionmaker: async_sessionmaker[AsyncSession], call: Callable[[AsyncSession], Awaitable[Any]], repeat: int) -> List[float]:
+	# one session per call, committed afterwards, as DbSessionMiddleware runs a handler
+	samples = []
+	for _ in range(repeat):
+		async with sessionmaker() as session:
+			started = time.perf_counter()
+			await call(session)
+			if session.in_transaction():
+				await session.commit()
+			samples.append(time.perf_counter() - started)
+	return samples
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description="Latency of the result handlers, database work included")
+	parser.add_argument("--url", default="sqlite+aiosqlite://", help="empty database to run against")
+	parser.add_argument("--competitors", type=int, default=1000)
+	parser.add_argument("--repeat", type=int, default=500)
+	args = parser.parse_args()
+
+	engine = create_async_engine(args.url)
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.drop_all)
+		await conn.run_sync(Base.metadata.create_all)
+	sessionmaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+	async with sessionmaker() as session:
+		await seed(session, args.competitors)
+
+	rng = random.Random(1)
+	storage = MemoryStorage()
+
+	async def submit(session: AsyncSession) -> None:
+		telegram_id = 10**6 + rng.randint(1, args.competitors)
+		state = FSMContext(storage, StorageKey(bot_id=1, chat_id=telegram_id, user_id=telegram_id))
+		await state.set_data({"discipline_attempts": 5, "calc_type": "ao5", "discipline_id": 1, "code": CODE})
+		times = ", ".join(f"0.{rng.randint(10, 59)}.{rng.randint(0, 99):02d}" for _ in range(5))
+		await enter_results(FakeMessage(telegram_id, times), state, session)  # type: ignore[arg-type]
+
+	async def results(session: AsyncSession) -> None:
+		await my_results(FakeMessage(10**6 + rng.randint(1, args.competitors), f"/my_results {CODE}"), session)  # type: ignore[arg-type]
+
+	async def position(session: AsyncSession) -> None:
+		await my_position(FakeMessage(10**6 + rng.randint(1, args.competitors), f"/my_position {CODE} 3x3"), session)  # type: ignore[arg-type]
+
+	for name, call in (("enter_results", submit), ("my_results", results), ("my_position", position)):
+		samples = await measure(sessionmaker, call, args.repeat)
+		cuts = statistics.quantiles(samples, n=100)
+		print(f"{name:14} p50 {cuts[49] * 1000:7.2f} ms   p99 {cuts[98] * 1000:7.2f} ms")
+	await engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
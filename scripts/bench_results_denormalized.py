@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+
+# Settings are read at import time; the benchmark brings its own database
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from sqlalchemy import and_, func, insert, or_, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from src.database.models import Base, Competition, Discipline, Participant, Result, User  # noqa: E402
+from src.services.leaderboard_service import get_discipline_rank  # noqa: E402
+
+
+async def seed(session: AsyncSession, competitions: int, disciplines: int, competitors: int) -> None:
+	# every competitor of every competition has a result in every discipline
+	rng = random.Random(0)
+	await session.execute(insert(User), [
+		{"id": i, "telegram_id": 10**6 + i, "first_name": f"User{i}", "last_name": "Bench"} for i in range(1, competitors + 1)
+	])
+	await session.execute(insert(Competition), [
+		{"id": c, "name": f"Bench {c}", "competition_code": f"BENCH{c:03d}", "organizer_id": 1, "status": "active"}
+		for c in range(1, competitions + 1)
+	])
+	await session.execute(insert(Discipline), [
+		{"id": d, "name": f"D{d}", "code": f"d{d}", "attempts_count": 5, "average_calculation_type": "ao5", "dnf_threshold": 2}
+		for d in range(1, disciplines + 1)
+	])
+	participants = [
+		{"id": (c - 1) * competitors + u, "competition_id": c, "user_id": u}
+		for c in range(1, competitions + 1) for u in range(1, competitors + 1)
+	]
+	await session.execute(insert(Participant), participants)
+	for d in range(1, disciplines + 1):
+		rows = []
+		for p in participants:
+			dnf = rng.random() < 0.05
+			avg = None if dnf else rng.randint(5000, 60000)
+			rows.append({
+				"participant_id": p["id"], "discipline_id": d, "competition_id": p["competition_id"], "user_id": p["user_id"],
+				"average_time": avg, "average_dnf": dnf, "best_time": avg and avg - 500,
+			})
+		await session.execute(insert(Result), rows)
+	await session.commit()
+
+
+async def leaderboard_via_join(session: AsyncSession, competition_id: int, discipline_id: int) -> int:
+	# the read as it was before results carried competition_id and user_id
+	rows = await session.execute(
+		select(User.id, User.first_name, User.last_name, Result.average_time, Result.average_dnf, Result.best_time)
+		.join(Participant, Participant.user_id == User.id)
+		.join(Result, Result.participant_id == Participant.id)
+		.where(Participant.competition_id == competition_id, Result.discipline_id == discipline_id)
+	)
+	return len(rows.all())
+
+
+async def leaderboard_single_table(session: AsyncSession, competition_id: int, discipline_id: int) -> int:
+	# the read calculate_discipline_leaderboard runs now; both variants leave ranking out
+	rows = await session.execute(
+		select(User.id, User.first_name, User.last_name, Result.average_time, Result.average_dnf, Result.best_time)
+		.join(Result, Result.user_id == User.id)
+		.where(Result.competition_id == competition_id, Result.discipline_id == discipline_id)
+	)
+	return len(rows.all())
+
+
+async def rank_via_join(session: AsyncSession, competition_id: int, discipline_id: int, user_id: int) -> int:
+	mine = (await session.execute(
+		select(Result.average_time, Result.best_time)
+		.join(Participant, Participant.id == Result.participant_id)
+		.where(Participant.competition_id == competition_id, Participant.user_id == user_id, Result.discipline_id == discipline_id)
+	)).one()
+	ahead = await session.scalar(
+		select(func.count())
+		.select_from(Result)
+		.join(Participant, Participant.id == Result.participant_id)
+		.where(
+			Participant.competition_id == competition_id,
+			Result.discipline_id == discipline_id,
+			Result.average_dnf.is_(False),
+			or_(
+				Result.average_time < mine.average_time,
+				and_(Result.average_time == mine.average_time, Result.best_time < mine.best_time),
+			),
+		)
+	)
+	return ahead + 1
+
+
+async def measure(sessionmaker, fn, *args, repeat: int) -> float:
+	best = float("inf")
+	async with sessionmaker() as session:
+		for _ in range(repeat):
+			started = time.perf_counter()
+			await fn(session, *args)
+			best = min(best, time.perf_counter() - started)
+	return best * 1000
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description="Per-competition reads of results: participants join vs denormalized columns")
+	parser.add_argument("--url", default="sqlite+aiosqlite://", help="empty database to run against")
+	parser.add_argument("--competitions", type=int, default=20)
+	parser.add_argument("--disciplines", type=int, default=5)
+	parser.add_argument("--competitors", type=int, default=1000)
+	parser.add_argument("--repeat", type=int, default=5)
+	args = parser.parse_args()
+
+	engine = create_async_engine(args.url)
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.drop_all)
+		await conn.run_sync(Base.metadata.create_all)
+	sessionmaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+	async with sessionmaker() as session:
+		await seed(session, args.competitions, args.disciplines, args.competitors)
+		async with engine.connect() as conn:
+			await conn.exec_driver_sql("ANALYZE")
+
+	competition_id, discipline_id, user_id = args.competitions // 2 or 1, 1, args.competitors // 2 or 1
+	total = args.competitions * args.disciplines * args.competitors
+	print(f"results: {total:,} ({args.competitors:,} per leaderboard)")
+	for label, before_fn, after_fn, extra in (
+		("leaderboard read", leaderboard_via_join, leaderboard_single_table, ()),
+		("rank lookup", rank_via_join, get_discipline_rank, (user_id,)),
+	):
+		before = await measure(sessionmaker, before_fn, competition_id, discipline_id, *extra, repeat=args.repeat)
+		after = await measure(sessionmaker, after_fn, competition_id, discipline_id, *extra, repeat=args.repeat)
+		print(f"{label + ':':18} join {before:8.2f} ms   single table {after:8.2f} ms ({before / after:.1f}x)")
+	await engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
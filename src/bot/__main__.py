@@ -1,35 +1,28 @@
 import asyncio
-from aiogram import Bot, Dispatcher
 from loguru import logger
 
 from src.config.settings import settings
-from src.bot.handlers.start import router as start_router
-from src.bot.handlers.organizer_handlers import router as organizer_router
-from src.bot.handlers.participant_handlers import router as participant_router
-from src.bot.handlers.results_handlers import router as results_router
-from src.bot.handlers.competition_handlers import router as competition_router
-
-
-dp = Dispatcher()
-
-dp.include_router(start_router)
-
-dp.include_router(organizer_router)
-
-dp.include_router(participant_router)
-
-dp.include_router(results_router)
-
-dp.include_router(competition_router)
+from src.bot.dispatcher import create_bot, dp
+from src.bot.update_pool import UpdatePool
+from src.bot.webhook import run_webhook
+from src.bot.workers import run_sharded
+from src.storage.redis_pool import close_redis
 
 
 async def main() -> None:
 	logger.remove()
 	logger.add(lambda msg: print(msg, end=""), level=settings.log_level)
-	bot = Bot(token=settings.bot_token)
-	await dp.start_polling(bot)
+	bot = create_bot()
+	try:
+		if settings.bot_processes > 0:
+			await run_sharded(dp, bot)
+		elif settings.bot_mode == "webhook":
+			await run_webhook(dp, bot, UpdatePool(dp, bot, settings.update_workers, settings.shutdown_timeout))
+		else:
+			await dp.start_polling(bot)
+	finally:
+		await close_redis()
 
 
 if __name__ == "__main__":
 	asyncio.run(main())
-
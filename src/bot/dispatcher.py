@@ -0,0 +1,89 @@
+import asyncio
+from functools import partial
+from typing import List
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from src.config.settings import settings
+from src.database.database import AsyncSessionLocal, engine, log_pool_stats
+from src.bot.middlewares.db_session import DbSessionMiddleware
+from src.bot.send_scheduler import SendScheduler
+from src.storage.fsm_storage import create_fsm_storage
+from src.bot.handlers.start import router as start_router
+from src.bot.handlers.organizer_handlers import router as organizer_router
+from src.bot.handlers.participant_handlers import router as participant_router
+from src.bot.handlers.results_handlers import router as results_router
+from src.bot.handlers.competition_handlers import router as competition_router
+from src.services.follow_service import push_leaderboard_updates
+from src.services.leaderboard_worker import leaderboard_worker
+
+
+# Built once per process: routers can only be attached to a single dispatcher
+dp = Dispatcher(storage=create_fsm_storage())
+
+# inner middlewares: they see the matched handler and reach the routers included below
+dp.message.middleware(DbSessionMiddleware(AsyncSessionLocal))
+dp.callback_query.middleware(DbSessionMiddleware(AsyncSessionLocal))
+
+dp.include_router(start_router)
+
+dp.include_router(organizer_router)
+
+dp.include_router(participant_router)
+
+dp.include_router(results_router)
+
+dp.include_router(competition_router)
+
+_background: List[asyncio.Task] = []
+
+
+@dp.startup()
+async def on_startup(bot: Bot, shard: int = 0) -> None:
+	if settings.db_pool_stats_interval > 0:
+		_background.append(asyncio.create_task(log_pool_stats(settings.db_pool_stats_interval)))
+	if settings.leaderboard_recompute_interval <= 0:
+		return
+	if shard:
+		# one worker process recalculates for all of them, or shards would race on the same rows
+		leaderboard_worker.defer_to_remote()
+		return
+	# followed tables are pushed to their chats after each recalculation
+	leaderboard_worker.start(
+		AsyncSessionLocal,
+		settings.leaderboard_recompute_interval,
+		listeners=[partial(push_leaderboard_updates, bot)],
+		poll=settings.bot_processes > 0,
+	)
+
+
+@dp.shutdown()
+async def on_shutdown() -> None:
+	for task in _background:
+		task.cancel()
+	_background.clear()
+	await leaderboard_worker.stop()
+	await engine.dispose()
+
+
+def create_bot() -> Bot:
+	if settings.telegram_api_url:
+		session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+	else:
+		session = AiohttpSession()
+	bot = Bot(token=settings.bot_token, session=session)
+	bot.session.middleware(create_send_scheduler())
+	return bot
+
+
+def create_send_scheduler() -> SendScheduler:
+	# worker processes each pace their own sends, so they split the bot-wide rate
+	return SendScheduler(
+		rate=settings.send_rate / max(1, settings.bot_processes),
+		chat_rate=settings.send_chat_rate,
+		chat_burst=settings.send_chat_burst,
+		group_rate=settings.send_group_rate,
+		max_retries=settings.send_max_retries,
+	)
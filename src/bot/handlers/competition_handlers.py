@@ -1,54 +1,193 @@
-from aiogram import Router
+from typing import Optional, Tuple
+
+from aiogram import F, Router
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.database import get_session
+from src.bot.keyboards.inline_keyboards import pagination_kb
+from src.config.settings import settings
 from src.database.crud import discipline as discipline_crud
 from src.database.crud import competition as competition_crud
+from src.database.crud import subscription as subscription_crud
+from src.database.crud import user as user_crud
+from src.services.follow_service import render_followed_page, text_hash
 from src.services.leaderboard_service import (
-	calculate_discipline_leaderboard,
+	get_discipline_leaderboard_page,
 	format_leaderboard_message,
-	calculate_overall_leaderboard,
+	get_overall_leaderboard_page,
 	format_overall_message,
+	page_count,
 )
+from src.services.leaderboard_worker import leaderboard_worker
 
 router = Router()
 
 
 @router.message(Command("leaderboard"))
-async def leaderboard(message: Message) -> None:
+async def leaderboard(message: Message, session: AsyncSession) -> None:
 	parts = (message.text or "").split()
 	if len(parts) < 3:
 		await message.answer("Использование: /leaderboard <код_соревнования> <код_дисциплины>")
 		return
 	code = parts[1].strip().upper()
 	disc_code = parts[2].strip().lower()
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование не найдено.")
-			return
-		disc = (await discipline_crud.get_by_codes(session, [disc_code]))
-		if not disc:
-			await message.answer("Дисциплина не найдена.")
-			return
-		data = await calculate_discipline_leaderboard(session, comp.id, disc[0].id, store=True)
-		await session.commit()
-		await message.answer(format_leaderboard_message(data))
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	disc = (await discipline_crud.get_by_codes(session, [disc_code]))
+	if not disc:
+		await message.answer("Дисциплина не найдена.")
+		return
+	# a recomputed table is committed by the session middleware
+	text, markup = await _discipline_page(session, comp.id, disc[0].id, 0)
+	await message.answer(text, reply_markup=markup)
 
 
 @router.message(Command("overall"))
-async def overall(message: Message) -> None:
+async def overall(message: Message, session: AsyncSession) -> None:
 	parts = (message.text or "").split()
 	if len(parts) < 2:
 		await message.answer("Использование: /overall <код_соревнования>")
 		return
 	code = parts[1].strip().upper()
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование не найдено.")
-			return
-		items = await calculate_overall_leaderboard(session, comp.id, store=True)
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	text, markup = await _overall_page(session, comp.id, 0)
+	await message.answer(text, reply_markup=markup)
+
+
+@router.message(Command("follow"))
+async def follow(message: Message, session: AsyncSession) -> None:
+	# Instead of asking /leaderboard again and again: one pinned message edited after each recalculation
+	parts = (message.text or "").split()
+	if len(parts) < 3:
+		await message.answer("Использование: /follow <код_соревнования> <код_дисциплины>")
+		return
+	comp = await competition_crud.get_by_code(session, parts[1].strip().upper())
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	disc = await discipline_crud.get_by_codes(session, [parts[2].strip().lower()])
+	if not disc:
+		await message.answer("Дисциплина не найдена.")
+		return
+	u = await user_crud.get_by_telegram_id(session, message.from_user.id)  # type: ignore[union-attr]
+	user_id = u.id if u else None
+	text = await render_followed_page(session, comp.id, disc[0].id, user_id)
+	sent = await message.answer(text)
+	# pinned only once the subscription is committed: a pin nobody updates would stay frozen
+	try:
+		# following again replaces the previous message, which is unpinned below
+		previous = await subscription_crud.subscribe(
+			session, comp.id, disc[0].id, message.chat.id, sent.message_id, user_id, text_hash(text)
+		)
 		await session.commit()
-		await message.answer(format_overall_message(items))
+	except Exception:
+		try:
+			await sent.delete()
+		except TelegramAPIError:
+			pass
+		raise
+	if previous is not None:
+		await _unpin(message, previous)
+	try:
+		await sent.pin(disable_notification=True)
+	except TelegramBadRequest:
+		# no right to pin in this group: the message is still kept up to date
+		await message.answer(
+			"Таблица будет обновляться сама, но закрепить её не удалось: "
+			"дайте боту право закреплять сообщения. Отписаться: /unfollow"
+		)
+		return
+	await message.answer("Таблица закреплена и будет обновляться сама. Отписаться: /unfollow")
+
+
+@router.message(Command("unfollow"))
+async def unfollow(message: Message, session: AsyncSession) -> None:
+	parts = (message.text or "").split()
+	if len(parts) < 3:
+		await message.answer("Использование: /unfollow <код_соревнования> <код_дисциплины>")
+		return
+	comp = await competition_crud.get_by_code(session, parts[1].strip().upper())
+	disc = await discipline_crud.get_by_codes(session, [parts[2].strip().lower()])
+	message_id = await subscription_crud.unsubscribe(session, comp.id, disc[0].id, message.chat.id) if comp and disc else None
+	if message_id is None:
+		await message.answer("Подписка не найдена.")
+		return
+	await session.commit()
+	await _unpin(message, message_id)
+	await message.answer("Подписка отменена.")
+
+
+async def _unpin(message: Message, message_id: int) -> None:
+	try:
+		await message.bot.unpin_chat_message(message.chat.id, message_id=message_id)  # type: ignore[union-attr]
+	except TelegramAPIError:
+		# already unpinned or deleted, or no right to unpin
+		pass
+
+
+# Prev/next buttons carry "lb:<competition>:<discipline>:<page>" or "ov:<competition>:<page>";
+# each tap reads only the requested page and edits the message in place
+
+@router.callback_query(F.data.startswith("lb:"))
+async def leaderboard_page(callback: CallbackQuery, session: AsyncSession) -> None:
+	_, comp_id, disc_id, page = callback.data.split(":")  # type: ignore[union-attr]
+	text, markup = await _discipline_page(session, int(comp_id), int(disc_id), int(page))
+	await _show_page(callback, text, markup)
+
+
+@router.callback_query(F.data.startswith("ov:"))
+async def overall_page(callback: CallbackQuery, session: AsyncSession) -> None:
+	_, comp_id, page = callback.data.split(":")  # type: ignore[union-attr]
+	text, markup = await _overall_page(session, int(comp_id), int(page))
+	await _show_page(callback, text, markup)
+
+
+async def _discipline_page(
+	session: AsyncSession,
+	comp_id: int,
+	disc_id: int,
+	page: int,
+) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+	size = settings.leaderboard_page_size
+	# with the background worker running the stored table is served as is
+	recompute = not leaderboard_worker.active
+	items, total = await get_discipline_leaderboard_page(session, comp_id, disc_id, page, size, recompute)
+	pages = page_count(total, size)
+	if page >= pages:
+		# the table shrank since the buttons were drawn
+		page = pages - 1
+		items, total = await get_discipline_leaderboard_page(session, comp_id, disc_id, page, size, recompute)
+	return format_leaderboard_message(items, page, pages), _page_markup(f"lb:{comp_id}:{disc_id}", page, pages)
+
+
+async def _overall_page(session: AsyncSession, comp_id: int, page: int) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+	size = settings.leaderboard_page_size
+	recompute = not leaderboard_worker.active
+	items, total = await get_overall_leaderboard_page(session, comp_id, page, size, recompute)
+	pages = page_count(total, size)
+	if page >= pages:
+		page = pages - 1
+		items, total = await get_overall_leaderboard_page(session, comp_id, page, size, recompute)
+	return format_overall_message(items, page, pages), _page_markup(f"ov:{comp_id}", page, pages)
+
+
+def _page_markup(prefix: str, page: int, pages: int) -> Optional[InlineKeyboardMarkup]:
+	return pagination_kb(prefix, page, pages).as_markup() if pages > 1 else None
+
+
+async def _show_page(callback: CallbackQuery, text: str, markup: Optional[InlineKeyboardMarkup]) -> None:
+	if isinstance(callback.message, Message):
+		try:
+			await callback.message.edit_text(text, reply_markup=markup)
+		except TelegramBadRequest as e:
+			# a repeated tap on the same button renders the same page
+			if "message is not modified" not in e.message:
+				raise
+	await callback.answer()
@@ -1,66 +1,73 @@
+import csv
+import tempfile
+from pathlib import Path
+
 from aiogram import Router, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message
+from aiogram.types import FSInputFile, InputMediaDocument, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.bot.middlewares.db_session import after_commit
 from src.bot.states.competition_states import CompetitionStates
-from src.database.database import get_session
+from src.config.settings import settings
 from src.database.crud import competition as competition_crud
 from src.database.crud import discipline as discipline_crud
 from src.database.crud import user as user_crud
 from src.database.crud import scramble as scramble_crud
+from src.services import export_service, import_service
+from src.services.leaderboard_worker import leaderboard_worker
 
 router = Router()
 
 
 @router.message(Command("my_competitions"))
-async def my_competitions(message: Message) -> None:
-	async for session in get_session():
-		u = await user_crud.get_by_telegram_id(session, message.from_user.id)  # type: ignore[arg-type]
-		if not u:
-			await message.answer("У вас пока нет соревнований.")
-			return
-		rows = await competition_crud.list_by_organizer(session, u.id)
-		if not rows:
-			await message.answer("У вас пока нет соревнований.")
-			return
-		text = "Ваши соревнования:\n" + "\n".join(f"- {c.name} (код: {c.competition_code}, статус: {c.status})" for c in rows)
-		await message.answer(text)
+async def my_competitions(message: Message, session: AsyncSession) -> None:
+	u = await user_crud.get_by_telegram_id(session, message.from_user.id)  # type: ignore[arg-type]
+	if not u:
+		await message.answer("У вас пока нет соревнований.")
+		return
+	rows = await competition_crud.list_by_organizer(session, u.id)
+	if not rows:
+		await message.answer("У вас пока нет соревнований.")
+		return
+	text = "Ваши соревнования:\n" + "\n".join(f"- {c.name} (код: {c.competition_code}, статус: {c.status})" for c in rows)
+	await message.answer(text)
 
 
 @router.message(Command("add_disciplines"))
-async def add_disciplines_cmd(message: Message, state: FSMContext) -> None:
+async def add_disciplines_cmd(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	parts = (message.text or "").split(maxsplit=2)
 	if len(parts) < 3:
 		await message.answer("Использование: /add_disciplines <код_соревнования> <коды_через_запятую>")
 		return
 	code = parts[1].strip().upper()
 	codes = [c.strip().lower() for c in parts[2].split(",") if c.strip()]
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование не найдено.")
-			return
-		if comp.status == "completed":
-			await message.answer("Соревнование завершено. Добавление дисциплин недоступно.")
-			return
-		disc = await discipline_crud.get_by_codes(session, codes)
-		if not disc:
-			await message.answer("Дисциплины не распознаны.")
-			return
-		# filter out already added
-		existing = await discipline_crud.list_by_competition(session, comp.id)
-		existing_codes = {d.code.lower() for d in existing}
-		new_disciplines = [d for d in disc if d.code.lower() not in existing_codes]
-		dup_disciplines = [d for d in disc if d.code.lower() in existing_codes]
-		if dup_disciplines:
-			dup_list = ", ".join(f"{d.name} ({d.code})" for d in dup_disciplines)
-			await message.answer(f"Эти дисциплины уже добавлены и будут пропущены: {dup_list}")
-		if not new_disciplines:
-			await message.answer("Новые дисциплины для добавления не найдены.")
-			return
-		await competition_crud.add_disciplines(session, comp.id, [d.id for d in new_disciplines])
-		await session.commit()
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	if comp.status == "completed":
+		await message.answer("Соревнование завершено. Добавление дисциплин недоступно.")
+		return
+	disc = await discipline_crud.get_by_codes(session, codes)
+	if not disc:
+		await message.answer("Дисциплины не распознаны.")
+		return
+	# filter out already added
+	existing = await discipline_crud.list_by_competition(session, comp.id)
+	existing_codes = {d.code.lower() for d in existing}
+	new_disciplines = [d for d in disc if d.code.lower() not in existing_codes]
+	dup_disciplines = [d for d in disc if d.code.lower() in existing_codes]
+	if dup_disciplines:
+		dup_list = ", ".join(f"{d.name} ({d.code})" for d in dup_disciplines)
+		await message.answer(f"Эти дисциплины уже добавлены и будут пропущены: {dup_list}")
+	if not new_disciplines:
+		await message.answer("Новые дисциплины для добавления не найдены.")
+		return
+	await competition_crud.add_disciplines(session, comp.id, [d.id for d in new_disciplines])
+	await session.commit()
+	await competition_crud.invalidate_cached(comp.id)
 	# immediately start upload flow for newly added disciplines
 	d_queue = [(d.id, d.code, d.attempts_count) for d in new_disciplines]
 	await state.update_data(comp_code=comp.competition_code, comp_id=comp.id, upload_queue=d_queue, creation_flow=False)
@@ -68,20 +75,20 @@ async def add_disciplines_cmd(message: Message, state: FSMContext) -> None:
 
 
 @router.message(Command("complete_competition"))
-async def complete_competition_cmd(message: Message) -> None:
+async def complete_competition_cmd(message: Message, session: AsyncSession) -> None:
 	parts = (message.text or "").split()
 	if len(parts) < 2:
 		await message.answer("Использование: /complete_competition <код_соревнования>")
 		return
 	code = parts[1].strip().upper()
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование не найдено.")
-			return
-		await competition_crud.complete_competition(session, comp.id)
-		await session.commit()
-		await message.answer("Соревнование помечено как завершённое.")
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	await competition_crud.complete_competition(session, comp.id)
+	await session.commit()
+	await competition_crud.invalidate_cached(comp.id, comp.competition_code)
+	await message.answer("Соревнование помечено как завершённое.")
 
 
 @router.message(Command("create_competition"))
@@ -102,30 +109,30 @@ async def comp_enter_name(message: Message, state: FSMContext) -> None:
 
 
 @router.message(StateFilter(CompetitionStates.SelectDisciplines))
-async def comp_select_disciplines(message: Message, state: FSMContext) -> None:
+async def comp_select_disciplines(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	codes = [c.strip().lower() for c in message.text.split(",") if c.strip()]
 	data = await state.get_data()
 	name: str = data.get("name")
-	async for session in get_session():
-		u = await user_crud.get_by_telegram_id(session, message.from_user.id)  # type: ignore[arg-type]
-		if not u:
-			u = await user_crud.create_user(
-				session,
-				telegram_id=message.from_user.id,  # type: ignore[arg-type]
-				first_name=message.from_user.first_name or "",
-				last_name=message.from_user.last_name or "",
-				username=message.from_user.username if message.from_user else None,
-				role="organizer",
-			)
-		disciplines = await discipline_crud.get_by_codes(session, codes)
-		if not disciplines:
-			await message.answer("Не удалось распознать дисциплины. Отмена.")
-			await session.rollback()
-			await state.clear()
-			return
-		comp = await competition_crud.create_competition(session, name=name, organizer_id=u.id)
-		await competition_crud.add_disciplines(session, comp.id, [d.id for d in disciplines])
-		await session.commit()
+	u = await user_crud.get_by_telegram_id(session, message.from_user.id)  # type: ignore[arg-type]
+	if not u:
+		u = await user_crud.create_user(
+			session,
+			telegram_id=message.from_user.id,  # type: ignore[arg-type]
+			first_name=message.from_user.first_name or "",
+			last_name=message.from_user.last_name or "",
+			username=message.from_user.username if message.from_user else None,
+			role="organizer",
+		)
+	disciplines = await discipline_crud.get_by_codes(session, codes)
+	if not disciplines:
+		await message.answer("Не удалось распознать дисциплины. Отмена.")
+		await session.rollback()
+		await state.clear()
+		return
+	comp = await competition_crud.create_competition(session, name=name, organizer_id=u.id)
+	await competition_crud.add_disciplines(session, comp.id, [d.id for d in disciplines])
+	await session.commit()
+	await competition_crud.invalidate_cached(comp.id)
 	# prepare upload queue
 	d_queue = [(d.id, d.code, d.attempts_count) for d in disciplines]
 	await state.update_data(comp_code=comp.competition_code, comp_id=comp.id, upload_queue=d_queue, creation_flow=True)
@@ -154,7 +161,7 @@ async def _prompt_next_upload(message: Message, state: FSMContext) -> None:
 
 
 @router.message(StateFilter(CompetitionStates.UploadSpecificDiscipline), F.photo)
-async def comp_upload_scrambles(message: Message, state: FSMContext) -> None:
+async def comp_upload_scrambles(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	data = await state.get_data()
 	upload_queue = list(data.get("upload_queue", []))
 	comp_id: int = data["comp_id"]
@@ -180,16 +187,17 @@ async def comp_upload_scrambles(message: Message, state: FSMContext) -> None:
 			await message.answer(f"Принято {len(group['files'])}/{attempts} фото для {d_code}. Отправьте оставшиеся в этом же альбоме.")
 			return
 		# len == attempts -> save all
-		async for session in get_session():
-			# ensure no existing scrambles saved for current discipline
-			existing = await scramble_crud.list_by_competition_discipline(session, comp_id, d_id)
-			if existing:
-				await message.answer("Для этой дисциплины уже загружены скрамблы. Добавление отменено.")
-				await state.update_data(pending_group=None)
-				return
-			for idx, file_id in enumerate(group["files"], start=1):
-				await scramble_crud.upsert_scramble(session, comp_id, d_id, idx, file_id)
-			await session.commit()
+		# ensure no existing scrambles saved for current discipline
+		existing = await scramble_crud.list_by_competition_discipline(session, comp_id, d_id)
+		if existing:
+			await message.answer("Для этой дисциплины уже загружены скрамблы. Добавление отменено.")
+			await state.update_data(pending_group=None)
+			return
+		for idx, file_id in enumerate(group["files"], start=1):
+			await scramble_crud.upsert_scramble(session, comp_id, d_id, idx, file_id)
+		await session.commit()
+		files = list(group["files"])
+		after_commit(session, lambda: scramble_crud.cache_file_ids(comp_id, d_id, files))
 		await state.update_data(pending_group=None)
 		# move queue
 		upload_queue.pop(0)
@@ -201,34 +209,132 @@ async def comp_upload_scrambles(message: Message, state: FSMContext) -> None:
 	if len(photos) < 1:
 		await message.answer("Не удалось получить фото. Повторите отправку.")
 		return
-	async for session in get_session():
-		existing = await scramble_crud.list_by_competition_discipline(session, comp_id, d_id)
-		next_attempt = len(existing) + 1
-		if next_attempt > attempts:
-			await message.answer("Все скрамблы для этой дисциплины уже загружены. Отправьте следующий.")
-			return
-		file_id = photos[-1].file_id
-		await scramble_crud.upsert_scramble(session, comp_id, d_id, next_attempt, file_id)
-		await session.commit()
-		if next_attempt == attempts:
-			upload_queue.pop(0)
-			await state.update_data(upload_queue=upload_queue)
-			await message.answer(f"Скрамблы для {d_code} загружены.")
-			await _prompt_next_upload(message, state)
-		else:
-			await message.answer(f"Скрамбл {next_attempt}/{attempts} сохранён. Отправьте следующий.")
+	existing = await scramble_crud.list_by_competition_discipline(session, comp_id, d_id)
+	next_attempt = len(existing) + 1
+	if next_attempt > attempts:
+		await message.answer("Все скрамблы для этой дисциплины уже загружены. Отправьте следующий.")
+		return
+	file_id = photos[-1].file_id
+	await scramble_crud.upsert_scramble(session, comp_id, d_id, next_attempt, file_id)
+	await session.commit()
+	files = [s.file_id for s in existing if s.file_id] + [file_id]
+	after_commit(session, lambda: scramble_crud.cache_file_ids(comp_id, d_id, files))
+	if next_attempt == attempts:
+		upload_queue.pop(0)
+		await state.update_data(upload_queue=upload_queue)
+		await message.answer(f"Скрамблы для {d_code} загружены.")
+		await _prompt_next_upload(message, state)
+	else:
+		await message.answer(f"Скрамбл {next_attempt}/{attempts} сохранён. Отправьте следующий.")
 
 
 @router.message(Command("competition_info"))
-async def competition_info(message: Message) -> None:
+async def competition_info(message: Message, session: AsyncSession) -> None:
 	parts = (message.text or "").split()
 	if len(parts) < 2:
 		await message.answer("Использование: /competition_info <код>")
 		return
 	code = parts[1].strip().upper()
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование не найдено.")
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	await message.answer(f"Соревнование: {comp.name}\nСтатус: {comp.status}\nКод: {comp.competition_code}")
+
+
+@router.message(Command("import_results"))
+async def import_results_cmd(message: Message, state: FSMContext, session: AsyncSession) -> None:
+	parts = (message.text or "").split()
+	if len(parts) < 2:
+		await message.answer("Использование: /import_results <код_соревнования>")
+		return
+	comp = await competition_crud.get_by_code(session, parts[1].strip().upper())
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	u = await user_crud.get_by_telegram_id(session, message.from_user.id)  # type: ignore[arg-type]
+	if not u or u.id != comp.organizer_id:
+		await message.answer("Импорт результатов доступен только организатору соревнования.")
+		return
+	if comp.status == "completed":
+		await message.answer("Соревнование завершено. Импорт результатов недоступен.")
+		return
+	await state.set_state(CompetitionStates.ImportResults)
+	await state.update_data(import_comp_id=comp.id)
+	await message.answer(
+		"Отправьте файл .csv или .json/.jsonl с результатами.\n"
+		"CSV: заголовок discipline,telegram_id,attempt_1,attempt_2,... (вместо telegram_id можно username).\n"
+		"JSON: массив или строки вида {\"discipline\": \"3x3\", \"username\": \"cuber\", \"attempts\": [\"0.11.34\", \"DNF\", ...]}.\n"
+		"Времена в формате X.Y.Z или DNF."
+	)
+
+
+@router.message(StateFilter(CompetitionStates.ImportResults), F.document)
+async def import_results_file(message: Message, state: FSMContext, session: AsyncSession) -> None:
+	data = await state.get_data()
+	comp_id: int = data["import_comp_id"]
+	name = (message.document.file_name or "").lower()  # type: ignore[union-attr]
+	if name.endswith(".csv"):
+		parse = import_service.iter_csv
+	elif name.endswith((".json", ".jsonl", ".ndjson")):
+		parse = import_service.iter_json
+	else:
+		await message.answer("Поддерживаются файлы .csv, .json и .jsonl.")
+		return
+	limit = settings.import_max_file_size
+	if (message.document.file_size or 0) > limit:  # type: ignore[union-attr]
+		await message.answer(f"Файл слишком большой: не больше {limit // (1024 * 1024)} МБ.")
+		return
+	# while the worker runs it owns recalculation (and the /follow pushes that come with it)
+	deferred = leaderboard_worker.active
+	with tempfile.TemporaryDirectory(prefix="import_") as directory:
+		# the upload is streamed to disk, then rows are parsed, validated and written batch by
+		# batch while the file is read, so only one batch is held in memory
+		path = Path(directory) / "upload"
+		await message.bot.download(message.document, destination=path)  # type: ignore[union-attr, arg-type]
+		try:
+			with open(path, encoding="utf-8-sig", newline="") as stream:
+				report = await import_service.import_results(session, comp_id, parse(stream), recalculate=not deferred)
+		except (ValueError, csv.Error) as e:
+			await session.rollback()
+			await message.answer(f"Не удалось разобрать файл: {e}")
 			return
-		await message.answer(f"Соревнование: {comp.name}\nСтатус: {comp.status}\nКод: {comp.competition_code}")
+	await session.commit()
+	if deferred:
+		for discipline_id in report.discipline_ids:
+			leaderboard_worker.mark_dirty(comp_id, discipline_id)
+	await state.clear()
+	lines = [
+		f"Импортировано результатов: {report.imported} (строк в файле: {report.rows}) "
+		f"за {report.elapsed:.2f} с, {report.rows_per_second:,.0f} строк/с."
+	]
+	if report.error_count:
+		lines.append(f"Строк с ошибками: {report.error_count}")
+		lines.extend(f"строка {number}: {error}" for number, error in report.errors)
+		if report.error_count > len(report.errors):
+			lines.append("…")
+	await message.answer("\n".join(lines))
+
+
+@router.message(Command("export"))
+async def export_cmd(message: Message, session: AsyncSession) -> None:
+	parts = (message.text or "").split()
+	if len(parts) < 2:
+		await message.answer("Использование: /export <код_соревнования>")
+		return
+	comp = await competition_crud.get_by_code(session, parts[1].strip().upper())
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	u = await user_crud.get_by_telegram_id(session, message.from_user.id)  # type: ignore[arg-type]
+	if not u or u.id != comp.organizer_id:
+		await message.answer("Выгрузка результатов доступна только организатору соревнования.")
+		return
+	# tables are streamed from the database straight into temporary files; a recalculated
+	# leaderboard is committed by the session middleware
+	with tempfile.TemporaryDirectory(prefix="export_") as directory:
+		files = await export_service.export_competition(session, comp.id, Path(directory))
+		await message.answer_media_group([
+			InputMediaDocument(media=FSInputFile(path, filename=f"{comp.competition_code}_{path.name}"))
+			for path in files
+		])
@@ -2,47 +2,46 @@ from aiogram import Router, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InputMediaPhoto
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.bot.states.registration_states import RegistrationStates
-from src.database.database import get_session
 from src.database.crud import user as user_crud
 from src.database.crud import competition as competition_crud
 from src.database.crud import participant as participant_crud
 from src.database.crud import discipline as discipline_crud
 from src.database.crud import scramble as scramble_crud
+from src.services.leaderboard_worker import leaderboard_worker
 
 router = Router()
 
 
 @router.message(Command("view_all_WCA_disciplines"))
-async def view_all_wca_disciplines(message: Message) -> None:
-	async for session in get_session():
-		items = await discipline_crud.list_all(session)
-		if not items:
-			await message.answer("Справочник дисциплин пуст.")
-			return
-		text = "Доступные дисциплины WCA:\n" + "\n".join(f"- {d.name} (код: {d.code})" for d in items)
-		await message.answer(text)
+async def view_all_wca_disciplines(message: Message, session: AsyncSession) -> None:
+	items = await discipline_crud.list_all(session)
+	if not items:
+		await message.answer("Справочник дисциплин пуст.")
+		return
+	text = "Доступные дисциплины WCA:\n" + "\n".join(f"- {d.name} (код: {d.code})" for d in items)
+	await message.answer(text)
 
 
 @router.message(Command("view_competition_disciplines"))
-async def view_competition_disciplines(message: Message) -> None:
+async def view_competition_disciplines(message: Message, session: AsyncSession) -> None:
 	parts = (message.text or "").split()
 	if len(parts) < 2:
 		await message.answer("Использование: /view_competition_disciplines <код_соревнования>")
 		return
 	code = parts[1].strip().upper()
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование не найдено.")
-			return
-		disciplines = await discipline_crud.list_by_competition(session, comp.id)
-		if not disciplines:
-			await message.answer("В соревновании нет дисциплин.")
-			return
-		text = "Дисциплины соревнования:\n" + "\n".join(f"- {d.name} ({d.code})" for d in disciplines)
-		await message.answer(text)
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	disciplines = await discipline_crud.list_by_competition(session, comp.id)
+	if not disciplines:
+		await message.answer("В соревновании нет дисциплин.")
+		return
+	text = "Дисциплины соревнования:\n" + "\n".join(f"- {d.name} ({d.code})" for d in disciplines)
+	await message.answer(text)
 
 
 @router.message(Command("register"))
@@ -67,57 +66,58 @@ async def register_first_name(message: Message, state: FSMContext) -> None:
 
 
 @router.message(StateFilter(RegistrationStates.EnterLastName), F.text.len() > 0)
-async def register_last_name(message: Message, state: FSMContext) -> None:
+async def register_last_name(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	data = await state.get_data()
 	code: str = data.get("code")
 	first_name: str = data.get("first_name")
 	last_name = message.text.strip()
 
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование с таким кодом не найдено. Повторите регистрацию: /register")
-			await state.clear()
-			return
-		u = await user_crud.get_or_create_participant_user(
-			session,
-			telegram_id=message.from_user.id,  # type: ignore[arg-type]
-			first_name=first_name,
-			last_name=last_name,
-			username=message.from_user.username if message.from_user else None,  # type: ignore[attr-defined]
-		)
-		p = await participant_crud.get(session, comp.id, u.id)
-		if not p:
-			await participant_crud.create(session, comp.id, u.id)
-		await session.commit()
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование с таким кодом не найдено. Повторите регистрацию: /register")
+		await state.clear()
+		return
+	u = await user_crud.get_or_create_participant_user(
+		session,
+		telegram_id=message.from_user.id,  # type: ignore[arg-type]
+		first_name=first_name,
+		last_name=last_name,
+		username=message.from_user.username if message.from_user else None,  # type: ignore[attr-defined]
+	)
+	p = await participant_crud.get(session, comp.id, u.id)
+	if not p:
+		await participant_crud.create(session, comp.id, u.id)
+	await session.commit()
+	if not p and leaderboard_worker.active:
+		# the overall table lists every participant
+		leaderboard_worker.mark_dirty(comp.id)
 
 	await message.answer("Регистрация завершена. Удачи в соревнованиях!")
 	await state.clear()
 
 
 @router.message(Command("get_scrambles"))
-async def get_scrambles(message: Message) -> None:
+async def get_scrambles(message: Message, session: AsyncSession) -> None:
 	parts = (message.text or "").split()
 	if len(parts) < 3:
 		await message.answer("Использование: /get_scrambles <код_соревнования> <код_дисциплины>")
 		return
 	code = parts[1].strip().upper()
 	disc_code = parts[2].strip().lower()
-	async for session in get_session():
-		comp = await competition_crud.get_by_code(session, code)
-		if not comp:
-			await message.answer("Соревнование не найдено.")
-			return
-		d_list = await discipline_crud.get_by_codes(session, [disc_code])
-		if not d_list:
-			await message.answer("Дисциплина не найдена.")
-			return
-		scrambles = await scramble_crud.list_by_competition_discipline(session, comp.id, d_list[0].id)
-		if not scrambles:
-			await message.answer("Скрамблы ещё не загружены организатором.")
-			return
-		if len(scrambles) == 1:
-			await message.answer_photo(scrambles[0].file_id, caption=f"Скрамблы для {disc_code}")
-			return
-		media = [InputMediaPhoto(media=s.file_id) for s in scrambles]
-		await message.answer_media_group(media)
+	comp = await competition_crud.get_by_code(session, code)
+	if not comp:
+		await message.answer("Соревнование не найдено.")
+		return
+	d_list = await discipline_crud.get_by_codes(session, [disc_code])
+	if not d_list:
+		await message.answer("Дисциплина не найдена.")
+		return
+	# competition, discipline and file_ids all come from caches during a burst
+	file_ids = await scramble_crud.list_file_ids(session, comp.id, d_list[0].id, d_list[0].attempts_count)
+	if not file_ids:
+		await message.answer("Скрамблы ещё не загружены организатором.")
+		return
+	if len(file_ids) == 1:
+		await message.answer_photo(file_ids[0], caption=f"Скрамблы для {disc_code}")
+		return
+	await message.answer_media_group([InputMediaPhoto(media=file_id) for file_id in file_ids])
@@ -28,6 +28,8 @@ async def help_cmd(message: Message) -> None:
 		"/competition_info — информация о соревновании\n"
 		"/add_disciplines — добавить дисциплины\n"
 		"/complete_competition — завершить соревнование\n"
+		"/import_results — импорт результатов из файла CSV/JSON\n"
+		"/export — выгрузить результаты и таблицы в CSV\n"
 		"\n"
 		"Участникам:\n"
 		"/register — регистрация на соревнование\n"
@@ -37,5 +39,7 @@ async def help_cmd(message: Message) -> None:
 		"/my_position — моё место в дисциплине\n"
 		"/leaderboard — таблица лидеров по дисциплине\n"
 		"/overall — общий зачёт\n"
+		"/follow — следить за таблицей лидеров: закреплённое сообщение обновляется само\n"
+		"/unfollow — перестать следить за таблицей\n"
 		"/view_competition_disciplines — список дисциплин соревнования\n"
 	)
@@ -18,3 +18,16 @@ def confirm_kb(text_ok: str = "Подтвердить", text_cancel: str = "От
 		InlineKeyboardButton(text=text_cancel, callback_data="confirm:cancel"),
 	)
 	return kb
+
+
+def pagination_kb(prefix: str, page: int, pages: int) -> InlineKeyboardBuilder:
+	# callback data is "<prefix>:<page>"; pages are numbered from 0
+	kb = InlineKeyboardBuilder()
+	buttons = []
+	if page > 0:
+		buttons.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"{prefix}:{page - 1}"))
+	if page < pages - 1:
+		buttons.append(InlineKeyboardButton(text="Вперёд ▶️", callback_data=f"{prefix}:{page + 1}"))
+	if buttons:
+		kb.row(*buttons)
+	return kb
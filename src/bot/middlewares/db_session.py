@@ -0,0 +1,50 @@
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+AfterCommit = Callable[[], Awaitable[Any]]
+
+
+def after_commit(session: AsyncSession, callback: AfterCommit) -> None:
+	# Runs once the update's work is committed (cache invalidation, notifications); dropped if the handler raises
+	session.info.setdefault("after_commit", []).append(callback)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+	# One AsyncSession per update, injected as `session` into handlers that ask for it. Handlers
+	# without that parameter never open one, and the session only checks out a connection on
+	# its first query. Whatever is still pending when the handler returns is committed here;
+	# an exception rolls it back. Handlers that confirm a write to the user (or hold row locks)
+	# commit it themselves before replying, which leaves nothing for the final commit.
+	def __init__(self, sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+		self.sessionmaker = sessionmaker
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: Dict[str, Any],
+	) -> Any:
+		handler_object = data.get("handler")
+		if handler_object is not None and not handler_object.varkw and "session" not in handler_object.params:
+			return await handler(event, data)
+		async with self.sessionmaker() as session:
+			data["session"] = session
+			try:
+				result = await handler(event, data)
+				if session.in_transaction():
+					await session.commit()
+			except Exception:
+				await session.rollback()
+				raise
+			callbacks: List[AfterCommit] = session.info.pop("after_commit", [])
+		for callback in callbacks:
+			try:
+				await callback()
+			except Exception:
+				logger.exception("after_commit callback failed")
+		return result
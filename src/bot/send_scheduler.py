@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from loguru import logger
+
+from src.bot.update_pool import latency_percentiles
+
+# Priority classes, lower goes first: replies to the user ahead of bulk notifications
+INTERACTIVE = 0
+BULK = 1
+
+ChatId = Union[int, str]
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: int) -> Iterator[None]:
+	# Sends made inside the block (and from tasks created inside it) are queued with this priority
+	token = _priority.set(priority)
+	try:
+		yield
+	finally:
+		_priority.reset(token)
+
+
+class TokenBucket:
+	def __init__(self, rate: float, burst: float) -> None:
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self.updated = time.monotonic()
+
+	def _refill(self, now: float) -> None:
+		self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def delay(self, now: float) -> float:
+		# seconds until a token is available
+		self._refill(now)
+		return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+	def take(self) -> None:
+		self.tokens -= 1
+
+	def pause(self, seconds: float, now: float) -> None:
+		# no token for the next `seconds`
+		self._refill(now)
+		self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+	def full(self, now: float) -> bool:
+		self._refill(now)
+		return self.tokens >= self.burst
+
+
+class _Chat:
+	def __init__(self, bucket: TokenBucket) -> None:
+		self.bucket = bucket
+		# (priority, seq, future) of the sends waiting for this chat
+		self.waiting: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+		# the (priority, seq) this chat is queued under in the ready heap, None while not there
+		self.key: Optional[Tuple[int, int]] = None
+		self.paused = False
+
+	def head(self) -> Optional[Tuple[int, int]]:
+		while self.waiting and self.waiting[0][2].done():
+			heapq.heappop(self.waiting)
+		return self.waiting[0][:2] if self.waiting else None
+
+
+class SendScheduler(BaseRequestMiddleware):
+	# Bot session middleware pacing every request that targets a chat (messages, albums, edits)
+	# to Telegram's flood limits: a global token bucket plus one per chat. Waiting sends are granted
+	# in (priority, arrival) order across the chats whose bucket has a token, so a bulk run into one
+	# chat never holds up replies elsewhere. A RetryAfter pauses that chat and the send is queued again.
+	def __init__(
+		self,
+		rate: float = 30.0,
+		burst: Optional[float] = None,
+		chat_rate: float = 1.0,
+		chat_burst: float = 3.0,
+		group_rate: float = 20 / 60,
+		max_retries: int = 3,
+	) -> None:
+		self.bucket = TokenBucket(rate, burst or rate)
+		self.chat_rate = chat_rate
+		self.chat_burst = chat_burst
+		self.group_rate = group_rate
+		self.max_retries = max_retries
+		self._chats: Dict[ChatId, _Chat] = {}
+		# chats with a token-ready head send, by (priority, seq, chat id)
+		self._ready: List[Tuple[int, int, ChatId]] = []
+		# paused chats by the time their bucket has a token again
+		self._paused: List[Tuple[float, int, ChatId]] = []
+		self._seq = itertools.count()
+		self._wake = asyncio.Event()
+		self._pump: Optional["asyncio.Task[None]"] = None
+		self.queued = 0
+		self.peak_queued = 0
+		self.sent = 0
+		self.retries = 0
+		# seconds a send waited for its slot
+		self.waits: Deque[float] = deque(maxlen=10_000)
+
+	async def __call__(
+		self,
+		make_request: NextRequestMiddlewareType[TelegramType],
+		bot: Bot,
+		method: TelegramMethod[TelegramType],
+	) -> Response[TelegramType]:
+		chat_id = getattr(method, "chat_id", None)
+		if chat_id is None:
+			# getUpdates, answerCallbackQuery, inline message edits: not limited per chat
+			return await make_request(bot, method)
+		priority = _priority.get()
+		attempt = 0
+		while True:
+			await self._acquire(chat_id, priority)
+			try:
+				return await make_request(bot, method)
+			except TelegramRetryAfter as e:
+				if attempt >= self.max_retries:
+					raise
+				attempt += 1
+				self.retries += 1
+				logger.warning("Flood control in chat {}: retrying {} in {}s", chat_id, type(method).__name__, e.retry_after)
+				self._chat(chat_id).bucket.pause(e.retry_after, time.monotonic())
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"queued": self.queued,
+			"peak_queued": self.peak_queued,
+			"sent": self.sent,
+			"retries": self.retries,
+			**latency_percentiles(list(self.waits)),
+		}
+
+	def _chat(self, chat_id: ChatId) -> _Chat:
+		chat = self._chats.get(chat_id)
+		if chat is None:
+			# negative ids are groups and channels, "@name" is a channel
+			group = isinstance(chat_id, str) or chat_id < 0
+			rate = self.group_rate if group else self.chat_rate
+			chat = self._chats[chat_id] = _Chat(TokenBucket(rate, min(self.chat_burst, max(1.0, rate * 60))))
+		return chat
+
+	def _schedule(self, chat_id: ChatId, chat: _Chat) -> None:
+		head = chat.head()
+		if head is not None and not chat.paused and (chat.key is None or head < chat.key):
+			chat.key = head
+			heapq.heappush(self._ready, (*head, chat_id))
+
+	async def _acquire(self, chat_id: ChatId, priority: int) -> None:
+		future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+		chat = self._chat(chat_id)
+		heapq.heappush(chat.waiting, (priority, next(self._seq), future))
+		self._schedule(chat_id, chat)
+		self.queued += 1
+		self.peak_queued = max(self.peak_queued, self.queued)
+		self._wake.set()
+		if self._pump is None or self._pump.done():
+			self._pump = asyncio.create_task(self._run())
+		started = time.perf_counter()
+		try:
+			await future
+		except asyncio.CancelledError:
+			if future.cancelled():
+				# still waiting: the pump skips it
+				self.queued -= 1
+			raise
+		self.waits.append(time.perf_counter() - started)
+
+	async def _run(self) -> None:
+		while self.queued:
+			self._wake.clear()
+			timeout = self._grant(time.monotonic())
+			if timeout == 0:
+				if self.sent % 1024 == 0:
+					self._forget_idle_chats()
+				continue
+			try:
+				await asyncio.wait_for(self._wake.wait(), timeout)
+			except asyncio.TimeoutError:
+				pass
+		self._forget_idle_chats()
+
+	def _forget_idle_chats(self) -> None:
+		# a chat whose bucket refilled has no state worth keeping
+		now = time.monotonic()
+		idle = [
+			chat_id for chat_id, chat in self._chats.items()
+			if chat.head() is None and chat.key is None and not chat.paused and chat.bucket.full(now)
+		]
+		for chat_id in idle:
+			del self._chats[chat_id]
+
+	def _grant(self, now: float) -> Optional[float]:
+		# Hands one slot out; returns 0 after a grant, else how long to sleep (None: until a new send)
+		while self._paused and self._paused[0][0] <= now:
+			_, _, chat_id = heapq.heappop(self._paused)
+			chat = self._chats[chat_id]
+			chat.paused = False
+			self._schedule(chat_id, chat)
+		wait = self.bucket.delay(now)
+		if wait > 0:
+			return wait
+		while self._ready:
+			priority, seq, chat_id = heapq.heappop(self._ready)
+			chat = self._chats.get(chat_id)
+			if chat is None or chat.key != (priority, seq):
+				# superseded by a higher priority send to the same chat
+				continue
+			chat.key = None
+			head = chat.head()
+			if head is None:
+				continue
+			if head != (priority, seq):
+				# the send it was queued under was cancelled
+				self._schedule(chat_id, chat)
+				continue
+			chat_wait = chat.bucket.delay(now)
+			if chat_wait > 0:
+				chat.paused = True
+				heapq.heappush(self._paused, (now + chat_wait, seq, chat_id))
+				continue
+			_, _, future = heapq.heappop(chat.waiting)
+			chat.bucket.take()
+			self.bucket.take()
+			future.set_result(None)
+			self.queued -= 1
+			self.sent += 1
+			self._schedule(chat_id, chat)
+			return 0
+		return self._paused[0][0] - now if self._paused else None
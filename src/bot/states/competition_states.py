@@ -6,3 +6,4 @@ class CompetitionStates(StatesGroup):
 	SelectDisciplines = State()
 	UploadScrambles = State()
 	UploadSpecificDiscipline = State()
+	ImportResults = State()
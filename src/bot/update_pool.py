@@ -0,0 +1,88 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Protocol, Tuple
+
+from aiogram import Bot, Dispatcher
+from loguru import logger
+
+
+class UpdateSink(Protocol):
+	# Where the ingest side (polling loop or webhook endpoint) hands raw updates over
+	def submit(self, update: Dict[str, Any]) -> None: ...
+
+	async def start(self) -> None: ...
+
+	async def stop(self) -> None: ...
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+	# Chat (or user) an update belongs to; updates of one chat must be processed in order
+	for value in update.values():
+		if not isinstance(value, dict):
+			continue
+		chat = value.get("chat") or (value.get("message") or {}).get("chat")
+		if chat:
+			return chat["id"]
+		user = value.get("from") or value.get("user")
+		if user:
+			return user["id"]
+	return 0
+
+
+def latency_percentiles(samples: List[float]) -> Dict[str, float]:
+	if len(samples) < 2:
+		value = samples[0] if samples else 0.0
+		return {"p50": value, "p99": value}
+	cuts = statistics.quantiles(samples, n=100)
+	return {"p50": cuts[49], "p99": cuts[98]}
+
+
+class UpdatePool:
+	# Fixed pool of in-process workers feeding updates to the dispatcher.
+	# Each worker owns a queue and updates are routed by chat id, so one chat is never
+	# processed concurrently while different chats are.
+	def __init__(self, dispatcher: Dispatcher, bot: Bot, workers: int, shutdown_timeout: float = 30.0) -> None:
+		self.dispatcher = dispatcher
+		self.bot = bot
+		self.shutdown_timeout = shutdown_timeout
+		self.queues: List["asyncio.Queue[Tuple[float, Dict[str, Any]]]"] = [asyncio.Queue() for _ in range(max(1, workers))]
+		# seconds from receiving an update to the end of its handler
+		self.latencies: Deque[float] = deque(maxlen=10_000)
+		self._tasks: List["asyncio.Task[None]"] = []
+
+	def submit(self, update: Dict[str, Any]) -> None:
+		queue = self.queues[update_chat_id(update) % len(self.queues)]
+		queue.put_nowait((time.perf_counter(), update))
+
+	async def start(self) -> None:
+		self._tasks = [asyncio.create_task(self._worker(q)) for q in self.queues]
+
+	async def stop(self) -> None:
+		# finish what was already accepted, then stop the workers
+		try:
+			await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues)), self.shutdown_timeout)
+		except asyncio.TimeoutError:
+			logger.warning("Shutdown timeout: {} updates dropped", sum(q.qsize() for q in self.queues))
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"queued": sum(q.qsize() for q in self.queues),
+			"processed": len(self.latencies),
+			**latency_percentiles(list(self.latencies)),
+		}
+
+	async def _worker(self, queue: "asyncio.Queue[Tuple[float, Dict[str, Any]]]") -> None:
+		while True:
+			received, update = await queue.get()
+			try:
+				await self.dispatcher.feed_raw_update(self.bot, update)
+			except Exception:
+				logger.exception("Failed to process update {}", update.get("update_id"))
+			finally:
+				self.latencies.append(time.perf_counter() - received)
+				queue.task_done()
@@ -0,0 +1,73 @@
+import asyncio
+import signal
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import setup_application
+from aiohttp import web
+from loguru import logger
+
+from src.bot.update_pool import UpdateSink
+from src.config.settings import settings
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+	# Accepts Telegram webhook calls and acknowledges them as soon as the update is handed to the sink
+	def __init__(self, sink: UpdateSink, secret_token: Optional[str] = None) -> None:
+		self.sink = sink
+		self.secret_token = secret_token
+
+	def setup(self, app: web.Application, path: str, dispatcher: Optional[Dispatcher] = None, bot: Optional[Bot] = None) -> None:
+		app.router.add_post(path, self.handle)
+		# registered before the dispatcher hooks so that shutdown drains the sink first
+		app.on_startup.append(self._on_startup)
+		app.on_shutdown.append(self._on_shutdown)
+		if dispatcher is not None:
+			setup_application(app, dispatcher, bot=bot)
+
+	async def handle(self, request: web.Request) -> web.Response:
+		if self.secret_token and request.headers.get(SECRET_HEADER) != self.secret_token:
+			return web.Response(status=401)
+		self.sink.submit(await request.json())
+		return web.Response()
+
+	async def _on_startup(self, app: web.Application) -> None:
+		await self.sink.start()
+
+	async def _on_shutdown(self, app: web.Application) -> None:
+		# the site no longer accepts requests here
+		await self.sink.stop()
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot, sink: UpdateSink, emit_hooks: bool = True) -> None:
+	# emit_hooks: run the dispatcher's startup/shutdown here (off when worker processes run them)
+	if not settings.webhook_base_url:
+		raise ValueError("WEBHOOK_BASE_URL is required when BOT_MODE=webhook")
+	app = web.Application()
+	WebhookServer(sink, secret_token=settings.webhook_secret).setup(
+		app, settings.webhook_path, dispatcher if emit_hooks else None, bot
+	)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	site = web.TCPSite(runner, settings.webhook_host, settings.webhook_port)
+	await site.start()
+	await bot.set_webhook(
+		settings.webhook_base_url.rstrip("/") + settings.webhook_path,
+		secret_token=settings.webhook_secret,
+		allowed_updates=dispatcher.resolve_used_update_types(),
+	)
+	logger.info("Webhook server listening on {}:{}", settings.webhook_host, settings.webhook_port)
+
+	stop = asyncio.Event()
+	loop = asyncio.get_running_loop()
+	for sig in (signal.SIGINT, signal.SIGTERM):
+		loop.add_signal_handler(sig, stop.set)
+	try:
+		await stop.wait()
+	finally:
+		# stops the listener, then runs the shutdown hooks (drain, dispatcher shutdown)
+		await runner.cleanup()
+		await bot.session.close()
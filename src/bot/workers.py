@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from multiprocessing.synchronize import Event
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from loguru import logger
+
+from src.bot.update_pool import UpdatePool, update_chat_id
+from src.bot.webhook import run_webhook
+from src.config.settings import settings
+
+
+class ProcessFanout:
+	# UpdateSink that shards updates over worker processes by chat id. Every process runs its own
+	# dispatcher, so a CPU-heavy handler (a leaderboard recomputation) only stalls its own shard,
+	# while each chat keeps hitting the same process and its FSM flow stays ordered.
+	def __init__(self, processes: int, update_workers: int, shutdown_timeout: float = 30.0, ready_timeout: float = 60.0) -> None:
+		self._ctx = multiprocessing.get_context("spawn")
+		self.update_workers = update_workers
+		self.shutdown_timeout = shutdown_timeout
+		self.ready_timeout = ready_timeout
+		self.queues: List[Queue] = [self._ctx.Queue() for _ in range(max(1, processes))]
+		self._ready: List[Event] = [self._ctx.Event() for _ in self.queues]
+		self._processes: List[BaseProcess] = []
+
+	def submit(self, update: Dict[str, Any]) -> None:
+		self.queues[update_chat_id(update) % len(self.queues)].put(update)
+
+	async def start(self) -> None:
+		for index, (queue, ready) in enumerate(zip(self.queues, self._ready)):
+			process = self._ctx.Process(
+				target=worker_main,
+				args=(queue, ready, self.update_workers, index),
+				name=f"bot-worker-{index}",
+			)
+			process.start()
+			self._processes.append(process)
+		loop = asyncio.get_running_loop()
+		for process, ready in zip(self._processes, self._ready):
+			if not await loop.run_in_executor(None, ready.wait, self.ready_timeout):
+				raise RuntimeError(f"{process.name} did not start within {self.ready_timeout}s")
+
+	async def stop(self) -> None:
+		# workers finish their queues up to the sentinel, then run the dispatcher shutdown
+		for queue in self.queues:
+			queue.put(None)
+		loop = asyncio.get_running_loop()
+		for process in self._processes:
+			await loop.run_in_executor(None, process.join, self.shutdown_timeout)
+			if process.is_alive():
+				logger.warning("{} did not stop in time, terminating", process.name)
+				process.terminate()
+		self._processes = []
+
+
+def worker_main(queue: Queue, ready: Event, update_workers: int, shard: int = 0) -> None:
+	asyncio.run(_run_worker(queue, ready, update_workers, shard))
+
+
+async def _run_worker(queue: Queue, ready: Event, update_workers: int, shard: int = 0) -> None:
+	# imported here: a spawned process builds its own dispatcher, storage and connection pools
+	from src.bot.dispatcher import create_bot, dp
+
+	bot = create_bot()
+	pool = UpdatePool(dp, bot, update_workers, settings.shutdown_timeout)
+	await dp.emit_startup(bot=bot, dispatcher=dp, shard=shard)
+	await pool.start()
+	ready.set()
+	loop = asyncio.get_running_loop()
+	try:
+		while True:
+			update: Optional[Dict[str, Any]] = await loop.run_in_executor(None, queue.get)
+			if update is None:
+				break
+			pool.submit(update)
+	finally:
+		await pool.stop()
+		await dp.emit_shutdown(bot=bot, dispatcher=dp)
+		await bot.session.close()
+
+
+async def poll_updates(dispatcher: Dispatcher, bot: Bot, sink: ProcessFanout) -> None:
+	# Long polling that only forwards raw updates; handling happens in the worker processes
+	offset: Optional[int] = None
+	allowed_updates = dispatcher.resolve_used_update_types()
+	await bot.delete_webhook()
+	while True:
+		try:
+			updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+		except Exception:
+			logger.exception("Failed to fetch updates")
+			await asyncio.sleep(1)
+			continue
+		for update in updates:
+			sink.submit(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+			offset = update.update_id + 1
+
+
+async def run_sharded(dispatcher: Dispatcher, bot: Bot) -> None:
+	sink = ProcessFanout(settings.bot_processes, settings.update_workers, settings.shutdown_timeout)
+	if settings.bot_mode == "webhook":
+		# the webhook app starts and stops the sink itself
+		await run_webhook(dispatcher, bot, sink, emit_hooks=False)
+		return
+	await sink.start()
+	logger.info("Polling with {} worker processes", settings.bot_processes)
+	try:
+		await poll_updates(dispatcher, bot, sink)
+	finally:
+		await sink.stop()
+		await bot.session.close()
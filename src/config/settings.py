@@ -16,6 +16,52 @@ class Settings(BaseSettings):
     redis_url: str | None = Field(None, env="REDIS_URL")
     log_level: str = Field("INFO", env="LOG_LEVEL")
 
+    # connection pool (ignored for SQLite)
+    db_pool_size: int = Field(10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(30.0, env="DB_POOL_TIMEOUT")
+    # seconds before a connection is replaced on checkout, -1 keeps connections forever
+    db_pool_recycle: int = Field(1800, env="DB_POOL_RECYCLE")
+    # a ping round trip on every checkout; with a recycle shorter than the server's idle timeout it can be turned off
+    db_pool_pre_ping: bool = Field(True, env="DB_POOL_PRE_PING")
+    # asyncpg prepared statements cached per connection (SQLAlchemy's default is 100), 0 disables
+    db_prepared_statement_cache_size: int = Field(500, env="DB_PREPARED_STATEMENT_CACHE_SIZE")
+    # log pool metrics every N seconds, 0 disables
+    db_pool_stats_interval: float = Field(0.0, env="DB_POOL_STATS_INTERVAL")
+
+    bot_mode: str = Field("polling", env="BOT_MODE")  # polling | webhook
+    webhook_base_url: str | None = Field(None, env="WEBHOOK_BASE_URL")
+    webhook_path: str = Field("/webhook", env="WEBHOOK_PATH")
+    webhook_secret: str | None = Field(None, env="WEBHOOK_SECRET")
+    webhook_host: str = Field("0.0.0.0", env="WEBHOOK_HOST")
+    webhook_port: int = Field(8080, env="WEBHOOK_PORT")
+    telegram_api_url: str | None = Field(None, env="TELEGRAM_API_URL")  # local Bot API server
+
+    # concurrent update handlers per process (webhook mode and worker processes)
+    update_workers: int = Field(8, env="UPDATE_WORKERS")
+    # >0: this process only ingests updates and shards them over that many worker processes
+    bot_processes: int = Field(0, env="BOT_PROCESSES")
+    shutdown_timeout: float = Field(30.0, env="SHUTDOWN_TIMEOUT")
+
+    # outgoing sends: Telegram allows about 30 messages/s per bot, 1/s per chat and 20/min per group
+    send_rate: float = Field(30.0, env="SEND_RATE")
+    send_chat_rate: float = Field(1.0, env="SEND_CHAT_RATE")
+    send_chat_burst: float = Field(3.0, env="SEND_CHAT_BURST")
+    send_group_rate: float = Field(20 / 60, env="SEND_GROUP_RATE")
+    # a send hitting RetryAfter waits and is retried this many times before the error reaches the handler
+    send_max_retries: int = Field(3, env="SEND_MAX_RETRIES")
+
+    cache_max_size: int = Field(1024, env="CACHE_MAX_SIZE")
+    competition_cache_ttl: float = Field(60.0, env="COMPETITION_CACHE_TTL")
+    discipline_cache_ttl: float = Field(3600.0, env="DISCIPLINE_CACHE_TTL")
+    scramble_cache_ttl: float = Field(3600.0, env="SCRAMBLE_CACHE_TTL")
+    # seconds between background leaderboard recalculations; 0 recalculates inline on submit and view
+    leaderboard_recompute_interval: float = Field(5.0, env="LEADERBOARD_RECOMPUTE_INTERVAL")
+    # rows per leaderboard message; keeps a page well under Telegram's 4096-character limit
+    leaderboard_page_size: int = Field(20, env="LEADERBOARD_PAGE_SIZE")
+    # /import_results refuses larger uploads before downloading them (the Bot API serves at most 20 MB)
+    import_max_file_size: int = Field(20 * 1024 * 1024, env="IMPORT_MAX_FILE_SIZE")
+
 
 settings = Settings()
 
@@ -0,0 +1,53 @@
+from typing import Any, Dict, List, Sequence, Type, Union
+
+from sqlalchemy import Table, UniqueConstraint
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.database import Base
+
+
+_DIALECT_INSERTS = {
+	"postgresql": postgresql.insert,
+	"sqlite": sqlite.insert,
+}
+
+
+def dialect_insert(session: AsyncSession, table: Union[Table, Type[Base]]):
+	# a mapped class gives an ORM-enabled insert: RETURNING the entity yields ORM objects
+	name = session.get_bind().dialect.name
+	if name not in _DIALECT_INSERTS:
+		raise NotImplementedError(f"INSERT ... ON CONFLICT is not supported for dialect {name!r}")
+	return _DIALECT_INSERTS[name](table)
+
+
+def constraint_columns(table: Table, constraint_name: str) -> List[str]:
+	for c in table.constraints:
+		if isinstance(c, UniqueConstraint) and c.name == constraint_name:
+			return [col.name for col in c.columns]
+	raise ValueError(f"{table.name} has no unique constraint {constraint_name!r}")
+
+
+async def bulk_upsert(
+	session: AsyncSession,
+	model: Type[Base],
+	rows: Sequence[Dict[str, Any]],
+	constraint: str,
+) -> None:
+	# INSERT ... ON CONFLICT (<constraint columns>) DO UPDATE executed once with the whole parameter list.
+	# The statement is compiled once and cached; the driver's executemany batches the rows
+	# (a literal multi-row VALUES clause costs more to compile than to run).
+	# Goes through Core: no ORM objects are built and the identity map is not updated.
+	# Rows go in key order, so concurrent upserts on the same table take their row locks
+	# in the same order and cannot deadlock.
+	if not rows:
+		return
+	table: Table = model.__table__  # type: ignore[attr-defined]
+	keys = constraint_columns(table, constraint)
+	rows = sorted(rows, key=lambda row: tuple(row[k] for k in keys))
+	stmt = dialect_insert(session, table)
+	stmt = stmt.on_conflict_do_update(
+		index_elements=keys,
+		set_={name: stmt.excluded[name] for name in rows[0] if name not in keys},
+	)
+	await session.execute(stmt, rows)
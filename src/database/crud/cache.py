@@ -0,0 +1,213 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Type, TypeVar
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.config.settings import settings
+from src.database.database import Base
+from src.storage.redis_pool import get_redis
+
+
+ModelT = TypeVar("ModelT", bound=Base)
+
+
+# Bounded LRU mapping whose entries expire ttl seconds after being set
+class TTLCache:
+	def __init__(self, name: str, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+		self.name = name
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._clock = clock
+		self._items: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+	def get(self, key: Hashable) -> Optional[Any]:
+		entry = self._items.get(key)
+		if entry is None or entry[0] <= self._clock():
+			if entry is not None:
+				del self._items[key]
+			self.misses += 1
+			return None
+		self._items.move_to_end(key)
+		self.hits += 1
+		return entry[1]
+
+	def set(self, key: Hashable, value: Any) -> None:
+		self._items[key] = (self._clock() + self.ttl, value)
+		self._items.move_to_end(key)
+		while len(self._items) > self.maxsize:
+			self._items.popitem(last=False)
+
+	def add(self, key: Hashable, value: Any) -> None:
+		# set unless a live entry is already there
+		entry = self._items.get(key)
+		if entry is None or entry[0] <= self._clock():
+			self.set(key, value)
+
+	def invalidate(self, key: Hashable) -> None:
+		self._items.pop(key, None)
+
+	def clear(self) -> None:
+		self._items.clear()
+
+	def stats(self) -> Dict[str, int]:
+		return {"hits": self.hits, "misses": self.misses, "size": len(self._items)}
+
+
+# Async front used by the crud and service layers. Entries live in a process-local TTLCache, or in
+# Redis when REDIS_URL is set, so that all bot processes share entries and invalidations.
+# Values must be JSON-serializable (datetimes are allowed).
+class SharedCache:
+	def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+		self.name = name
+		self.ttl = ttl
+		self.local = TTLCache(name, maxsize, ttl)
+		self.hits = 0
+		self.misses = 0
+		# key -> future of the load currently running in this process
+		self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+	async def get(self, key: Hashable) -> Optional[Any]:
+		redis = get_redis()
+		if redis is None:
+			value = self.local.get(key)
+		else:
+			raw = await redis.get(self._redis_key(key))
+			value = None if raw is None else json.loads(raw, object_hook=_decode)
+		if value is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return value
+
+	async def set(self, key: Hashable, value: Any, only_if_absent: bool = False) -> None:
+		redis = get_redis()
+		if redis is None:
+			if only_if_absent:
+				self.local.add(key, value)
+			else:
+				self.local.set(key, value)
+		else:
+			await redis.set(
+				self._redis_key(key), json.dumps(value, default=_encode), px=int(self.ttl * 1000), nx=only_if_absent
+			)
+
+	async def get_or_load(
+		self,
+		key: Hashable,
+		load: Callable[[], Awaitable[Any]],
+		keep: Callable[[Any], bool] = bool,
+	) -> Any:
+		# Single-flight read-through: concurrent misses on one key in this process wait for the
+		# first caller's load instead of each running their own. A failed load is raised to all of
+		# them; if the loading caller is cancelled, a waiter takes over.
+		# Only values passing keep are cached (by default not None or empty: "nothing there yet"
+		# is about to change), and a load never replaces an entry: a set made after a commit
+		# while the load was reading older rows wins.
+		while True:
+			value = await self.get(key)
+			if value is not None:
+				return value
+			inflight = self._inflight.get(key)
+			if inflight is None:
+				break
+			try:
+				return await asyncio.shield(inflight)
+			except asyncio.CancelledError:
+				if not inflight.cancelled():
+					raise
+		future = asyncio.get_running_loop().create_future()
+		# the outcome may have no waiter to retrieve it
+		future.add_done_callback(lambda f: f.cancelled() or f.exception())
+		self._inflight[key] = future
+		try:
+			value = await load()
+			if keep(value):
+				await self.set(key, value, only_if_absent=True)
+		except asyncio.CancelledError:
+			future.cancel()
+			raise
+		except BaseException as e:
+			future.set_exception(e)
+			raise
+		else:
+			future.set_result(value)
+			return value
+		finally:
+			del self._inflight[key]
+
+	async def invalidate(self, key: Hashable) -> None:
+		redis = get_redis()
+		if redis is None:
+			self.local.invalidate(key)
+		else:
+			await redis.delete(self._redis_key(key))
+
+	def clear(self) -> None:
+		# local entries and counters only; Redis entries expire on their own
+		self.local.clear()
+		self.hits = 0
+		self.misses = 0
+
+	def stats(self) -> Dict[str, Any]:
+		stats: Dict[str, Any] = {"hits": self.hits, "misses": self.misses}
+		if get_redis() is None:
+			stats["size"] = len(self.local._items)
+		return stats
+
+	def _redis_key(self, key: Hashable) -> str:
+		parts = key if isinstance(key, tuple) else (key,)
+		return ":".join(["cache", self.name, *map(str, parts)])
+
+
+def _encode(value: Any) -> Any:
+	if isinstance(value, datetime):
+		return {"__datetime__": value.isoformat()}
+	raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+	if "__datetime__" in obj:
+		return datetime.fromisoformat(obj["__datetime__"])
+	return obj
+
+
+competition_cache = SharedCache("competitions", settings.cache_max_size, settings.competition_cache_ttl)
+discipline_cache = SharedCache("disciplines", settings.cache_max_size, settings.discipline_cache_ttl)
+competition_disciplines_cache = SharedCache("competition_disciplines", settings.cache_max_size, settings.competition_cache_ttl)
+scramble_cache = SharedCache("scrambles", settings.cache_max_size, settings.scramble_cache_ttl)
+
+_CACHES = (competition_cache, discipline_cache, competition_disciplines_cache, scramble_cache)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+	return {c.name: c.stats() for c in _CACHES}
+
+
+def clear_caches() -> None:
+	for c in _CACHES:
+		c.clear()
+
+
+# Cached values are plain column snapshots, never live ORM objects: an instance stays bound
+# to the session that loaded it, so every hit is rebuilt inside the caller's session.
+
+def snapshot(obj: Base) -> Dict[str, Any]:
+	return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+async def restore(session: AsyncSession, model: Type[ModelT], row: Dict[str, Any]) -> ModelT:
+	obj = model(**row)
+	make_transient_to_detached(obj)
+	return await session.merge(obj, load=False)
+
+
+async def restore_all(session: AsyncSession, model: Type[ModelT], rows: List[Dict[str, Any]]) -> List[ModelT]:
+	return [await restore(session, model, r) for r in rows]
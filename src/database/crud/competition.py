@@ -2,14 +2,19 @@ import secrets
 import string
 from typing import Optional, Sequence, List
 
-from sqlalchemy import select, update
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.database.crud.cache import competition_cache, competition_disciplines_cache, restore, snapshot
 from src.database.models import Competition, CompetitionDiscipline
 
 
 _CODE_ALPHABET = string.ascii_uppercase + string.digits
 
+# Hot lookups are built once with bound parameters: a call only binds values, and the statement's
+# cache key (memoized on the construct) finds the compiled SQL without walking a new select()
+_BY_CODE = select(Competition).where(Competition.competition_code == bindparam("code"))
+
 
 def _generate_code(length: int = 8) -> str:
 	return "".join(secrets.choice(_CODE_ALPHABET) for _ in range(length))
@@ -17,7 +22,7 @@ def _generate_code(length: int = 8) -> str:
 
 async def create_competition(session: AsyncSession, name: str, organizer_id: int) -> Competition:
 	code = _generate_code(8)
-	while await session.scalar(select(Competition).where(Competition.competition_code == code)):
+	while await session.scalar(_BY_CODE, {"code": code}):
 		code = _generate_code(8)
 	comp = Competition(name=name, organizer_id=organizer_id, competition_code=code, status="active")
 	session.add(comp)
@@ -39,7 +44,13 @@ async def add_disciplines(session: AsyncSession, competition_id: int, discipline
 
 
 async def get_by_code(session: AsyncSession, code: str) -> Optional[Competition]:
-	return await session.scalar(select(Competition).where(Competition.competition_code == code))
+	row = await competition_cache.get(code)
+	if row is not None:
+		return await restore(session, Competition, row)
+	comp = await session.scalar(_BY_CODE, {"code": code})
+	if comp is not None:
+		await competition_cache.set(code, snapshot(comp))
+	return comp
 
 
 async def list_by_organizer(session: AsyncSession, organizer_id: int) -> List[Competition]:
@@ -48,7 +59,13 @@ async def list_by_organizer(session: AsyncSession, organizer_id: int) -> List[Co
 
 
 async def complete_competition(session: AsyncSession, competition_id: int) -> None:
-	await session.execute(
-		update(Competition).where(Competition.id == competition_id).values(status="completed")
-	)
+	await session.execute(update(Competition).where(Competition.id == competition_id).values(status="completed"))
 	await session.flush()
+
+
+async def invalidate_cached(competition_id: int, code: Optional[str] = None) -> None:
+	# Call after the commit of add_disciplines / complete_competition: invalidating inside the
+	# transaction lets a concurrent get_by_code re-cache the old row until the TTL runs out
+	if code is not None:
+		await competition_cache.invalidate(code)
+	await competition_disciplines_cache.invalidate(competition_id)
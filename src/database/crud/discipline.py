@@ -3,20 +3,37 @@ from typing import List, Dict, Iterable
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.database.crud.cache import competition_disciplines_cache, discipline_cache, restore, restore_all, snapshot
 from src.database.models import Discipline, CompetitionDiscipline
 
 
+_ALL_KEY = ("all",)
+
+
 async def list_all(session: AsyncSession) -> List[Discipline]:
-	rows = await session.scalars(select(Discipline).order_by(Discipline.id))
-	return list(rows)
+	cached = await discipline_cache.get(_ALL_KEY)
+	if cached is not None:
+		return await restore_all(session, Discipline, cached)
+	rows = list(await session.scalars(select(Discipline).order_by(Discipline.id)))
+	await discipline_cache.set(_ALL_KEY, [snapshot(d) for d in rows])
+	return rows
 
 
 async def get_by_codes(session: AsyncSession, codes: Iterable[str]) -> List[Discipline]:
-	codes_norm = [c.strip().lower() for c in codes if c and c.strip()]
+	codes_norm = list(dict.fromkeys(c.strip().lower() for c in codes if c and c.strip()))
 	if not codes_norm:
 		return []
-	rows = await session.scalars(select(Discipline).where(Discipline.code.in_(codes_norm)))
-	return list(rows)
+	found: Dict[str, Discipline] = {}
+	for code in codes_norm:
+		row = await discipline_cache.get(("code", code))
+		if row is not None:
+			found[code] = await restore(session, Discipline, row)
+	missing = [c for c in codes_norm if c not in found]
+	if missing:
+		for d in await session.scalars(select(Discipline).where(Discipline.code.in_(missing))):
+			await discipline_cache.set(("code", d.code.lower()), snapshot(d))
+			found[d.code.lower()] = d
+	return [found[c] for c in codes_norm if c in found]
 
 
 def to_code_map(items: List[Discipline]) -> Dict[str, Discipline]:
@@ -24,10 +41,14 @@ def to_code_map(items: List[Discipline]) -> Dict[str, Discipline]:
 
 
 async def list_by_competition(session: AsyncSession, competition_id: int) -> List[Discipline]:
-	rows = await session.scalars(
+	cached = await competition_disciplines_cache.get(competition_id)
+	if cached is not None:
+		return await restore_all(session, Discipline, cached)
+	rows = list(await session.scalars(
 		select(Discipline)
 		.join(CompetitionDiscipline, CompetitionDiscipline.discipline_id == Discipline.id)
 		.where(CompetitionDiscipline.competition_id == competition_id)
 		.order_by(Discipline.id)
-	)
-	return list(rows)
+	))
+	await competition_disciplines_cache.set(competition_id, [snapshot(d) for d in rows])
+	return rows
@@ -1,18 +1,36 @@
-from typing import Optional
+from typing import List, NamedTuple, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import and_, bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Participant
+from src.database.models import Competition, Participant, User
+
+# built once, see competition._BY_CODE
+_BY_COMPETITION_USER = select(Participant).where(
+	Participant.competition_id == bindparam("competition_id"),
+	Participant.user_id == bindparam("user_id"),
+)
+
+# competition by code with the caller's user and registration, both outer-joined so that a missing
+# user or participant comes back as None instead of dropping the row
+_RESOLVE = (
+	select(Competition, User, Participant, Competition.status)
+	.select_from(Competition)
+	.outerjoin(User, User.telegram_id == bindparam("telegram_id"))
+	.outerjoin(Participant, and_(Participant.competition_id == Competition.id, Participant.user_id == User.id))
+	.where(Competition.competition_code == bindparam("code"))
+)
+
+
+class Registration(NamedTuple):
+	competition: Competition
+	user: Optional[User]
+	participant: Optional[Participant]
+	status: str
 
 
 async def get(session: AsyncSession, competition_id: int, user_id: int) -> Optional[Participant]:
-	return await session.scalar(
-		select(Participant).where(
-			Participant.competition_id == competition_id,
-			Participant.user_id == user_id,
-		)
-	)
+	return await session.scalar(_BY_COMPETITION_USER, {"competition_id": competition_id, "user_id": user_id})
 
 
 async def create(session: AsyncSession, competition_id: int, user_id: int) -> Participant:
@@ -20,3 +38,19 @@ async def create(session: AsyncSession, competition_id: int, user_id: int) -> Pa
 	session.add(p)
 	await session.flush()
 	return p
+
+
+async def list_identities(session: AsyncSession, competition_id: int) -> List[Tuple[int, int, int, Optional[str]]]:
+	# (participant id, user id, telegram id, username) of everyone registered, without loading ORM objects
+	rows = await session.execute(
+		select(Participant.id, Participant.user_id, User.telegram_id, User.username)
+		.join(User, User.id == Participant.user_id)
+		.where(Participant.competition_id == competition_id)
+	)
+	return [tuple(r) for r in rows]
+
+
+async def resolve(session: AsyncSession, code: str, telegram_id: int) -> Optional[Registration]:
+	# One round trip for the lookups the result handlers start with; None if the code is unknown
+	row = (await session.execute(_RESOLVE, {"code": code, "telegram_id": telegram_id})).first()
+	return Registration(*row) if row else None
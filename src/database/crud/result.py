@@ -1,18 +1,21 @@
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Result
+from src.database.bulk import constraint_columns, dialect_insert
+from src.database.models import Participant, Result
+
+# built once, see competition._BY_CODE
+_BY_PARTICIPANT_DISCIPLINE = select(Result).where(
+	Result.participant_id == bindparam("participant_id"),
+	Result.discipline_id == bindparam("discipline_id"),
+)
 
 
 async def get_by_participant_and_discipline(session: AsyncSession, participant_id: int, discipline_id: int) -> Optional[Result]:
-	return await session.scalar(
-		select(Result).where(
-			Result.participant_id == participant_id,
-			Result.discipline_id == discipline_id,
-		)
-	)
+	return await session.scalar(_BY_PARTICIPANT_DISCIPLINE, {"participant_id": participant_id, "discipline_id": discipline_id})
 
 
 async def upsert_result(
@@ -24,24 +27,24 @@ async def upsert_result(
 	average_dnf: bool,
 	best_ms: Optional[int],
 ) -> Result:
-	res = await get_by_participant_and_discipline(session, participant_id, discipline_id)
-	if res is None:
-		res = Result(participant_id=participant_id, discipline_id=discipline_id)
-		session.add(res)
-	# assign attempts (pad to 5)
-	vals = attempts_ms + [None] * (5 - len(attempts_ms))
-	res.attempt_1_time = vals[0]
-	res.attempt_1_dnf = vals[0] is None
-	res.attempt_2_time = vals[1]
-	res.attempt_2_dnf = vals[1] is None
-	res.attempt_3_time = vals[2]
-	res.attempt_3_dnf = vals[2] is None
-	res.attempt_4_time = vals[3]
-	res.attempt_4_dnf = vals[3] is None
-	res.attempt_5_time = vals[4]
-	res.attempt_5_dnf = vals[4] is None
-	res.average_time = average_ms
-	res.average_dnf = average_dnf
-	res.best_time = best_ms
-	await session.flush()
-	return res
+	# One INSERT ... ON CONFLICT DO UPDATE ... RETURNING: a single round trip, and two concurrent
+	# submissions for the same participant and discipline both succeed (the later one wins)
+	# instead of racing to insert. Competition and user never change for a participant: on insert
+	# they are copied from it by subqueries, an update leaves them alone.
+	stmt = dialect_insert(session, Result).values(
+		participant_id=participant_id,
+		discipline_id=discipline_id,
+		competition_id=select(Participant.competition_id).where(Participant.id == participant_id).scalar_subquery(),
+		user_id=select(Participant.user_id).where(Participant.id == participant_id).scalar_subquery(),
+		attempts=list(attempts_ms),
+		average_time=average_ms,
+		average_dnf=average_dnf,
+		best_time=best_ms,
+		updated_at=datetime.utcnow(),
+	)
+	stmt = stmt.on_conflict_do_update(
+		index_elements=constraint_columns(Result.__table__, "uq_results_participant_discipline"),  # type: ignore[arg-type]
+		set_={name: stmt.excluded[name] for name in ("attempts", "average_time", "average_dnf", "best_time", "updated_at")},
+	)
+	# populate_existing: a Result already in the session takes the returned values
+	return await session.scalar(stmt.returning(Result), execution_options={"populate_existing": True})  # type: ignore[return-value]
@@ -1,8 +1,11 @@
+from datetime import datetime
 from typing import List, Optional
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.database.bulk import constraint_columns, dialect_insert
+from src.database.crud.cache import scramble_cache
 from src.database.models import Scramble
 
 
@@ -14,28 +17,20 @@ async def upsert_scramble(
 	file_id: str,
 	file_path: Optional[str] = None,
 ) -> Scramble:
-	existing = await session.scalar(
-		select(Scramble).where(
-			Scramble.competition_id == competition_id,
-			Scramble.discipline_id == discipline_id,
-			Scramble.attempt_number == attempt_number,
-		)
-	)
-	if existing:
-		existing.file_id = file_id
-		existing.file_path = file_path
-		await session.flush()
-		return existing
-	s = Scramble(
+	# Single INSERT ... ON CONFLICT DO UPDATE ... RETURNING, like result.upsert_result
+	stmt = dialect_insert(session, Scramble).values(
 		competition_id=competition_id,
 		discipline_id=discipline_id,
 		attempt_number=attempt_number,
 		file_id=file_id,
 		file_path=file_path,
+		uploaded_at=datetime.utcnow(),
 	)
-	session.add(s)
-	await session.flush()
-	return s
+	stmt = stmt.on_conflict_do_update(
+		index_elements=constraint_columns(Scramble.__table__, "uq_scramble_attempt"),  # type: ignore[arg-type]
+		set_={name: stmt.excluded[name] for name in ("file_id", "file_path", "uploaded_at")},
+	)
+	return await session.scalar(stmt.returning(Scramble), execution_options={"populate_existing": True})  # type: ignore[return-value]
 
 
 async def list_by_competition_discipline(
@@ -50,3 +45,29 @@ async def list_by_competition_discipline(
 		).order_by(Scramble.attempt_number)
 	)
 	return list(rows)
+
+
+async def list_file_ids(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	expected: Optional[int] = None,
+) -> List[str]:
+	# Telegram file_ids in attempt order. When a round opens every competitor asks at once:
+	# hits come from scramble_cache and concurrent misses share a single query. A list read
+	# before the upload finished (empty, or shorter than the expected attempts) is not cached:
+	# the process that took the upload may be another one, without Redis to warm this one.
+	async def load() -> List[str]:
+		return [s.file_id for s in await list_by_competition_discipline(session, competition_id, discipline_id) if s.file_id]
+
+	def complete(file_ids: List[str]) -> bool:
+		return bool(file_ids) and (expected is None or len(file_ids) >= expected)
+
+	return await scramble_cache.get_or_load((competition_id, discipline_id), load, keep=complete)
+
+
+async def cache_file_ids(competition_id: int, discipline_id: int, file_ids: List[str]) -> None:
+	# Call after committing an upload: replaces whatever was cached (or is being loaded), warm
+	# for the first request
+	if file_ids:
+		await scramble_cache.set((competition_id, discipline_id), list(file_ids))
@@ -0,0 +1,72 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import LeaderboardSubscription
+
+
+async def subscribe(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	chat_id: int,
+	message_id: int,
+	user_id: Optional[int],
+	text_hash: str,
+) -> Optional[int]:
+	# Following the same table again from a chat moves the subscription to the new message.
+	# Returns the message it was on before (to unpin), None for a new subscription
+	existing = await session.scalar(
+		select(LeaderboardSubscription).where(
+			LeaderboardSubscription.chat_id == chat_id,
+			LeaderboardSubscription.competition_id == competition_id,
+			LeaderboardSubscription.discipline_id == discipline_id,
+		)
+	)
+	if existing:
+		previous = existing.message_id
+		existing.message_id = message_id
+		existing.user_id = user_id
+		existing.text_hash = text_hash
+		await session.flush()
+		return previous
+	session.add(LeaderboardSubscription(
+		competition_id=competition_id,
+		discipline_id=discipline_id,
+		chat_id=chat_id,
+		message_id=message_id,
+		user_id=user_id,
+		text_hash=text_hash,
+	))
+	await session.flush()
+	return None
+
+
+async def unsubscribe(session: AsyncSession, competition_id: int, discipline_id: int, chat_id: int) -> Optional[int]:
+	# Returns the followed message id (to unpin), None if the chat did not follow this table
+	return await session.scalar(
+		delete(LeaderboardSubscription)
+		.where(
+			LeaderboardSubscription.chat_id == chat_id,
+			LeaderboardSubscription.competition_id == competition_id,
+			LeaderboardSubscription.discipline_id == discipline_id,
+		)
+		.returning(LeaderboardSubscription.message_id)
+	)
+
+
+async def list_for_discipline(session: AsyncSession, competition_id: int, discipline_id: int) -> List[LeaderboardSubscription]:
+	rows = await session.scalars(
+		select(LeaderboardSubscription).where(
+			LeaderboardSubscription.competition_id == competition_id,
+			LeaderboardSubscription.discipline_id == discipline_id,
+		)
+	)
+	return list(rows)
+
+
+async def delete_by_ids(session: AsyncSession, ids: Iterable[int]) -> None:
+	ids = list(ids)
+	if ids:
+		await session.execute(delete(LeaderboardSubscription).where(LeaderboardSubscription.id.in_(ids)))
@@ -1,13 +1,16 @@
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 
+# built once, see competition._BY_CODE
+_BY_TELEGRAM_ID = select(User).where(User.telegram_id == bindparam("telegram_id"))
+
 
 async def get_by_telegram_id(session: AsyncSession, telegram_id: int) -> Optional[User]:
-	return await session.scalar(select(User).where(User.telegram_id == telegram_id))
+	return await session.scalar(_BY_TELEGRAM_ID, {"telegram_id": telegram_id})
 
 
 async def create_user(session: AsyncSession, telegram_id: int, first_name: str, last_name: str, username: Optional[str] = None, role: str = "participant") -> User:
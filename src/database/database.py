@@ -1,19 +1,44 @@
-from typing import AsyncGenerator
+import asyncio
+from typing import Any, Dict
 
+from loguru import logger
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import QueuePool
 
 from src.config.settings import settings
+from src.database.pool import InstrumentedPool, pool_metrics
 
 
 class Base(DeclarativeBase):
 	pass
 
 
+def _engine_options(url: str) -> Dict[str, Any]:
+	# SQLite (tests, benchmarks) keeps the dialect's default pool
+	parsed = make_url(url)
+	if parsed.get_backend_name() == "sqlite":
+		return {}
+	options: Dict[str, Any] = {
+		"poolclass": InstrumentedPool,
+		"pool_size": settings.db_pool_size,
+		"max_overflow": settings.db_max_overflow,
+		"pool_timeout": settings.db_pool_timeout,
+		"pool_recycle": settings.db_pool_recycle,
+		"pool_pre_ping": settings.db_pool_pre_ping,
+	}
+	if parsed.get_driver_name() == "asyncpg":
+		# prepared statements kept per connection, by SQL text: a hot query is parsed and planned
+		# by the server once per connection instead of on every call
+		options["connect_args"] = {"prepared_statement_cache_size": settings.db_prepared_statement_cache_size}
+	return options
+
+
 engine = create_async_engine(
 	settings.database_url,
 	echo=False,
-	pool_pre_ping=True,
+	**_engine_options(settings.database_url),
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -23,7 +48,15 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-	async with AsyncSessionLocal() as session:
-		yield session
+def pool_stats() -> Dict[str, Any]:
+	stats = pool_metrics.stats()
+	pool = engine.pool
+	if isinstance(pool, QueuePool):
+		stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=max(0, pool.overflow()))
+	return stats
+
 
+async def log_pool_stats(interval: float) -> None:
+	while True:
+		await asyncio.sleep(interval)
+		logger.info("DB pool: {}", pool_stats())
@@ -1,11 +1,10 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from sqlalchemy import (
 	Boolean,
-	CheckConstraint,
 	Column,
 	DateTime,
 	Enum,
@@ -19,6 +18,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
+from .types import PackedAttempts
 
 
 UserRole = Enum(
@@ -142,17 +142,12 @@ class Result(Base):
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 	participant_id: Mapped[int] = mapped_column(ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
 	discipline_id: Mapped[int] = mapped_column(ForeignKey("disciplines.id", ondelete="CASCADE"), nullable=False)
+	# copied from the participant on insert so per-competition reads need no join
+	competition_id: Mapped[int] = mapped_column(ForeignKey("competitions.id", ondelete="CASCADE"), nullable=False)
+	user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
-	attempt_1_time: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
-	attempt_1_dnf: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
-	attempt_2_time: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
-	attempt_2_dnf: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
-	attempt_3_time: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
-	attempt_3_dnf: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
-	attempt_4_time: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
-	attempt_4_dnf: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
-	attempt_5_time: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
-	attempt_5_dnf: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+	# one slot per attempt of the discipline, None for a DNF (see PackedAttempts)
+	attempts: Mapped[List[Optional[int]]] = mapped_column(PackedAttempts, nullable=False, default=list)
 
 	average_time: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 	average_dnf: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
@@ -165,10 +160,16 @@ class Result(Base):
 
 	__table_args__ = (
 		UniqueConstraint("participant_id", "discipline_id", name="uq_results_participant_discipline"),
-		Index("ix_results_participant_discipline", "participant_id", "discipline_id"),
-		CheckConstraint(
-			"attempt_1_time >= 0 OR attempt_1_time IS NULL",
-			name="ck_result_attempt_1_time_non_negative",
+		# /my_results and upserts read a participant's rows from the index alone on PostgreSQL
+		Index(
+			"ix_results_participant_discipline", "participant_id", "discipline_id",
+			postgresql_include=["average_time", "average_dnf", "best_time", "updated_at"],
+		),
+		# a competition's discipline results in ranking order: leaderboard reads and rank counts are
+		# single-table range scans; updated_at serves the staleness check on PostgreSQL
+		Index(
+			"ix_results_comp_disc_rank", "competition_id", "discipline_id", "average_dnf", "average_time", "best_time", "user_id",
+			postgresql_include=["updated_at"],
 		),
 	)
 
@@ -177,7 +178,10 @@ class Leaderboard(Base):
 	__tablename__ = "leaderboards"
 	__table_args__ = (
 		UniqueConstraint("competition_id", "discipline_id", "user_id", name="uq_leaderboard_unique"),
-		Index("ix_leaderboards_comp_disc", "competition_id", "discipline_id"),
+		# stored table in display order: pages are read without sorting
+		Index("ix_leaderboards_comp_disc_order", "competition_id", "discipline_id", "average_dnf", "position", "user_id"),
+		# overall standings join each participant to their discipline rows
+		Index("ix_leaderboards_comp_user", "competition_id", "user_id", postgresql_include=["points"]),
 	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -200,7 +204,7 @@ class OverallLeaderboard(Base):
 	__tablename__ = "overall_leaderboard"
 	__table_args__ = (
 		UniqueConstraint("competition_id", "user_id", name="uq_overall_unique"),
-		Index("ix_overall_competition", "competition_id"),
+		Index("ix_overall_comp_position", "competition_id", "position", "user_id"),
 	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -213,3 +217,23 @@ class OverallLeaderboard(Base):
 
 	competition: Mapped["Competition"] = relationship(back_populates="overall")
 	user: Mapped["User"] = relationship()
+
+
+class LeaderboardSubscription(Base):
+	# A chat following a discipline table through one pinned message that the bot keeps editing
+	__tablename__ = "leaderboard_subscriptions"
+	__table_args__ = (
+		UniqueConstraint("chat_id", "competition_id", "discipline_id", name="uq_subscription_chat"),
+		Index("ix_subscriptions_comp_disc", "competition_id", "discipline_id"),
+	)
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+	competition_id: Mapped[int] = mapped_column(ForeignKey("competitions.id", ondelete="CASCADE"), nullable=False)
+	discipline_id: Mapped[int] = mapped_column(ForeignKey("disciplines.id", ondelete="CASCADE"), nullable=False)
+	# the follower's own place decides which page they see; None shows the first page
+	user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+	chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+	message_id: Mapped[int] = mapped_column(Integer, nullable=False)
+	# digest of the text the message shows; an unchanged page is not edited
+	text_hash: Mapped[str] = mapped_column(String(40), nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
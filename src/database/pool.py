@@ -0,0 +1,86 @@
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+
+# Counters for the connection pool of this process, read with stats()
+class PoolMetrics:
+	def __init__(self) -> None:
+		self.reset()
+
+	def reset(self) -> None:
+		self.checkouts = 0
+		self.waits = 0
+		self.wait_time = 0.0
+		self.max_wait = 0.0
+		self.timeouts = 0
+		self.peak_overflow = 0
+		self.connects = 0
+		self.closes = 0
+		self.lifetime_total = 0.0
+		self.max_lifetime = 0.0
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"checkouts": self.checkouts,
+			"waits": self.waits,
+			"avg_wait": self.wait_time / self.waits if self.waits else 0.0,
+			"max_wait": self.max_wait,
+			"timeouts": self.timeouts,
+			"peak_overflow": self.peak_overflow,
+			"connects": self.connects,
+			"closes": self.closes,
+			"avg_lifetime": self.lifetime_total / self.closes if self.closes else 0.0,
+			"max_lifetime": self.max_lifetime,
+		}
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+	def __init__(self, *args: Any, **kw: Any) -> None:
+		# recreate() (engine.dispose) hands the existing listeners over in _dispatch
+		recreated = kw.get("_dispatch") is not None
+		super().__init__(*args, **kw)
+		if not recreated:
+			event.listen(self, "connect", _on_connect)
+			event.listen(self, "checkout", _on_checkout)
+			event.listen(self, "close", _on_close)
+
+	# A checkout waits when the idle connections and the overflow are both used up; that
+	# is the saturation we want to see when everyone asks for scrambles at once
+	def _do_get(self) -> ConnectionPoolEntry:
+		saturated = self._max_overflow > -1 and self._overflow >= self._max_overflow and self._pool.empty()
+		started = time.perf_counter()
+		try:
+			record = super()._do_get()
+		except exc.TimeoutError:
+			pool_metrics.timeouts += 1
+			raise
+		finally:
+			if saturated:
+				waited = time.perf_counter() - started
+				pool_metrics.waits += 1
+				pool_metrics.wait_time += waited
+				pool_metrics.max_wait = max(pool_metrics.max_wait, waited)
+		pool_metrics.peak_overflow = max(pool_metrics.peak_overflow, self.overflow())
+		return record
+
+
+def _on_connect(dbapi_connection: Any, record: ConnectionPoolEntry) -> None:
+	pool_metrics.connects += 1
+
+
+def _on_checkout(dbapi_connection: Any, record: ConnectionPoolEntry, proxy: Any) -> None:
+	pool_metrics.checkouts += 1
+
+
+def _on_close(dbapi_connection: Any, record: ConnectionPoolEntry) -> None:
+	# fired on recycle, invalidation and dispose; starttime is set when the record connects
+	lifetime = time.time() - record.starttime  # type: ignore[attr-defined]
+	pool_metrics.closes += 1
+	pool_metrics.lifetime_total += lifetime
+	pool_metrics.max_lifetime = max(pool_metrics.max_lifetime, lifetime)
@@ -0,0 +1,31 @@
+import struct
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+# Attempt times in milliseconds packed as big-endian int32, one slot per attempt, DNF as -1.
+# Big-endian matches PostgreSQL's int4send(), which the migrations use to pack in SQL.
+DNF_SENTINEL = -1
+_SLOT = struct.Struct(">i")
+
+
+def pack_attempts(attempts: Sequence[Optional[int]]) -> bytes:
+	return struct.pack(f">{len(attempts)}i", *(DNF_SENTINEL if t is None else t for t in attempts))
+
+
+def unpack_attempts(raw: bytes) -> List[Optional[int]]:
+	return [None if t == DNF_SENTINEL else t for t in struct.unpack(f">{len(raw) // _SLOT.size}i", raw)]
+
+
+class PackedAttempts(TypeDecorator):
+	# List[Optional[int]] on the Python side (None is a DNF), 4 bytes per attempt in the row.
+	# The length is the discipline's attempts count, so no slot is stored for attempts a format lacks.
+	impl = LargeBinary
+	cache_ok = True
+
+	def process_bind_param(self, value: Any, dialect: Any) -> Optional[bytes]:
+		return None if value is None else pack_attempts(value)
+
+	def process_result_value(self, value: Any, dialect: Any) -> Optional[List[Optional[int]]]:
+		return None if value is None else unpack_attempts(bytes(value))
@@ -1,4 +1,6 @@
-from typing import Optional, Sequence
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
 
 
 def get_best_time(attempts_ms: Sequence[Optional[int]]) -> Optional[int]:
@@ -45,3 +47,69 @@ def calculate_average_mean_of_3(attempts_ms: Sequence[Optional[int]]) -> tuple[O
 def calculate_best_of_3(attempts_ms: Sequence[Optional[int]]) -> tuple[Optional[int], bool]:
 	best = get_best_time(attempts_ms)
 	return (None, True) if best is None else (best, False)
+
+
+def score_attempts(attempts_ms: Sequence[Optional[int]], calc_type: str) -> tuple[Optional[int], bool]:
+	if calc_type == "ao5":
+		return calculate_average_ao5(attempts_ms)
+	if calc_type == "mean_of_3":
+		return calculate_average_mean_of_3(attempts_ms)
+	return calculate_best_of_3(attempts_ms)
+
+
+# Batch scoring: the same rules as the functions above, over an N×K matrix of attempt times
+# plus an N×K mask of DNF attempts (their time cells are ignored), in one NumPy pass.
+
+class BatchScores(NamedTuple):
+	average: np.ndarray  # int64, 0 where average_dnf
+	average_dnf: np.ndarray
+	best: np.ndarray  # int64, 0 where best_dnf (every attempt is a DNF)
+	best_dnf: np.ndarray
+
+	def rows(self) -> List[tuple[Optional[int], bool, Optional[int]]]:
+		# (average_ms, average_dnf, best_ms) per row, as the scalar functions return them
+		return [
+			(None if a_dnf else int(a), bool(a_dnf), None if b_dnf else int(b))
+			for a, a_dnf, b, b_dnf in zip(self.average, self.average_dnf, self.best, self.best_dnf)
+		]
+
+
+def attempts_matrix(rows: Sequence[Sequence[Optional[int]]], width: int) -> tuple[np.ndarray, np.ndarray]:
+	# None marks a DNF; rows are truncated or padded with DNFs to `width`. Times are never
+	# negative, so -1 can stand in for a DNF while the matrix is built.
+	flat = [
+		-1 if t is None else t
+		for row in rows
+		for t in (*row[:width], *([None] * (width - len(row))))
+	]
+	times = np.array(flat, dtype=np.int64).reshape(len(rows), width)
+	dnf = times < 0
+	return np.where(dnf, 0, times), dnf
+
+
+def score_batch(times: np.ndarray, dnf: np.ndarray, calc_type: str) -> BatchScores:
+	times = np.asarray(times, dtype=np.int64)
+	dnf = np.asarray(dnf, dtype=bool)
+	if times.ndim != 2 or times.shape != dnf.shape:
+		raise ValueError("times and dnf must be matrices of the same shape")
+	width = times.shape[1]
+	dnf_count = dnf.sum(axis=1)
+	best_dnf = dnf_count == width
+	best = np.where(dnf, np.iinfo(np.int64).max, times).min(axis=1, initial=np.iinfo(np.int64).max)
+	best = np.where(best_dnf, 0, best)
+	if calc_type == "ao5":
+		valid = np.where(dnf, 0, times)
+		worst = valid.max(axis=1, initial=0)
+		# drop the best, and the worst unless a DNF already is the worst; exactly 3 must remain
+		no_dnf = dnf_count == 0
+		counted = width - dnf_count - 1 - no_dnf
+		average_dnf = (dnf_count >= 2) | (counted != 3)
+		average = valid.sum(axis=1) - best - np.where(no_dnf, worst, 0)
+		average = np.where(average_dnf, 0, average // 3)
+	elif calc_type == "mean_of_3":
+		average_dnf = dnf_count > 0
+		average = np.where(average_dnf, 0, times.sum(axis=1) // 3)
+	else:
+		average_dnf = best_dnf
+		average = best
+	return BatchScores(average, average_dnf, best, best_dnf)
@@ -0,0 +1,162 @@
+import asyncio
+import csv
+from functools import partial
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.crud import discipline as discipline_crud
+from src.database.models import Discipline, Leaderboard, OverallLeaderboard, Result, User
+from src.services.leaderboard_service import refresh_stale_leaderboards
+
+# Rows are pulled from a server-side cursor this many at a time, so an export holds at most
+# one chunk in memory no matter how many competitors there are
+EXPORT_CHUNK = 1000
+
+LEADERBOARD_HEADER = [
+	"discipline", "position", "telegram_id", "username", "first_name", "last_name",
+	"average", "best", "points",
+]
+OVERALL_HEADER = [
+	"position", "telegram_id", "username", "first_name", "last_name",
+	"total_points", "disciplines_participated",
+]
+
+
+def results_header(width: int) -> List[str]:
+	# one attempt_N column per attempt of the longest format in the competition
+	return [
+		"discipline", "telegram_id", "username", "first_name", "last_name",
+		*(f"attempt_{i}" for i in range(1, width + 1)),
+		"average", "best",
+	]
+
+
+def attempt_text(ms: Optional[int]) -> str:
+	# same X.Y.Z notation /submit_results and /import_results accept, so results.csv can be imported back
+	if ms is None:
+		return "DNF"
+	total_seconds, milli = divmod(ms, 1000)
+	minutes, seconds = divmod(total_seconds, 60)
+	return f"{minutes}.{seconds:02d}.{milli // 10:02d}"
+
+
+async def export_competition(session: AsyncSession, competition_id: int, directory: Path) -> List[Path]:
+	# Writes results.csv, leaderboard.csv and overall.csv into directory and returns their paths.
+	# Stale stored leaderboards are recalculated first; committing that is left to the caller.
+	await refresh_stale_leaderboards(session, competition_id)
+	disciplines = await discipline_crud.list_by_competition(session, competition_id)
+	width = max([5] + [d.attempts_count for d in disciplines])
+	files = []
+	for name, header, write in (
+		("results.csv", results_header(width), partial(write_results, width=width)),
+		("leaderboard.csv", LEADERBOARD_HEADER, write_leaderboards),
+		("overall.csv", OVERALL_HEADER, write_overall),
+	):
+		path = directory / name
+		# BOM so spreadsheet programs pick up UTF-8 names
+		with path.open("w", newline="", encoding="utf-8-sig") as stream:
+			writer = csv.writer(stream)
+			writer.writerow(header)
+			await write(session, competition_id, writer)
+		files.append(path)
+	return files
+
+
+async def write_results(session: AsyncSession, competition_id: int, writer: Any, width: int = 5) -> int:
+	stmt = (
+		select(
+			Discipline.code,
+			User.telegram_id,
+			User.username,
+			User.first_name,
+			User.last_name,
+			Result.attempts,
+			Result.average_time,
+			Result.average_dnf,
+			Result.best_time,
+		)
+		.join(User, User.id == Result.user_id)
+		.join(Discipline, Discipline.id == Result.discipline_id)
+		.where(Result.competition_id == competition_id)
+		.order_by(Discipline.id, Result.id)
+	)
+
+	def row(r: Any) -> Sequence[Any]:
+		times = [attempt_text(t) for t in r.attempts]
+		times += [""] * (width - len(times))
+		return [
+			r.code, r.telegram_id, r.username or "", r.first_name, r.last_name,
+			*times,
+			attempt_text(None if r.average_dnf else r.average_time), attempt_text(r.best_time),
+		]
+
+	return await _stream_rows(session, stmt, writer, row)
+
+
+async def write_leaderboards(session: AsyncSession, competition_id: int, writer: Any) -> int:
+	stmt = (
+		select(
+			Discipline.code,
+			Leaderboard.position,
+			User.telegram_id,
+			User.username,
+			User.first_name,
+			User.last_name,
+			Leaderboard.average_time,
+			Leaderboard.average_dnf,
+			Leaderboard.best_time,
+			Leaderboard.points,
+		)
+		.join(User, User.id == Leaderboard.user_id)
+		.join(Discipline, Discipline.id == Leaderboard.discipline_id)
+		.where(Leaderboard.competition_id == competition_id)
+		.order_by(Discipline.id, Leaderboard.average_dnf, Leaderboard.position, Leaderboard.user_id)
+	)
+
+	def row(r: Any) -> Sequence[Any]:
+		return [
+			r.code, "" if r.average_dnf else r.position, r.telegram_id, r.username or "", r.first_name, r.last_name,
+			attempt_text(None if r.average_dnf else r.average_time), attempt_text(r.best_time), r.points,
+		]
+
+	return await _stream_rows(session, stmt, writer, row)
+
+
+async def write_overall(session: AsyncSession, competition_id: int, writer: Any) -> int:
+	stmt = (
+		select(
+			OverallLeaderboard.position,
+			User.telegram_id,
+			User.username,
+			User.first_name,
+			User.last_name,
+			OverallLeaderboard.total_points,
+			OverallLeaderboard.disciplines_participated,
+		)
+		.join(User, User.id == OverallLeaderboard.user_id)
+		.where(OverallLeaderboard.competition_id == competition_id)
+		.order_by(OverallLeaderboard.position, OverallLeaderboard.user_id)
+	)
+
+	def row(r: Any) -> Sequence[Any]:
+		return [
+			r.position, r.telegram_id, r.username or "", r.first_name, r.last_name,
+			r.total_points, r.disciplines_participated,
+		]
+
+	return await _stream_rows(session, stmt, writer, row)
+
+
+async def _stream_rows(session: AsyncSession, stmt: Any, writer: Any, row: Any) -> int:
+	# yield_per makes session.stream fetch through a server-side cursor in fixed-size chunks
+	result = await session.stream(stmt.execution_options(yield_per=EXPORT_CHUNK))
+	count = 0
+	async for partition in result.partitions():
+		# rows are built here, the file write runs in a thread so other updates keep being served
+		rows = [row(r) for r in partition]
+		await asyncio.to_thread(writer.writerows, rows)
+		count += len(partition)
+	return count
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.bot.send_scheduler import BULK, send_priority
+from src.config.settings import settings
+from src.database.crud import subscription as subscription_crud
+from src.database.models import Leaderboard, LeaderboardSubscription
+from src.services.leaderboard_service import format_leaderboard_message, get_stored_discipline_leaderboard, page_count
+
+# edits in flight at once; the send scheduler paces them further
+FOLLOW_EDIT_BATCH = 50
+
+
+def text_hash(text: str) -> str:
+	return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+async def render_followed_page(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	user_id: Optional[int],
+) -> str:
+	# The page a follower sees: the one with their own place, the first page otherwise
+	pages = await _follower_pages(session, competition_id, discipline_id, [user_id])
+	return (await _render_pages(session, competition_id, discipline_id, set(pages.values())))[pages[user_id]]
+
+
+async def push_leaderboard_updates(
+	bot: Bot,
+	session: AsyncSession,
+	competition_id: int,
+	discipline_ids: Iterable[int],
+) -> int:
+	# Called after a recalculation: each distinct page is read and rendered once, and only the
+	# followed messages whose page text changed are edited. Returns the number of edits sent.
+	edited = 0
+	for discipline_id in discipline_ids:
+		subscriptions = await subscription_crud.list_for_discipline(session, competition_id, discipline_id)
+		if not subscriptions:
+			continue
+		pages = await _follower_pages(session, competition_id, discipline_id, [s.user_id for s in subscriptions])
+		texts = await _render_pages(session, competition_id, discipline_id, set(pages.values()))
+		shown = [(s, texts[pages[s.user_id]]) for s in subscriptions]
+		changed = [(s, text) for s, text in shown if text_hash(text) != s.text_hash]
+		gone: List[int] = []
+		with send_priority(BULK):
+			for start in range(0, len(changed), FOLLOW_EDIT_BATCH):
+				batch = changed[start:start + FOLLOW_EDIT_BATCH]
+				outcomes = await asyncio.gather(*(_edit(bot, s, text) for s, text in batch))
+				for (s, text), outcome in zip(batch, outcomes):
+					if outcome is None:
+						continue
+					if outcome:
+						s.text_hash = text_hash(text)
+						edited += 1
+					else:
+						gone.append(s.id)
+		await subscription_crud.delete_by_ids(session, gone)
+		await session.commit()
+	return edited
+
+
+async def _follower_pages(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	user_ids: List[Optional[int]],
+) -> Dict[Optional[int], int]:
+	size = settings.leaderboard_page_size
+	pages: Dict[Optional[int], int] = {user_id: 0 for user_id in user_ids}
+	known = [user_id for user_id in user_ids if user_id is not None]
+	if known:
+		rows = await session.execute(
+			select(Leaderboard.user_id, Leaderboard.position)
+			.where(
+				Leaderboard.competition_id == competition_id,
+				Leaderboard.discipline_id == discipline_id,
+				Leaderboard.average_dnf.is_(False),
+				Leaderboard.user_id.in_(known),
+			)
+		)
+		for user_id, position in rows:
+			if position:
+				pages[user_id] = (position - 1) // size
+	return pages
+
+
+async def _render_pages(session: AsyncSession, competition_id: int, discipline_id: int, wanted: Set[int]) -> Dict[int, str]:
+	size = settings.leaderboard_page_size
+	total = await session.scalar(
+		select(func.count())
+		.select_from(Leaderboard)
+		.where(Leaderboard.competition_id == competition_id, Leaderboard.discipline_id == discipline_id)
+	)
+	pages = page_count(total or 0, size)
+	texts: Dict[int, str] = {}
+	for page in sorted(wanted):
+		shown = min(page, pages - 1)
+		if shown not in texts:
+			items = await get_stored_discipline_leaderboard(session, competition_id, discipline_id, offset=shown * size, limit=size)
+			texts[shown] = format_leaderboard_message(items, shown, pages)
+		texts[page] = texts[shown]
+	return texts
+
+
+async def _edit(bot: Bot, subscription: LeaderboardSubscription, text: str) -> Optional[bool]:
+	# True: the message shows the text, False: it is gone for good, None: try again next time
+	try:
+		await bot.edit_message_text(text, chat_id=subscription.chat_id, message_id=subscription.message_id)
+	except TelegramBadRequest as e:
+		if "message is not modified" in e.message:
+			return True
+		if "message to edit not found" in e.message:
+			return False
+		logger.warning("Leaderboard edit failed in chat {}: {}", subscription.chat_id, e.message)
+		return None
+	except TelegramForbiddenError:
+		# blocked by the user or removed from the group
+		return False
+	except TelegramAPIError as e:
+		logger.warning("Leaderboard edit failed in chat {}: {}", subscription.chat_id, e)
+		return None
+	return True
@@ -0,0 +1,254 @@
+import asyncio
+import csv
+import itertools
+import json
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.bot.utils.validators import time_to_milliseconds, validate_time_format
+from src.database.bulk import bulk_upsert
+from src.database.crud import discipline as discipline_crud
+from src.database.crud import participant as participant_crud
+from src.database.models import Discipline, Result
+from src.services.calculation_service import attempts_matrix, score_batch
+from src.services.leaderboard_service import calculate_discipline_leaderboard, calculate_overall_leaderboard
+
+MAX_REPORTED_ERRORS = 20
+_JSON_CHUNK = 64 * 1024
+# an array element still undecoded after this many characters is malformed (records are tiny)
+_JSON_MAX_ELEMENT = 4 * _JSON_CHUNK
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+Record = Tuple[int, Dict[str, Any]]
+
+
+# Row sources: (row number, record) pairs read one at a time from a text stream.
+# CSV needs a header with `discipline`, `telegram_id` or `username`, and attempt_1..attempt_N.
+# JSON is either a top-level array of objects or JSON Lines; an object may carry its times
+# as an `attempts` list instead of attempt_N keys.
+
+def iter_csv(stream: TextIO) -> Iterator[Record]:
+	reader = csv.DictReader(stream)
+	for record in reader:
+		yield reader.line_num, record
+
+
+def iter_json(stream: TextIO) -> Iterator[Record]:
+	head = stream.read(_JSON_CHUNK)
+	stripped = head.lstrip()
+	if stripped.startswith("["):
+		yield from _iter_json_array(stream, stripped[1:])
+		return
+	for number, line in enumerate(_lines(head, stream), start=1):
+		if line.strip():
+			yield number, json.loads(line)
+
+
+def _lines(head: str, stream: TextIO) -> Iterator[str]:
+	rest = head + stream.readline()
+	yield from rest.splitlines()
+	yield from stream
+
+
+def _iter_json_array(stream: TextIO, buf: str) -> Iterator[Record]:
+	# Decodes one element at a time from pos, reading more text only when an element is cut
+	# off. A malformed one raises its decode error once _JSON_MAX_ELEMENT characters past it are
+	# buffered, instead of growing and re-decoding the buffer until the end of the file.
+	decoder = json.JSONDecoder()
+	number = 0
+	pos = 0
+	eof = False
+	while True:
+		pos = _WHITESPACE.match(buf, pos).end()  # type: ignore[union-attr]
+		if buf.startswith(",", pos):
+			pos = _WHITESPACE.match(buf, pos + 1).end()  # type: ignore[union-attr]
+		if buf.startswith("]", pos):
+			return
+		try:
+			if pos == len(buf):
+				raise json.JSONDecodeError("Expecting value", buf, pos)
+			record, pos = decoder.raw_decode(buf, pos)
+		except json.JSONDecodeError:
+			if eof or len(buf) - pos > _JSON_MAX_ELEMENT:
+				raise
+			chunk = stream.read(_JSON_CHUNK)
+			eof = not chunk
+			buf = buf[pos:] + chunk
+			pos = 0
+			continue
+		number += 1
+		yield number, record
+
+
+class ImportReport:
+	def __init__(self) -> None:
+		self.imported = 0
+		self.rows = 0
+		self.errors: List[Tuple[int, str]] = []
+		self.error_count = 0
+		self.discipline_ids: List[int] = []
+		self.elapsed = 0.0
+
+	def error(self, number: int, message: str) -> None:
+		self.error_count += 1
+		if len(self.errors) < MAX_REPORTED_ERRORS:
+			self.errors.append((number, message))
+
+	@property
+	def rows_per_second(self) -> float:
+		return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+async def import_results(
+	session: AsyncSession,
+	competition_id: int,
+	records: Iterable[Record],
+	batch_size: int = 1000,
+	recalculate: bool = True,
+) -> ImportReport:
+	# Validates every record, scores each batch per discipline with score_batch and writes it
+	# with one INSERT ... ON CONFLICT on uq_results_participant_discipline. The leaderboards of
+	# the touched disciplines are rebuilt at the end unless recalculate is False (the leaderboard
+	# worker is running: the caller marks report.discipline_ids dirty after its commit);
+	# committing is left to the caller.
+	started = time.perf_counter()
+	report = ImportReport()
+	disciplines = discipline_crud.to_code_map(await discipline_crud.list_by_competition(session, competition_id))
+	by_telegram_id: Dict[int, int] = {}
+	by_username: Dict[str, int] = {}
+	user_ids: Dict[int, int] = {}
+	for participant_id, user_id, telegram_id, username in await participant_crud.list_identities(session, competition_id):
+		user_ids[participant_id] = user_id
+		by_telegram_id[telegram_id] = participant_id
+		if username:
+			by_username[username.lower()] = participant_id
+
+	# (participant, discipline) -> attempts; a later row for the same pair replaces the earlier one
+	pending: Dict[Tuple[int, int], List[Optional[int]]] = {}
+	touched = set()
+	rows = iter(records)
+	while True:
+		# reading the file and decoding and validating its rows is blocking work: done a batch at
+		# a time in a thread, the event loop only collects the results and writes them
+		batch = await asyncio.to_thread(_parse_batch, rows, batch_size, disciplines, by_telegram_id, by_username)
+		if not batch:
+			break
+		for number, parsed in batch:
+			report.rows += 1
+			if isinstance(parsed, str):
+				report.error(number, parsed)
+				continue
+			participant_id, discipline_id, attempts_ms = parsed
+			pending[(participant_id, discipline_id)] = attempts_ms
+			touched.add(discipline_id)
+			if len(pending) >= batch_size:
+				report.imported += await _write_batch(session, competition_id, user_ids, pending, disciplines)
+				pending = {}
+	report.imported += await _write_batch(session, competition_id, user_ids, pending, disciplines)
+
+	report.discipline_ids = sorted(touched)
+	if recalculate:
+		for discipline_id in report.discipline_ids:
+			await calculate_discipline_leaderboard(session, competition_id, discipline_id)
+		if touched:
+			await calculate_overall_leaderboard(session, competition_id)
+	report.elapsed = time.perf_counter() - started
+	return report
+
+
+def _parse_batch(
+	records: Iterator[Record],
+	size: int,
+	disciplines: Dict[str, Discipline],
+	by_telegram_id: Dict[int, int],
+	by_username: Dict[str, int],
+) -> List[Tuple[int, Union[str, Tuple[int, int, List[Optional[int]]]]]]:
+	return [
+		(number, _parse_record(record, disciplines, by_telegram_id, by_username))
+		for number, record in itertools.islice(records, size)
+	]
+
+
+def _parse_record(
+	record: Any,
+	disciplines: Dict[str, Discipline],
+	by_telegram_id: Dict[int, int],
+	by_username: Dict[str, int],
+) -> Union[str, Tuple[int, int, List[Optional[int]]]]:
+	# (participant_id, discipline_id, attempts_ms), or an error message for the organizer
+	if not isinstance(record, dict):
+		return "ожидался объект с полями discipline, telegram_id/username и попытками"
+	disc = disciplines.get(str(record.get("discipline") or "").strip().lower())
+	if disc is None:
+		return f"дисциплина {record.get('discipline')!r} не входит в соревнование"
+
+	participant_id = None
+	# 0 is an id, not a missing one
+	raw_id = record.get("telegram_id")
+	telegram_id = "" if raw_id is None else str(raw_id).strip()
+	username = str(record.get("username") or "").strip().lstrip("@").lower()
+	if telegram_id:
+		if not telegram_id.lstrip("-").isdigit():
+			return f"неверный telegram_id {telegram_id!r}"
+		participant_id = by_telegram_id.get(int(telegram_id))
+	elif username:
+		participant_id = by_username.get(username)
+	else:
+		return "не указан участник (telegram_id или username)"
+	if participant_id is None:
+		return f"участник {telegram_id or '@' + username} не зарегистрирован на соревнование"
+
+	raw = record.get("attempts")
+	if raw is None:
+		raw = [value for key, value in record.items() if _is_attempt_key(key)]
+	elif isinstance(raw, str):
+		raw = raw.split(",")
+	items = [str(x).strip() for x in raw if x is not None and str(x).strip()]
+	if len(items) != disc.attempts_count:
+		return f"ожидалось {disc.attempts_count} попыток, получено {len(items)}"
+	bad = [x for x in items if not validate_time_format(x)]
+	if bad:
+		return f"неверный формат времени: {', '.join(bad)}"
+	return participant_id, disc.id, [time_to_milliseconds(x) for x in items]
+
+
+def _is_attempt_key(key: Any) -> bool:
+	return isinstance(key, str) and key.startswith("attempt_") and key[len("attempt_"):].isdigit()
+
+
+async def _write_batch(
+	session: AsyncSession,
+	competition_id: int,
+	user_ids: Dict[int, int],
+	pending: Dict[Tuple[int, int], List[Optional[int]]],
+	disciplines: Dict[str, Discipline],
+) -> int:
+	if not pending:
+		return 0
+	# updated_at marks the stored leaderboards stale; submitted_at keeps its insert-only default
+	now = datetime.utcnow()
+	rows = []
+	for disc in disciplines.values():
+		keys = [key for key in pending if key[1] == disc.id]
+		if not keys:
+			continue
+		attempts = [pending[key] for key in keys]
+		scores = score_batch(*attempts_matrix(attempts, disc.attempts_count), disc.average_calculation_type).rows()
+		for (participant_id, discipline_id), attempts_ms, (average_ms, average_dnf, best_ms) in zip(keys, attempts, scores):
+			rows.append({
+				"participant_id": participant_id,
+				"discipline_id": discipline_id,
+				"competition_id": competition_id,
+				"user_id": user_ids[participant_id],
+				"attempts": attempts_ms,
+				"average_time": average_ms,
+				"average_dnf": average_dnf,
+				"best_time": best_ms,
+				"updated_at": now,
+			})
+	await bulk_upsert(session, Result, rows, constraint="uq_results_participant_discipline")
+	return len(rows)
@@ -1,12 +1,15 @@
-from typing import Any, List, Dict, Tuple
+from datetime import datetime
+from typing import Any, List, Dict, Optional, Tuple
 
-from sqlalchemy import select, delete
+from sqlalchemy import and_, delete, func, or_, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.database.bulk import bulk_upsert
 from src.database.models import (
 	User,
 	Participant,
 	Result,
+	CompetitionDiscipline,
 	Leaderboard,
 	OverallLeaderboard,
 )
@@ -19,6 +22,8 @@ async def calculate_discipline_leaderboard(
 	discipline_id: int,
 	store: bool = True,
 ) -> List[Dict[str, Any]]:
+	# stamp before reading: results submitted meanwhile stay newer than calculated_at
+	calculated_at = datetime.utcnow()
 	rows = await session.execute(
 		select(
 			User.id.label("user_id"),
@@ -28,23 +33,23 @@ async def calculate_discipline_leaderboard(
 			Result.average_dnf,
 			Result.best_time,
 		)
-		.join(Participant, Participant.user_id == User.id)
-		.join(Result, Result.participant_id == Participant.id)
+		.join(Result, Result.user_id == User.id)
 		.where(
-			Participant.competition_id == competition_id,
+			Result.competition_id == competition_id,
 			Result.discipline_id == discipline_id,
 		)
 	)
 	items = [dict(r._mapping) for r in rows]
 	# count non-DNF for points later
 	non_dnf_count = sum(1 for it in items if not it["average_dnf"])
-	# sort: DNF last; otherwise by average_time asc; tiebreak by best_time asc
-	def sort_key(it: Dict[str, Any]) -> Tuple[int, int | float, int | float]:
+	# sort: DNF last; otherwise by average_time asc; tiebreak by best_time, then user_id, so that
+	# every competitor has a place of their own (the same order get_discipline_rank counts in)
+	def sort_key(it: Dict[str, Any]) -> Tuple[int, int | float, int | float, int]:
 		if it["average_dnf"]:
-			return (1, float("inf"), float("inf"))
+			return (1, float("inf"), float("inf"), it["user_id"])
 		avg = it["average_time"] if it["average_time"] is not None else 10**12
 		best = it["best_time"] if it["best_time"] is not None else 10**12
-		return (0, avg, best)
+		return (0, avg, best, it["user_id"])
 
 	items.sort(key=sort_key)
 	# assign positions and points
@@ -53,76 +58,398 @@ async def calculate_discipline_leaderboard(
 		it["points"] = 0 if it["average_dnf"] else calculate_points_for_discipline(idx, len(items), len(items) - non_dnf_count)
 
 	if store:
-		# clear old rows and insert new
+		await bulk_upsert(
+			session,
+			Leaderboard,
+			[
+				{
+					"competition_id": competition_id,
+					"discipline_id": discipline_id,
+					"user_id": it["user_id"],
+					"position": it["position"] or 0,
+					"average_time": it["average_time"],
+					"average_dnf": it["average_dnf"],
+					"best_time": it["best_time"],
+					"points": it["points"],
+					"calculated_at": calculated_at,
+				}
+				for it in items
+			],
+			constraint="uq_leaderboard_unique",
+		)
+		# rows not refreshed above belong to users who no longer have a result
 		await session.execute(
 			delete(Leaderboard).where(
 				Leaderboard.competition_id == competition_id,
 				Leaderboard.discipline_id == discipline_id,
+				Leaderboard.calculated_at < calculated_at,
 			)
 		)
-		for it in items:
-			lb = Leaderboard(
-				competition_id=competition_id,
-				discipline_id=discipline_id,
-				user_id=it["user_id"],
-				position=it["position"] or 0,
-				average_time=it["average_time"],
-				average_dnf=it["average_dnf"],
-				best_time=it["best_time"],
-				points=it["points"],
-			)
-			session.add(lb)
-		await session.flush()
 	return items
 
 
+async def get_stored_discipline_leaderboard(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	offset: int = 0,
+	limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+	# Serve the materialized table as is, in the same shape calculate_discipline_leaderboard returns
+	rows = await session.execute(
+		select(
+			Leaderboard.user_id,
+			User.first_name,
+			User.last_name,
+			Leaderboard.average_time,
+			Leaderboard.average_dnf,
+			Leaderboard.best_time,
+			Leaderboard.position,
+			Leaderboard.points,
+		)
+		.join(User, User.id == Leaderboard.user_id)
+		.where(
+			Leaderboard.competition_id == competition_id,
+			Leaderboard.discipline_id == discipline_id,
+		)
+		.order_by(Leaderboard.average_dnf, Leaderboard.position, Leaderboard.user_id)
+		.offset(offset)
+		.limit(limit)
+	)
+	items = [dict(r._mapping) for r in rows]
+	for it in items:
+		if it["average_dnf"]:
+			it["position"] = None
+	return items
+
+
+async def update_discipline_leaderboard_entry(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	user_id: int,
+	average_ms: Optional[int],
+	average_dnf: bool,
+	best_ms: Optional[int],
+) -> None:
+	# Incremental counterpart of calculate_discipline_leaderboard for a single upserted result:
+	# only the rows between the user's old and new place are shifted.
+	scope = (
+		Leaderboard.competition_id == competition_id,
+		Leaderboard.discipline_id == discipline_id,
+	)
+	# serialize concurrent updates of the same discipline table (no-op on SQLite)
+	await session.execute(
+		select(CompetitionDiscipline.id)
+		.where(
+			CompetitionDiscipline.competition_id == competition_id,
+			CompetitionDiscipline.discipline_id == discipline_id,
+		)
+		.with_for_update()
+	)
+	if await session.scalar(select(Leaderboard.id).where(*scope).limit(1)) is None:
+		# nothing materialized yet (first result or data from before incremental mode)
+		await calculate_discipline_leaderboard(session, competition_id, discipline_id, store=True)
+		return
+
+	# populate_existing: bulk recomputations bypass the identity map
+	current = await session.scalar(
+		select(Leaderboard)
+		.where(*scope, Leaderboard.user_id == user_id)
+		.execution_options(populate_existing=True)
+	)
+	old_pos = current.position if current is not None and not current.average_dnf else None
+	others = (*scope, Leaderboard.user_id != user_id, Leaderboard.average_dnf.is_(False))
+	new_pos = None
+	ranked_total = 0
+	if not average_dnf:
+		ranked_others, ahead = (await session.execute(
+			select(func.count(), func.count().filter(_ranks_before(average_ms, best_ms, user_id))).where(*others)
+		)).one()
+		new_pos = ahead + 1
+		ranked_total = ranked_others + 1
+
+	now = datetime.utcnow()
+	if old_pos is not None and new_pos is not None:
+		if new_pos < old_pos:
+			await _shift_rows(session, others, Leaderboard.position.between(new_pos, old_pos - 1), 1, -1, now)
+		elif new_pos > old_pos:
+			await _shift_rows(session, others, Leaderboard.position.between(old_pos + 1, new_pos), -1, 1, now)
+	elif new_pos is not None:
+		# one more ranked entry: rows behind move down, rows ahead gain a point
+		await _shift_rows(session, others, Leaderboard.position >= new_pos, 1, 0, now)
+		await _shift_rows(session, others, Leaderboard.position < new_pos, 0, 1, now)
+	elif old_pos is not None:
+		# one ranked entry less: rows behind move up, rows ahead lose a point
+		await _shift_rows(session, others, Leaderboard.position > old_pos, -1, 0, now)
+		await _shift_rows(session, others, Leaderboard.position < old_pos, 0, -1, now)
+
+	if current is None:
+		current = Leaderboard(competition_id=competition_id, discipline_id=discipline_id, user_id=user_id)
+		session.add(current)
+	current.position = new_pos or 0
+	current.average_time = average_ms
+	current.average_dnf = average_dnf
+	current.best_time = best_ms
+	current.points = 0 if new_pos is None else calculate_points_for_discipline(new_pos, ranked_total, 0)
+	current.calculated_at = now
+	await session.flush()
+
+
+async def get_discipline_rank(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	user_id: int,
+) -> Optional[int]:
+	# Place of one competitor straight from results: 1 + the number of non-DNF results ahead on
+	# (average_time, best_time, user_id), the order the stored tables use, so exact ties get
+	# distinct places there and here alike. Served by ix_results_comp_disc_rank, so nothing is
+	# sorted or materialized. None without a result or with a DNF average.
+	in_scope = (
+		Result.competition_id == competition_id,
+		Result.discipline_id == discipline_id,
+	)
+	mine = (await session.execute(
+		select(Result.average_time, Result.average_dnf, Result.best_time)
+		.where(*in_scope, Result.user_id == user_id)
+	)).first()
+	if mine is None or mine.average_dnf:
+		return None
+	ahead = await session.scalar(
+		select(func.count())
+		.select_from(Result)
+		.where(
+			*in_scope,
+			Result.average_dnf.is_(False),
+			# row-value comparison: a range on the index rather than an OR the planner cannot bound
+			tuple_(Result.average_time, Result.best_time, Result.user_id) < tuple_(mine.average_time, mine.best_time, user_id),
+		)
+	)
+	return (ahead or 0) + 1
+
+
+def _ranks_before(average_ms: Optional[int], best_ms: Optional[int], user_id: int):
+	# non-DNF rows that sort before the given result: (average_time, best_time, user_id) order
+	return or_(
+		Leaderboard.average_time < average_ms,
+		and_(Leaderboard.average_time == average_ms, Leaderboard.best_time < best_ms),
+		and_(Leaderboard.average_time == average_ms, Leaderboard.best_time == best_ms, Leaderboard.user_id < user_id),
+	)
+
+
+async def _shift_rows(
+	session: AsyncSession,
+	scope: Tuple[Any, ...],
+	window: Any,
+	position_delta: int,
+	points_delta: int,
+	now: datetime,
+) -> None:
+	await session.execute(
+		update(Leaderboard)
+		.where(*scope, window)
+		.values(
+			position=Leaderboard.position + position_delta,
+			points=Leaderboard.points + points_delta,
+			calculated_at=now,
+		)
+		.execution_options(synchronize_session=False)
+	)
+
+
 async def calculate_overall_leaderboard(
 	session: AsyncSession,
 	competition_id: int,
 	store: bool = True,
 ) -> List[Dict[str, Any]]:
-	# Sum points from Leaderboard per user
+	calculated_at = datetime.utcnow()
+	# Sum points per participant and rank in the database; equal totals share a position
+	total_points = func.coalesce(func.sum(Leaderboard.points), 0)
 	rows = await session.execute(
 		select(
 			User.id.label("user_id"),
 			User.first_name,
 			User.last_name,
+			total_points.label("total_points"),
+			func.count(Leaderboard.id).label("disciplines_participated"),
+			func.rank().over(order_by=total_points.desc()).label("position"),
 		)
 		.join(Participant, Participant.user_id == User.id)
+		.outerjoin(
+			Leaderboard,
+			and_(
+				Leaderboard.competition_id == Participant.competition_id,
+				Leaderboard.user_id == Participant.user_id,
+			),
+		)
 		.where(Participant.competition_id == competition_id)
+		.group_by(User.id, User.first_name, User.last_name)
+		.order_by(total_points.desc(), User.id)
 	)
-	participants = {r.user_id: {"user_id": r.user_id, "first_name": r.first_name, "last_name": r.last_name, "total_points": 0, "disciplines_participated": 0} for r in rows}
-	lb_rows = await session.execute(
-		select(Leaderboard.user_id, Leaderboard.points).where(Leaderboard.competition_id == competition_id)
-	)
-	for r in lb_rows:
-		u = participants.get(r.user_id)
-		if not u:
-			continue
-		u["total_points"] += r.points
-		u["disciplines_participated"] += 1
-	items = list(participants.values())
-	items.sort(key=lambda x: x["total_points"], reverse=True)
-	for idx, it in enumerate(items, start=1):
-		it["position"] = idx
+	items = [dict(r._mapping) for r in rows]
 
 	if store:
-		await session.execute(delete(OverallLeaderboard).where(OverallLeaderboard.competition_id == competition_id))
-		for it in items:
-			ol = OverallLeaderboard(
-				competition_id=competition_id,
-				user_id=it["user_id"],
-				total_points=it["total_points"],
-				disciplines_participated=it["disciplines_participated"],
-				position=it["position"],
+		await bulk_upsert(
+			session,
+			OverallLeaderboard,
+			[
+				{
+					"competition_id": competition_id,
+					"user_id": it["user_id"],
+					"total_points": it["total_points"],
+					"disciplines_participated": it["disciplines_participated"],
+					"position": it["position"],
+					"calculated_at": calculated_at,
+				}
+				for it in items
+			],
+			constraint="uq_overall_unique",
+		)
+		await session.execute(
+			delete(OverallLeaderboard).where(
+				OverallLeaderboard.competition_id == competition_id,
+				OverallLeaderboard.calculated_at < calculated_at,
 			)
-			session.add(ol)
-		await session.flush()
+		)
 	return items
 
 
-def format_leaderboard_message(leaderboard_data: List[Dict[str, Any]]) -> str:
-	lines = ["Таблица лидеров:"]
+async def get_discipline_leaderboard_page(
+	session: AsyncSession,
+	competition_id: int,
+	discipline_id: int,
+	page: int,
+	page_size: int,
+	recompute: bool = True,
+) -> Tuple[List[Dict[str, Any]], int]:
+	# One page (numbered from 0) of the stored table and the total number of rows: only page_size
+	# rows are read and rendered. A stale table is recalculated first (the caller commits then),
+	# unless recompute is off because the background worker keeps the tables current.
+	if recompute and await _discipline_is_stale(session, competition_id, discipline_id):
+		await calculate_discipline_leaderboard(session, competition_id, discipline_id, store=True)
+	total = await session.scalar(
+		select(func.count())
+		.select_from(Leaderboard)
+		.where(Leaderboard.competition_id == competition_id, Leaderboard.discipline_id == discipline_id)
+	)
+	items = await get_stored_discipline_leaderboard(
+		session, competition_id, discipline_id, offset=page * page_size, limit=page_size
+	)
+	return items, total or 0
+
+
+async def _discipline_is_stale(session: AsyncSession, competition_id: int, discipline_id: int) -> bool:
+	changed_at, calculated_at = (await session.execute(
+		select(
+			select(func.max(Result.updated_at))
+			.where(Result.competition_id == competition_id, Result.discipline_id == discipline_id)
+			.scalar_subquery(),
+			select(func.max(Leaderboard.calculated_at))
+			.where(Leaderboard.competition_id == competition_id, Leaderboard.discipline_id == discipline_id)
+			.scalar_subquery(),
+		)
+	)).one()
+	return changed_at is not None and (calculated_at is None or changed_at > calculated_at)
+
+
+async def refresh_stale_leaderboards(session: AsyncSession, competition_id: int) -> bool:
+	# Bring the stored discipline and overall tables up to date without reading them back
+	# (for callers that stream the tables themselves). Returns whether anything was written.
+	stale = await stale_discipline_ids(session, competition_id)
+	for discipline_id in stale:
+		await calculate_discipline_leaderboard(session, competition_id, discipline_id, store=True)
+	if stale or await overall_is_stale(session, competition_id):
+		await calculate_overall_leaderboard(session, competition_id, store=True)
+		return True
+	return False
+
+
+async def get_overall_leaderboard_page(
+	session: AsyncSession,
+	competition_id: int,
+	page: int,
+	page_size: int,
+	recompute: bool = True,
+) -> Tuple[List[Dict[str, Any]], int]:
+	# Same as get_discipline_leaderboard_page for the overall table
+	if recompute:
+		await refresh_stale_leaderboards(session, competition_id)
+	total = await session.scalar(
+		select(func.count())
+		.select_from(OverallLeaderboard)
+		.where(OverallLeaderboard.competition_id == competition_id)
+	)
+	items = await get_stored_overall_leaderboard(session, competition_id, offset=page * page_size, limit=page_size)
+	return items, total or 0
+
+
+async def overall_is_stale(session: AsyncSession, competition_id: int) -> bool:
+	points_at, registered_at, calculated_at = (await session.execute(
+		select(
+			select(func.max(Leaderboard.calculated_at))
+			.where(Leaderboard.competition_id == competition_id)
+			.scalar_subquery(),
+			select(func.max(Participant.registration_date))
+			.where(Participant.competition_id == competition_id)
+			.scalar_subquery(),
+			select(func.max(OverallLeaderboard.calculated_at))
+			.where(OverallLeaderboard.competition_id == competition_id)
+			.scalar_subquery(),
+		)
+	)).one()
+	changed_at = max((t for t in (points_at, registered_at) if t is not None), default=None)
+	return changed_at is not None and (calculated_at is None or changed_at > calculated_at)
+
+
+async def get_stored_overall_leaderboard(
+	session: AsyncSession,
+	competition_id: int,
+	offset: int = 0,
+	limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+	rows = await session.execute(
+		select(
+			OverallLeaderboard.user_id,
+			User.first_name,
+			User.last_name,
+			OverallLeaderboard.total_points,
+			OverallLeaderboard.disciplines_participated,
+			OverallLeaderboard.position,
+		)
+		.join(User, User.id == OverallLeaderboard.user_id)
+		.where(OverallLeaderboard.competition_id == competition_id)
+		.order_by(OverallLeaderboard.position, OverallLeaderboard.user_id)
+		.offset(offset)
+		.limit(limit)
+	)
+	return [dict(r._mapping) for r in rows]
+
+
+async def stale_discipline_ids(session: AsyncSession, competition_id: int) -> List[int]:
+	changed = (
+		select(Result.discipline_id, func.max(Result.updated_at).label("changed_at"))
+		.where(Result.competition_id == competition_id)
+		.group_by(Result.discipline_id)
+		.subquery()
+	)
+	calculated = (
+		select(Leaderboard.discipline_id, func.max(Leaderboard.calculated_at).label("calculated_at"))
+		.where(Leaderboard.competition_id == competition_id)
+		.group_by(Leaderboard.discipline_id)
+		.subquery()
+	)
+	rows = await session.scalars(
+		select(changed.c.discipline_id)
+		.outerjoin(calculated, calculated.c.discipline_id == changed.c.discipline_id)
+		.where(or_(calculated.c.calculated_at.is_(None), changed.c.changed_at > calculated.c.calculated_at))
+		.order_by(changed.c.discipline_id)
+	)
+	return list(rows)
+
+
+def format_leaderboard_message(leaderboard_data: List[Dict[str, Any]], page: int = 0, pages: int = 1) -> str:
+	lines = ["Таблица лидеров:" + _page_caption(page, pages)]
 	for it in leaderboard_data:
 		name = f"{it['first_name']} {it['last_name']}".strip()
 		avg = "DNF" if it["average_dnf"] else _fmt(it["average_time"])  # type: ignore[arg-type]
@@ -132,14 +459,22 @@ def format_leaderboard_message(leaderboard_data: List[Dict[str, Any]]) -> str:
 	return "\n".join(lines)
 
 
-def format_overall_message(items: List[Dict[str, Any]]) -> str:
-	lines = ["Общий зачёт:"]
+def format_overall_message(items: List[Dict[str, Any]], page: int = 0, pages: int = 1) -> str:
+	lines = ["Общий зачёт:" + _page_caption(page, pages)]
 	for it in items:
 		name = f"{it['first_name']} {it['last_name']}".strip()
 		lines.append(f"{it['position']}. {name}  баллы: {it['total_points']}  дисциплин: {it['disciplines_participated']}")
 	return "\n".join(lines)
 
 
+def page_count(total: int, page_size: int) -> int:
+	return max(1, -(-total // page_size))
+
+
+def _page_caption(page: int, pages: int) -> str:
+	return f" (страница {page + 1} из {pages})" if pages > 1 else ""
+
+
 def _fmt(ms: int | None) -> str:
 	if ms is None:
 		return "DNF"
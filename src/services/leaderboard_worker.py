@@ -0,0 +1,197 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database.models import Competition
+from src.services.leaderboard_service import (
+	calculate_discipline_leaderboard,
+	calculate_overall_leaderboard,
+	overall_is_stale,
+	stale_discipline_ids,
+)
+
+
+# called with (session, competition id, discipline ids) after a recalculation is committed
+RecalculatedListener = Callable[[AsyncSession, int, Set[int]], Awaitable[Any]]
+
+# seconds stop() gives listeners still running before cancelling them
+LISTENER_GRACE = 5.0
+
+
+class LeaderboardWorker:
+	# Background recomputation of the stored leaderboards. Submissions only mark their
+	# (competition, discipline) dirty; the worker recalculates everything marked since its last
+	# pass, at most once per interval, so a burst of results costs a handful of recalculations
+	# and the handlers never wait for one. Marks live in this process: a restart loses them, and
+	# the sweep on start picks up whatever was left stale. With several bot processes only one
+	# runs the worker (in poll mode, sweeping every interval for the others' writes); the rest
+	# defer to it and drop their marks.
+	def __init__(self) -> None:
+		# competition id -> dirty discipline ids (empty: only the overall table, e.g. a new participant)
+		self._dirty: Dict[int, Set[int]] = {}
+		self._marked: Optional[asyncio.Event] = None
+		self._task: Optional["asyncio.Task[None]"] = None
+		self.sessionmaker: Optional[async_sessionmaker[AsyncSession]] = None
+		self.interval = 0.0
+		self.listeners: List[RecalculatedListener] = []
+		self._last_pass = 0.0
+		# listeners run in a task per competition, off the recalculation pass: a slow one (the
+		# /follow push, paced by the send scheduler) never delays the next pass. Disciplines
+		# recalculated while it runs are collected and handed to its next call.
+		self._notifying: Dict[int, "asyncio.Task[None]"] = {}
+		self._notify_pending: Dict[int, Set[int]] = {}
+		self.poll = False
+		self._remote = False
+		self.marks = 0
+		self.recalculations = 0
+
+	@property
+	def running(self) -> bool:
+		return self._task is not None and not self._task.done()
+
+	@property
+	def active(self) -> bool:
+		# whether some process recalculates in the background, so handlers need not
+		return self._remote or self.running
+
+	def defer_to_remote(self) -> None:
+		self._remote = True
+
+	def mark_dirty(self, competition_id: int, discipline_id: Optional[int] = None) -> None:
+		self.marks += 1
+		if self._remote:
+			# the worker process finds the write on its next sweep
+			return
+		self._mark(competition_id, set() if discipline_id is None else {discipline_id})
+
+	def _mark(self, competition_id: int, discipline_ids: Set[int]) -> None:
+		self._dirty.setdefault(competition_id, set()).update(discipline_ids)
+		if self._marked is not None:
+			self._marked.set()
+
+	def start(
+		self,
+		sessionmaker: async_sessionmaker[AsyncSession],
+		interval: float,
+		listeners: Sequence[RecalculatedListener] = (),
+		poll: bool = False,
+	) -> None:
+		self.sessionmaker = sessionmaker
+		self.interval = interval
+		self.poll = poll
+		self.listeners = list(listeners)
+		self._marked = asyncio.Event()
+		if self._dirty:
+			self._marked.set()
+		self._task = asyncio.create_task(self._run())
+
+	async def stop(self) -> None:
+		# recalculate what is still marked, so a clean shutdown leaves no stale table
+		if self._task is None:
+			return
+		self._task.cancel()
+		await asyncio.gather(self._task, return_exceptions=True)
+		self._task = None
+		await self.flush()
+		if self._notifying:
+			_, late = await asyncio.wait(list(self._notifying.values()), timeout=LISTENER_GRACE)
+			for task in late:
+				task.cancel()
+			await asyncio.gather(*late, return_exceptions=True)
+
+	async def sweep(self) -> None:
+		# tables left stale by a previous process (marks are not persisted) or written to by
+		# another bot process; recalculated like a marked pass, so listeners hear about them too
+		stale: Dict[int, Set[int]] = {}
+		async with self.sessionmaker() as session:  # type: ignore[misc]
+			competition_ids = await session.scalars(select(Competition.id).where(Competition.status != "completed"))
+			for competition_id in list(competition_ids):
+				discipline_ids = set(await stale_discipline_ids(session, competition_id))
+				if discipline_ids or await overall_is_stale(session, competition_id):
+					stale[competition_id] = discipline_ids
+		for competition_id, discipline_ids in stale.items():
+			try:
+				await self._recalculate(competition_id, discipline_ids)
+			except Exception:
+				logger.exception("Leaderboard recalculation failed for competition {}", competition_id)
+
+	async def flush(self) -> None:
+		# one pass over everything marked so far; later marks wait for the next pass
+		pending = list(self._dirty.items())
+		self._dirty = {}
+		if self._marked is not None:
+			self._marked.clear()
+		self._last_pass = time.monotonic()
+		failed = []
+		for index, (competition_id, discipline_ids) in enumerate(pending):
+			try:
+				await self._recalculate(competition_id, discipline_ids)
+			except asyncio.CancelledError:
+				for entry in pending[index:]:
+					self._mark(*entry)
+				raise
+			except Exception:
+				logger.exception("Leaderboard recalculation failed for competition {}", competition_id)
+				failed.append((competition_id, discipline_ids))
+		# retried on the next pass
+		for entry in failed:
+			self._mark(*entry)
+
+	async def _recalculate(self, competition_id: int, discipline_ids: Set[int]) -> None:
+		async with self.sessionmaker() as session:  # type: ignore[misc]
+			for discipline_id in sorted(discipline_ids):
+				await calculate_discipline_leaderboard(session, competition_id, discipline_id, store=True)
+			await calculate_overall_leaderboard(session, competition_id, store=True)
+			await session.commit()
+		self.recalculations += 1
+		self._notify(competition_id, discipline_ids)
+
+	def _notify(self, competition_id: int, discipline_ids: Set[int]) -> None:
+		if not self.listeners:
+			return
+		self._notify_pending.setdefault(competition_id, set()).update(discipline_ids)
+		if competition_id not in self._notifying:
+			self._notifying[competition_id] = asyncio.create_task(self._run_listeners(competition_id))
+
+	async def _run_listeners(self, competition_id: int) -> None:
+		try:
+			while competition_id in self._notify_pending:
+				discipline_ids = self._notify_pending.pop(competition_id)
+				async with self.sessionmaker() as session:  # type: ignore[misc]
+					for listener in self.listeners:
+						try:
+							await listener(session, competition_id, discipline_ids)
+						except Exception:
+							logger.exception("Leaderboard listener failed for competition {}", competition_id)
+		finally:
+			del self._notifying[competition_id]
+
+	async def _sweep(self) -> None:
+		try:
+			await self.sweep()
+		except Exception:
+			logger.exception("Leaderboard sweep failed")
+
+	async def _run(self) -> None:
+		await self._sweep()
+		while True:
+			if not self.poll:
+				await self._marked.wait()  # type: ignore[union-attr]
+			else:
+				# writes from other processes are never marked here: look for them every interval
+				try:
+					await asyncio.wait_for(self._marked.wait(), self.interval)  # type: ignore[union-attr]
+				except asyncio.TimeoutError:
+					pass
+			# marks arriving while we wait join this pass
+			await asyncio.sleep(max(0.0, self._last_pass + self.interval - time.monotonic()))
+			await self.flush()
+			if self.poll:
+				await self._sweep()
+
+
+leaderboard_worker = LeaderboardWorker()
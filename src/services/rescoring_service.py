@@ -0,0 +1,60 @@
+from itertools import groupby
+from typing import Any, Dict, List, NamedTuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Discipline, Result
+from src.services.calculation_service import attempts_matrix, score_batch
+from src.services.leaderboard_service import calculate_discipline_leaderboard, calculate_overall_leaderboard
+
+
+class RescoreReport(NamedTuple):
+	changed: int
+	discipline_ids: List[int]
+
+
+async def rescore_competition(session: AsyncSession, competition_id: int, recalculate: bool = True) -> RescoreReport:
+	# Recompute averages and bests of every stored result (after a rules fix, or for imported
+	# history) one discipline at a time with score_batch; only rows whose scores change are
+	# written, then the affected leaderboards are rebuilt. With recalculate=False (the leaderboard
+	# worker is running) the caller commits and marks the returned disciplines dirty instead.
+	rows = (await session.execute(
+		select(
+			Result.id,
+			Result.discipline_id,
+			Discipline.attempts_count,
+			Discipline.average_calculation_type,
+			Result.average_time,
+			Result.average_dnf,
+			Result.best_time,
+			Result.attempts,
+		)
+		.join(Discipline, Discipline.id == Result.discipline_id)
+		.where(Result.competition_id == competition_id)
+		.order_by(Result.discipline_id, Result.id)
+	)).all()
+
+	changes: List[Dict[str, Any]] = []
+	changed_disciplines = []
+	for (discipline_id, attempts_count, calc_type), group in groupby(
+		rows, key=lambda r: (r.discipline_id, r.attempts_count, r.average_calculation_type)
+	):
+		group = list(group)
+		times, dnf = attempts_matrix([r.attempts for r in group], attempts_count)
+		scores = score_batch(times, dnf, calc_type).rows()
+		before = len(changes)
+		for r, (average_ms, average_dnf, best_ms) in zip(group, scores):
+			if (r.average_time, r.average_dnf, r.best_time) != (average_ms, average_dnf, best_ms):
+				changes.append({"id": r.id, "average_time": average_ms, "average_dnf": average_dnf, "best_time": best_ms})
+		if len(changes) > before:
+			changed_disciplines.append(discipline_id)
+
+	if changes:
+		# ORM bulk UPDATE by primary key: a single executemany
+		await session.execute(update(Result), changes)
+		if recalculate:
+			for discipline_id in changed_disciplines:
+				await calculate_discipline_leaderboard(session, competition_id, discipline_id)
+			await calculate_overall_leaderboard(session, competition_id)
+	return RescoreReport(len(changes), changed_disciplines)
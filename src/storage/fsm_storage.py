@@ -0,0 +1,14 @@
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from src.storage.redis_pool import get_redis
+
+
+def create_fsm_storage() -> BaseStorage:
+	# Redis keeps registration/submission flows across restarts and between bot processes
+	redis = get_redis()
+	if redis is None:
+		return MemoryStorage()
+	from aiogram.fsm.storage.redis import RedisStorage
+
+	return RedisStorage(redis=redis)
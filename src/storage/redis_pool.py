@@ -0,0 +1,29 @@
+from typing import TYPE_CHECKING, Optional
+
+from src.config.settings import settings
+
+if TYPE_CHECKING:
+	from redis.asyncio import Redis
+
+
+# One client (and so one connection pool) per process, shared by FSM storage and caches.
+# redis is only imported when REDIS_URL is set.
+_redis: Optional["Redis"] = None
+
+
+def get_redis() -> Optional["Redis"]:
+	global _redis
+	if settings.redis_url is None:
+		return None
+	if _redis is None:
+		from redis.asyncio import Redis
+
+		_redis = Redis.from_url(settings.redis_url)
+	return _redis
+
+
+async def close_redis() -> None:
+	global _redis
+	if _redis is not None:
+		await _redis.aclose()
+		_redis = None
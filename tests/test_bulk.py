@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database.bulk import bulk_upsert, constraint_columns
+from src.database.crud import result as result_crud
+from src.database.crud import scramble as scramble_crud
+from src.database.models import Base, Competition, Discipline, Leaderboard, Result, Scramble, User
+from tests.conftest import seed_competition
+
+
+def test_constraint_columns():
+	assert constraint_columns(Leaderboard.__table__, "uq_leaderboard_unique") == ["competition_id", "discipline_id", "user_id"]
+	with pytest.raises(ValueError):
+		constraint_columns(Leaderboard.__table__, "missing")
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_inserts_then_updates(session):
+	org = User(telegram_id=1, first_name="Org", last_name="Org", role="organizer")
+	session.add(org)
+	await session.flush()
+	comp = Competition(name="Bulk", competition_code="BULK0001", organizer_id=org.id, status="active")
+	disc = Discipline(name="3x3", code="3x3", attempts_count=5, average_calculation_type="ao5", dnf_threshold=2)
+	session.add_all([comp, disc])
+	await session.flush()
+	rows = [
+		{"competition_id": comp.id, "discipline_id": disc.id, "user_id": i, "position": i, "points": 0}
+		for i in range(1, 4001)
+	]
+	await bulk_upsert(session, Leaderboard, rows, constraint="uq_leaderboard_unique")
+	await bulk_upsert(session, Leaderboard, [dict(r, points=7) for r in rows], constraint="uq_leaderboard_unique")
+	count, points = (await session.execute(select(func.count(), func.sum(Leaderboard.points)))).one()
+	assert count == 4000 and points == 7 * 4000
+
+
+@pytest.mark.asyncio
+async def test_upserts_are_one_statement_and_safe_under_concurrency(tmp_path):
+	engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'upsert.db'}")
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.create_all)
+	sessionmaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+	async with sessionmaker() as session:
+		comp, disc, participants = await seed_competition(session, 2)
+		await session.commit()
+	_, participant = participants[0]
+
+	statements = []
+	capture = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+	event.listen(engine.sync_engine, "before_cursor_execute", capture)
+	async with sessionmaker() as session:
+		res = await result_crud.upsert_result(session, participant.id, disc.id, [9000] * 5, 9000, False, 9000)
+		await session.commit()
+	event.remove(engine.sync_engine, "before_cursor_execute", capture)
+	assert len([s for s in statements if "results" in s]) == 1
+	assert (res.competition_id, res.user_id, res.attempts) == (comp.id, participant.user_id, [9000] * 5)
+
+	_, racer = participants[1]
+
+	async def submit(i: int) -> None:
+		async with sessionmaker() as session:
+			await result_crud.upsert_result(session, racer.id, disc.id, [5000 + i] * 5, 5000 + i, False, 5000 + i)
+			await scramble_crud.upsert_scramble(session, comp.id, disc.id, 1, f"file{i}")
+			await session.commit()
+
+	# first rows for both keys: a select-then-insert pair lets several of these insert and fail
+	outcomes = await asyncio.gather(*(submit(i) for i in range(20)), return_exceptions=True)
+	assert [o for o in outcomes if o is not None] == []
+	async with sessionmaker() as session:
+		results = (await session.scalars(select(Result).where(Result.participant_id == racer.id))).all()
+		scrambles = (await session.scalars(select(Scramble))).all()
+		assert len(results) == 1 and len(scrambles) == 1
+		assert results[0].attempts == [results[0].best_time] * 5
+
+		# an update keeps the row and moves updated_at (the leaderboard staleness check reads it)
+		again = await result_crud.upsert_result(session, participant.id, disc.id, [8000] * 5, 8000, False, 8000)
+		assert again.id == res.id and again.updated_at > res.updated_at
+	await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_writes_rows_in_key_order(session):
+	org = User(telegram_id=1, first_name="Org", last_name="Org", role="organizer")
+	session.add(org)
+	await session.flush()
+	comp = Competition(name="Bulk", competition_code="BULK0002", organizer_id=org.id, status="active")
+	disc = Discipline(name="3x3", code="3x3", attempts_count=5, average_calculation_type="ao5", dnf_threshold=2)
+	session.add_all([comp, disc])
+	await session.flush()
+	# rank order, as the leaderboard builds them: two writers would lock the keys in different orders
+	rows = [
+		{"competition_id": comp.id, "discipline_id": disc.id, "user_id": user_id, "position": position, "points": 0}
+		for position, user_id in enumerate([5, 2, 9, 1], start=1)
+	]
+	params = []
+	capture = lambda conn, cursor, statement, parameters, *args: params.append(parameters)  # noqa: E731
+	engine = session.get_bind()
+	event.listen(engine, "before_cursor_execute", capture)
+	try:
+		await bulk_upsert(session, Leaderboard, rows, constraint="uq_leaderboard_unique")
+	finally:
+		event.remove(engine, "before_cursor_execute", capture)
+	# parameter tuples follow the column order: competition_id, discipline_id, user_id, ...
+	assert [p[2] for p in params[-1]] == [1, 2, 5, 9]
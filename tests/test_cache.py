@@ -0,0 +1,226 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.bot.handlers.organizer_handlers import complete_competition_cmd
+from src.database.crud import competition as competition_crud
+from src.database.crud import discipline as discipline_crud
+from src.database.crud import scramble as scramble_crud
+from src.database.crud.cache import SharedCache, TTLCache, competition_cache, discipline_cache, scramble_cache
+from src.database.models import Base, Competition, Discipline, User
+
+
+class FakeClock:
+	def __init__(self) -> None:
+		self.now = 0.0
+
+	def __call__(self) -> float:
+		return self.now
+
+
+def test_ttl_expiry():
+	clock = FakeClock()
+	cache = TTLCache("test", maxsize=10, ttl=5, clock=clock)
+	cache.set("a", 1)
+	assert cache.get("a") == 1
+	clock.now = 5
+	assert cache.get("a") is None
+	assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+
+def test_lru_eviction():
+	cache = TTLCache("test", maxsize=2, ttl=60)
+	cache.set("a", 1)
+	cache.set("b", 2)
+	assert cache.get("a") == 1  # "b" becomes least recently used
+	cache.set("c", 3)
+	assert cache.get("b") is None
+	assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+async def _seed(session):
+	u = User(telegram_id=1, first_name="Org", last_name="Org", role="organizer")
+	session.add(u)
+	await session.flush()
+	comp = Competition(name="Test", competition_code="CACHE001", organizer_id=u.id, status="active")
+	disc = Discipline(name="3x3", code="3x3", attempts_count=5, average_calculation_type="ao5", dnf_threshold=2)
+	session.add_all([comp, disc])
+	await session.commit()
+	return comp, disc
+
+
+@pytest.mark.asyncio
+async def test_competition_lookup_is_cached_until_completed(session):
+	comp, _ = await _seed(session)
+	assert (await competition_crud.get_by_code(session, "CACHE001")).status == "active"
+	# change behind the cache's back: the cached snapshot is served
+	await session.execute(update(Competition).where(Competition.id == comp.id).values(name="Renamed"))
+	session.expunge_all()
+	cached = await competition_crud.get_by_code(session, "CACHE001")
+	assert cached.id == comp.id and cached.name == "Test"
+	assert competition_cache.hits == 1
+
+	await competition_crud.complete_competition(session, comp.id)
+	await session.commit()
+	await competition_crud.invalidate_cached(comp.id, comp.competition_code)
+	session.expunge_all()
+	fresh = await competition_crud.get_by_code(session, "CACHE001")
+	assert fresh.status == "completed" and fresh.name == "Renamed"
+
+
+class FakeMessage:
+	def __init__(self, text: str) -> None:
+		self.text = text
+		self.replies: list[str] = []
+
+	async def answer(self, text: str, **kwargs) -> None:
+		self.replies.append(text)
+
+
+@pytest.mark.asyncio
+async def test_completing_does_not_leave_a_stale_cached_status(tmp_path):
+	# separate connections, so a read before the commit sees the old row
+	engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'cache.db'}")
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.create_all)
+	sessionmaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+	async with sessionmaker() as session:
+		comp, _ = await _seed(session)
+
+	async with sessionmaker() as writer, sessionmaker() as reader:
+		commit = writer.commit
+
+		async def read_then_commit():
+			# another update looks the competition up between the UPDATE and the commit
+			assert (await competition_crud.get_by_code(reader, "CACHE001")).status == "active"
+			await commit()
+
+		writer.commit = read_then_commit
+		message = FakeMessage("/complete_competition CACHE001")
+		await complete_competition_cmd(message, writer)
+		assert message.replies == ["Соревнование помечено как завершённое."]
+
+	async with sessionmaker() as session:
+		assert (await competition_crud.get_by_code(session, "CACHE001")).status == "completed"
+	await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_discipline_lookup_by_codes(session):
+	_, disc = await _seed(session)
+	assert [d.id for d in await discipline_crud.get_by_codes(session, ["3X3", "unknown"])] == [disc.id]
+	session.expunge_all()
+	hits = await discipline_crud.get_by_codes(session, ["3x3"])
+	assert [d.code for d in hits] == ["3x3"]
+	assert discipline_cache.hits == 1
+	assert hits[0] in session
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_coalesces_concurrent_misses():
+	cache = SharedCache("test", maxsize=10, ttl=60)
+	calls = []
+	release = asyncio.Event()
+
+	async def load():
+		calls.append(1)
+		await release.wait()
+		return ["file"]
+
+	tasks = [asyncio.create_task(cache.get_or_load("k", load)) for _ in range(20)]
+	await asyncio.sleep(0)
+	release.set()
+	assert await asyncio.gather(*tasks) == [["file"]] * 20
+	assert len(calls) == 1
+	assert await cache.get_or_load("k", load) == ["file"] and len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_shares_failures_and_survives_a_cancelled_loader():
+	cache = SharedCache("test", maxsize=10, ttl=60)
+	started = asyncio.Event()
+
+	async def failing():
+		started.set()
+		await asyncio.sleep(0.01)
+		raise RuntimeError("db down")
+
+	tasks = [asyncio.create_task(cache.get_or_load("k", failing)) for _ in range(3)]
+	results = await asyncio.gather(*tasks, return_exceptions=True)
+	assert all(isinstance(r, RuntimeError) for r in results)
+
+	async def slow():
+		await asyncio.sleep(10)
+
+	async def fast():
+		return "ok"
+
+	loader = asyncio.create_task(cache.get_or_load("j", slow))
+	await asyncio.sleep(0)
+	waiter = asyncio.create_task(cache.get_or_load("j", fast))
+	await asyncio.sleep(0)
+	loader.cancel()
+	# the waiter is not cancelled with the loader: it runs its own load
+	assert await waiter == "ok"
+
+
+@pytest.mark.asyncio
+async def test_a_load_in_flight_does_not_overwrite_a_later_warm():
+	cache = SharedCache("test", maxsize=10, ttl=60)
+	release = asyncio.Event()
+
+	async def load():
+		# read the table before the upload committed
+		await release.wait()
+		return ["old1"]
+
+	task = asyncio.create_task(cache.get_or_load("k", load))
+	await asyncio.sleep(0)
+	await cache.set("k", ["new1", "new2"])
+	release.set()
+	assert await task == ["old1"]
+	assert await cache.get("k") == ["new1", "new2"]
+
+
+@pytest.mark.asyncio
+async def test_scrambles_read_before_the_upload_are_not_cached(session):
+	comp, disc = await _seed(session)
+	# another process without Redis: nothing warms this one's cache after the upload
+	assert await scramble_crud.list_file_ids(session, comp.id, disc.id, expected=2) == []
+	await scramble_crud.upsert_scramble(session, comp.id, disc.id, 1, "s1")
+	await session.commit()
+	assert await scramble_crud.list_file_ids(session, comp.id, disc.id, expected=2) == ["s1"]
+	await scramble_crud.upsert_scramble(session, comp.id, disc.id, 2, "s2")
+	await session.commit()
+	assert await scramble_crud.list_file_ids(session, comp.id, disc.id, expected=2) == ["s1", "s2"]
+	# complete now: cached from here on
+	assert await scramble_cache.get((comp.id, disc.id)) == ["s1", "s2"]
+
+
+@pytest.mark.asyncio
+async def test_scramble_file_ids_are_cached_and_warmed_on_upload(session):
+	comp, disc = await _seed(session)
+	for n in (1, 2):
+		await scramble_crud.upsert_scramble(session, comp.id, disc.id, n, f"old{n}")
+	await session.commit()
+
+	selects = []
+	engine = session.bind.sync_engine
+	listener = lambda conn, cursor, statement, *args: selects.append(statement)  # noqa: E731
+	event.listen(engine, "before_cursor_execute", listener)
+	try:
+		burst = await asyncio.gather(*(scramble_crud.list_file_ids(session, comp.id, disc.id) for _ in range(10)))
+		assert burst == [["old1", "old2"]] * 10
+		assert len(selects) == 1
+
+		# re-upload: the cache is replaced after commit, the next request needs no query
+		await scramble_crud.upsert_scramble(session, comp.id, disc.id, 1, "new1")
+		await session.commit()
+		await scramble_crud.cache_file_ids(comp.id, disc.id, ["new1", "old2"])
+		selects.clear()
+		assert await scramble_crud.list_file_ids(session, comp.id, disc.id) == ["new1", "old2"]
+		assert [s for s in selects if s.lstrip().startswith("SELECT")] == []
+	finally:
+		event.remove(engine, "before_cursor_execute", listener)
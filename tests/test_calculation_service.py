@@ -1,8 +1,15 @@
+import numpy as np
+import pytest
+from hypothesis import given, strategies as st
+
 from src.services.calculation_service import (
+	attempts_matrix,
 	calculate_average_ao5,
 	calculate_average_mean_of_3,
 	calculate_best_of_3,
 	get_best_time,
+	score_attempts,
+	score_batch,
 )
 
 
@@ -56,3 +63,42 @@ def test_best_of_3_all_dnf():
 def test_get_best_time():
 	attempts = [3000, None, 1500, 2500]
 	assert get_best_time(attempts) == 1500
+
+
+EXAMPLES = [
+	("ao5", [5120, 5780, 4980, 6540, 6000]),
+	("ao5", [5120, 5780, 4980, 6540, None]),
+	("ao5", [5120, None, 4980, None, 6000]),
+	("mean_of_3", [1000, 2000, 3000]),
+	("mean_of_3", [1000, None, 3000]),
+	("best_of_3", [3000, 2000, 2500]),
+	("best_of_3", [None, None, None]),
+]
+
+attempt = st.one_of(st.none(), st.integers(min_value=0, max_value=10 * 60 * 1000))
+
+
+def _scalar(calc_type, attempts):
+	average_ms, average_dnf = score_attempts(attempts, calc_type)
+	return average_ms, average_dnf, get_best_time(attempts)
+
+
+def _batch(calc_type, rows, width):
+	return score_batch(*attempts_matrix(rows, width), calc_type).rows()
+
+
+@pytest.mark.parametrize("calc_type, attempts", EXAMPLES)
+def test_batch_matches_examples(calc_type, attempts):
+	assert _batch(calc_type, [attempts], len(attempts)) == [_scalar(calc_type, attempts)]
+
+
+@given(st.sampled_from(["ao5", "mean_of_3", "best_of_3"]), st.integers(min_value=0, max_value=7), st.data())
+def test_batch_matches_scalar(calc_type, width, data):
+	rows = data.draw(st.lists(st.lists(attempt, min_size=width, max_size=width), max_size=20))
+	assert _batch(calc_type, rows, width) == [_scalar(calc_type, r) for r in rows]
+
+
+def test_batch_ignores_times_under_dnf_mask():
+	times = np.array([[5120, 5780, 4980, 6540, 999_999]])
+	dnf = np.array([[False, False, False, False, True]])
+	assert score_batch(times, dnf, "ao5").rows() == [(5813, False, 4980)]
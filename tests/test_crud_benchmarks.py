@@ -0,0 +1,84 @@
+import time
+from typing import Awaitable, Callable
+
+import pytest
+from sqlalchemy import select
+
+from src.database.crud import competition as competition_crud
+from src.database.crud import participant as participant_crud
+from src.database.crud import result as result_crud
+from src.database.crud import user as user_crud
+from src.database.crud.cache import competition_cache
+from src.database.models import Competition, Participant, Result, User
+from tests.conftest import seed_competition, submit_result
+
+# Per-call cost of the hot CRUD lookups (module-level statements with bound parameters) next to the
+# same query built with select() on every call, as they were written before. The numbers are printed
+# (pytest -s); the assertions only check that both paths return the same rows.
+CALLS = 300
+
+
+async def _per_call_us(call: Callable[[], Awaitable[object]]) -> float:
+	best = float("inf")
+	for _ in range(3):
+		started = time.perf_counter()
+		for _ in range(CALLS):
+			await call()
+		best = min(best, time.perf_counter() - started)
+	return best / CALLS * 1e6
+
+
+async def _compare(name: str, prebuilt: Callable[[], Awaitable[object]], inline: Callable[[], Awaitable[object]]) -> None:
+	# also warms both entries of the compiled-statement cache before timing
+	assert await prebuilt() is await inline()
+	inline_us = await _per_call_us(inline)
+	prebuilt_us = await _per_call_us(prebuilt)
+	print(f"\n{name:46} select() per call {inline_us:7.1f} us   prebuilt {prebuilt_us:7.1f} us")
+
+
+@pytest.mark.asyncio
+async def test_hot_crud_lookups_per_call_overhead(session, monkeypatch):
+	comp, disc, participants = await seed_competition(session, 2)
+	user, participant = participants[0]
+	await submit_result(session, comp, disc, user, participant, [7000] * 5)
+	await session.commit()
+	# every get_by_code goes to the database instead of the lookup cache (its cache miss and set
+	# stay in the prebuilt number)
+	monkeypatch.setattr(competition_cache.local, "ttl", 0)
+
+	await _compare(
+		"competition_crud.get_by_code",
+		lambda: competition_crud.get_by_code(session, comp.competition_code),
+		lambda: session.scalar(select(Competition).where(Competition.competition_code == comp.competition_code)),
+	)
+	await _compare(
+		"user_crud.get_by_telegram_id",
+		lambda: user_crud.get_by_telegram_id(session, user.telegram_id),
+		lambda: session.scalar(select(User).where(User.telegram_id == user.telegram_id)),
+	)
+	await _compare(
+		"participant_crud.get",
+		lambda: participant_crud.get(session, comp.id, user.id),
+		lambda: session.scalar(select(Participant).where(Participant.competition_id == comp.id, Participant.user_id == user.id)),
+	)
+	await _compare(
+		"result_crud.get_by_participant_and_discipline",
+		lambda: result_crud.get_by_participant_and_discipline(session, participant.id, disc.id),
+		lambda: session.scalar(select(Result).where(Result.participant_id == participant.id, Result.discipline_id == disc.id)),
+	)
+
+
+@pytest.mark.asyncio
+async def test_resolve_returns_what_the_separate_lookups_do(session):
+	comp, disc, participants = await seed_competition(session, 1)
+	user, participant = participants[0]
+	outsider = User(telegram_id=999, first_name="Out", last_name="Sider")
+	session.add(outsider)
+	await session.commit()
+
+	reg = await participant_crud.resolve(session, comp.competition_code, user.telegram_id)
+	assert reg == (comp, user, participant, "active")
+	# known user without a registration, unknown user, unknown competition
+	assert await participant_crud.resolve(session, comp.competition_code, outsider.telegram_id) == (comp, outsider, None, "active")
+	assert await participant_crud.resolve(session, comp.competition_code, 12345) == (comp, None, None, "active")
+	assert await participant_crud.resolve(session, "NOPE0000", user.telegram_id) is None
@@ -0,0 +1,84 @@
+import csv
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from src.bot.utils.validators import time_to_milliseconds
+from src.database.models import Result
+from src.services import export_service
+from src.services.export_service import attempt_text, export_competition, write_results
+from src.services.import_service import import_results, iter_csv
+from tests.conftest import IMPORT_RECORDS, seed_import_competition
+
+
+def test_attempt_text_round_trips_through_the_validator():
+	for ms in (0, 10, 9990, 61230, 599990):
+		assert time_to_milliseconds(attempt_text(ms)) == ms
+	assert attempt_text(None) == "DNF"
+
+
+@pytest.mark.asyncio
+async def test_export_streams_all_tables_and_reimports(session, tmp_path, monkeypatch):
+	monkeypatch.setattr(export_service, "EXPORT_CHUNK", 2)
+	comp, d3, d6 = await seed_import_competition(session, 5)
+	records = IMPORT_RECORDS + [
+		{"discipline": "3x3", "telegram_id": 100 + i, "attempts": [f"0.{10 + i}.00"] * 4 + ["DNF"]} for i in (2, 3, 4)
+	]
+	await import_results(session, comp.id, enumerate(records, start=1))
+	before = sorted(tuple(r) for r in (await session.execute(select(
+		Result.participant_id, Result.discipline_id, Result.attempts,
+		Result.average_time, Result.average_dnf, Result.best_time,
+	))).all())
+
+	files = await export_competition(session, comp.id, tmp_path)
+	assert [p.name for p in files] == ["results.csv", "leaderboard.csv", "overall.csv"]
+	tables = {}
+	for path in files:
+		with path.open(encoding="utf-8-sig", newline="") as stream:
+			tables[path.name] = list(csv.DictReader(stream))
+
+	assert len(tables["results.csv"]) == 5
+	six = [r for r in tables["results.csv"] if r["discipline"] == "6x6"]
+	assert six == [{
+		"discipline": "6x6", "telegram_id": "102", "username": "cuber2", "first_name": "U2", "last_name": "T",
+		"attempt_1": "1.10.00", "attempt_2": "DNF", "attempt_3": "1.20.00", "attempt_4": "", "attempt_5": "",
+		"average": "DNF", "best": "1.10.00",
+	}]
+	three = [r for r in tables["leaderboard.csv"] if r["discipline"] == "3x3"]
+	assert [(r["position"], r["telegram_id"], r["average"]) for r in three] == [
+		("1", "101", "0.12.00"), ("2", "102", "0.12.00"), ("3", "103", "0.13.00"), ("4", "104", "0.14.00"),
+	]
+	assert [r["position"] for r in tables["overall.csv"]][:1] == ["1"]
+	assert len(tables["overall.csv"]) == 5
+
+	# results.csv is a valid /import_results file: importing it back changes nothing
+	with files[0].open(encoding="utf-8-sig", newline="") as stream:
+		report = await import_results(session, comp.id, iter_csv(stream))
+	assert (report.imported, report.error_count) == (5, 0)
+	after = sorted(tuple(r) for r in (await session.execute(select(
+		Result.participant_id, Result.discipline_id, Result.attempts,
+		Result.average_time, Result.average_dnf, Result.best_time,
+	))).all())
+	assert after == before
+
+
+class ThreadRecordingWriter:
+	def __init__(self) -> None:
+		self.rows = []
+		self.threads = set()
+
+	def writerows(self, rows):
+		self.threads.add(threading.get_ident())
+		self.rows.extend(rows)
+
+
+@pytest.mark.asyncio
+async def test_partitions_are_written_off_the_event_loop(session, monkeypatch):
+	monkeypatch.setattr(export_service, "EXPORT_CHUNK", 2)
+	comp, _, _ = await seed_import_competition(session, 5)
+	await import_results(session, comp.id, enumerate(IMPORT_RECORDS, start=1))
+	writer = ThreadRecordingWriter()
+	assert await write_results(session, comp.id, writer) == 2
+	assert len(writer.rows) == 2
+	assert threading.get_ident() not in writer.threads
@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText, PinChatMessage
+from sqlalchemy import select
+
+from src.bot.handlers.competition_handlers import follow, unfollow
+from src.database.crud import subscription as subscription_crud
+from src.database.models import LeaderboardSubscription
+from src.services.follow_service import push_leaderboard_updates, render_followed_page, text_hash
+from src.services.leaderboard_service import calculate_discipline_leaderboard
+from tests.conftest import seed_competition, submit_result
+
+
+class FakeBot:
+	# records edits; chats listed in `deleted` answer like a message the user removed
+	def __init__(self, deleted=()) -> None:
+		self.edits: dict[int, str] = {}
+		self.deleted = set(deleted)
+
+	async def edit_message_text(self, text, chat_id, message_id):
+		if chat_id in self.deleted:
+			raise TelegramBadRequest(EditMessageText(text=text), "Bad Request: message to edit not found")
+		self.edits[chat_id] = text
+		return True
+
+
+@pytest.mark.asyncio
+async def test_only_followed_pages_that_changed_are_edited(session):
+	comp, disc, participants = await seed_competition(session, 45)
+	for i, (user, participant) in enumerate(participants):
+		await submit_result(session, comp, disc, user, participant, [10000 + 100 * i] * 5)
+	await calculate_discipline_leaderboard(session, comp.id, disc.id)
+	# chat -> follower: first place and a spectator on page 1, two competitors on page 2
+	followers = {1: participants[0][0].id, 2: None, 3: participants[29][0].id, 4: participants[21][0].id}
+	for chat_id, user_id in followers.items():
+		text = await render_followed_page(session, comp.id, disc.id, user_id)
+		await subscription_crud.subscribe(session, comp.id, disc.id, chat_id, 100 + chat_id, user_id, text_hash(text))
+	await session.commit()
+
+	bot = FakeBot()
+	assert await push_leaderboard_updates(bot, session, comp.id, [disc.id]) == 0
+
+	# 35th place improves to 25th: only the second page changes
+	user, participant = participants[34]
+	await submit_result(session, comp, disc, user, participant, [10000 + 100 * 24 - 50] * 5)
+	await calculate_discipline_leaderboard(session, comp.id, disc.id)
+	bot = FakeBot(deleted={4})
+	assert await push_leaderboard_updates(bot, session, comp.id, [disc.id]) == 1
+	assert list(bot.edits) == [3]
+	assert "(страница 2 из 3)" in bot.edits[3] and "User34" in bot.edits[3]
+	remaining = await session.scalars(select(LeaderboardSubscription.chat_id).order_by(LeaderboardSubscription.chat_id))
+	assert list(remaining) == [1, 2, 3]
+
+	# the stored digest now matches: nothing to send until the page changes again
+	assert await push_leaderboard_updates(FakeBot(), session, comp.id, [disc.id]) == 0
+
+
+
+class FakeChat:
+	# the incoming message, its chat and the bot in one; records what the handler does to the chat
+	def __init__(self, text: str, events: list, can_pin: bool = True) -> None:
+		self.text = text
+		self.chat = SimpleNamespace(id=500)
+		self.from_user = SimpleNamespace(id=100)
+		self.bot = self
+		self.events = events
+		self.can_pin = can_pin
+		self.replies = []
+
+	async def answer(self, text, **kwargs):
+		message_id = sum(1 for name, _ in self.events if name == "send") + 1
+		self.events.append(("send", message_id))
+		self.replies.append(text)
+		return SimpleNamespace(
+			message_id=message_id,
+			pin=lambda **kwargs: self._pin(message_id),
+			delete=lambda: self._record("delete", message_id),
+		)
+
+	async def _pin(self, message_id):
+		if not self.can_pin:
+			raise TelegramBadRequest(PinChatMessage(chat_id=self.chat.id, message_id=message_id), "Bad Request: not enough rights")
+		await self._record("pin", message_id)
+
+	async def unpin_chat_message(self, chat_id, message_id):
+		await self._record("unpin", message_id)
+
+	async def _record(self, name, message_id):
+		self.events.append((name, message_id))
+
+
+def _record_commits(session, events, fail=False):
+	commit = session.commit
+
+	async def recorded():
+		events.append(("commit", None))
+		if fail:
+			raise RuntimeError("database went away")
+		await commit()
+
+	session.commit = recorded
+
+
+@pytest.mark.asyncio
+async def test_follow_pins_after_commit_and_unfollow_unpins(session):
+	await seed_competition(session, 1)
+	await session.commit()
+	events = []
+	_record_commits(session, events)
+
+	await follow(FakeChat("/follow TEST0001 3x3", events), session)
+	await follow(FakeChat("/follow TEST0001 3x3", events), session)
+	await unfollow(FakeChat("/unfollow TEST0001 3x3", events), session)
+	assert events == [
+		("send", 1), ("commit", None), ("pin", 1), ("send", 2),
+		# following again moves the subscription to the new message and unpins the old one
+		("send", 3), ("commit", None), ("unpin", 1), ("pin", 3), ("send", 4),
+		("commit", None), ("unpin", 3), ("send", 5),
+	]
+	assert await session.scalar(select(LeaderboardSubscription)) is None
+
+
+@pytest.mark.asyncio
+async def test_follow_without_a_committed_subscription_pins_nothing(session):
+	await seed_competition(session, 1)
+	await session.commit()
+	events = []
+	_record_commits(session, events, fail=True)
+	with pytest.raises(RuntimeError):
+		await follow(FakeChat("/follow TEST0001 3x3", events), session)
+	assert events == [("send", 1), ("commit", None), ("delete", 1)]
+
+
+@pytest.mark.asyncio
+async def test_follow_without_the_right_to_pin_says_so(session):
+	await seed_competition(session, 1)
+	await session.commit()
+	chat = FakeChat("/follow TEST0001 3x3", [], can_pin=False)
+	await follow(chat, session)
+	assert chat.events == [("send", 1), ("send", 2)]
+	assert "закрепить её не удалось" in chat.replies[-1]
+	assert await session.scalar(select(LeaderboardSubscription.message_id)) == 1
@@ -0,0 +1,140 @@
+import io
+import json
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import func, select
+
+from src.bot.handlers.organizer_handlers import import_results_file
+from src.config.settings import settings
+from src.database.models import Result
+from src.services import import_service
+from src.services.calculation_service import calculate_average_mean_of_3
+from src.services.import_service import import_results, iter_csv, iter_json
+from src.services.leaderboard_service import get_stored_discipline_leaderboard
+from tests.conftest import IMPORT_RECORDS, seed_import_competition
+
+
+def test_csv_rows_carry_line_numbers():
+	text = "discipline,telegram_id,attempt_1,attempt_2,attempt_3\n3x3,1,0.10.00,0.11.00,DNF\n6x6,2,1.0.0,1.0.0,1.0.0\n"
+	rows = list(iter_csv(io.StringIO(text)))
+	assert [n for n, _ in rows] == [2, 3]
+	assert rows[0][1]["attempt_3"] == "DNF"
+
+
+def test_json_array_is_read_in_chunks(monkeypatch):
+	monkeypatch.setattr(import_service, "_JSON_CHUNK", 7)
+	text = json.dumps(IMPORT_RECORDS * 3, indent=1)
+	assert [r for _, r in iter_json(io.StringIO(text))] == IMPORT_RECORDS * 3
+
+
+def test_json_lines(monkeypatch):
+	monkeypatch.setattr(import_service, "_JSON_CHUNK", 10)
+	text = "\n".join(json.dumps(r) for r in IMPORT_RECORDS) + "\n"
+	assert list(iter_json(io.StringIO(text))) == [(1, IMPORT_RECORDS[0]), (2, IMPORT_RECORDS[1])]
+
+
+def test_a_malformed_json_element_fails_without_reading_to_the_end(monkeypatch):
+	monkeypatch.setattr(import_service, "_JSON_CHUNK", 16)
+	monkeypatch.setattr(import_service, "_JSON_MAX_ELEMENT", 64)
+	text = '[{"discipline": 3x3}, ' + ", ".join(json.dumps(r) for r in IMPORT_RECORDS * 500) + "]"
+	stream = io.StringIO(text)
+	with pytest.raises(json.JSONDecodeError):
+		list(iter_json(stream))
+	assert stream.tell() < 200
+
+
+@pytest.mark.asyncio
+async def test_import_upserts_scores_and_reports_errors(session):
+	comp, d3, d6 = await seed_import_competition(session, 3)
+	records = IMPORT_RECORDS + [
+		{"discipline": "4x4", "telegram_id": 101, "attempts": []},
+		{"discipline": "3x3", "telegram_id": 999, "attempts": ["0.10.00"] * 5},
+		{"discipline": "3x3", "telegram_id": 102, "attempts": ["0.10.00"] * 4},
+		{"discipline": "6x6", "telegram_id": 100, "attempts": "1.0.0, 1.0.0, 1.a.0"},
+		# a second row for the same competitor and discipline replaces the first
+		{"discipline": "3x3", "telegram_id": 101, "attempts": ["0.20.00", "0.21.00", "0.22.00", "0.23.00", "0.24.00"]},
+	]
+	report = await import_results(session, comp.id, enumerate(records, start=1), batch_size=2)
+	assert (report.rows, report.imported, report.error_count) == (7, 3, 4)
+	assert [n for n, _ in report.errors] == [3, 4, 5, 6]
+	assert report.discipline_ids == [d3.id, d6.id]
+
+	assert await session.scalar(select(func.count()).select_from(Result)) == 2
+	three = await get_stored_discipline_leaderboard(session, comp.id, d3.id)
+	assert [(it["average_time"], it["best_time"]) for it in three] == [(22000, 20000)]
+	six = await get_stored_discipline_leaderboard(session, comp.id, d6.id)
+	assert [it["average_dnf"] for it in six] == [calculate_average_mean_of_3([70000, None, 80000])[1]]
+
+
+@pytest.mark.asyncio
+async def test_import_thousands_of_rows(session):
+	comp, d3, _ = await seed_import_competition(session, 3000)
+	text = "discipline,username,attempt_1,attempt_2,attempt_3,attempt_4,attempt_5\n" + "".join(
+		f"3x3,cuber{i},0.{10 + i % 40}.00,0.12.{i % 100},0.13.00,DNF,0.{15 + i % 30}.50\n" for i in range(3000)
+	)
+	report = await import_results(session, comp.id, iter_csv(io.StringIO(text)))
+	assert (report.imported, report.error_count) == (3000, 0)
+	assert len(await get_stored_discipline_leaderboard(session, comp.id, d3.id)) == 3000
+
+
+class FakeUpload:
+	# a message carrying a document; the bot "downloads" it by writing the content to the destination
+	def __init__(self, content: bytes, name: str, size=None) -> None:
+		self.document = SimpleNamespace(file_name=name, file_size=len(content) if size is None else size)
+		self.bot = self
+		self.content = content
+		self.downloads = []
+		self.replies = []
+
+	async def download(self, document, destination):
+		self.downloads.append(destination)
+		Path(destination).write_bytes(self.content)
+
+	async def answer(self, text, **kwargs):
+		self.replies.append(text)
+
+
+@pytest.mark.asyncio
+async def test_upload_is_streamed_from_disk_and_size_checked_first(session, monkeypatch):
+	comp, d3, _ = await seed_import_competition(session, 3)
+	await session.commit()
+	state = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=1, user_id=1))
+	await state.update_data(import_comp_id=comp.id)
+	content = "\n".join(json.dumps(r) for r in IMPORT_RECORDS).encode()
+
+	monkeypatch.setattr(settings, "import_max_file_size", len(content) - 1)
+	upload = FakeUpload(content, "results.jsonl")
+	await import_results_file(upload, state, session)
+	assert upload.downloads == [] and upload.replies[0].startswith("Файл слишком большой")
+
+	monkeypatch.setattr(settings, "import_max_file_size", len(content))
+	upload = FakeUpload(content, "results.jsonl")
+	await import_results_file(upload, state, session)
+	# written to a temporary file, which is gone once the rows are in
+	assert not upload.downloads[0].exists()
+	assert upload.replies[0].startswith("Импортировано результатов: 2 (строк в файле: 2)")
+	assert len(await get_stored_discipline_leaderboard(session, comp.id, d3.id)) == 1
+
+
+@pytest.mark.asyncio
+async def test_rows_are_read_off_the_event_loop_and_id_0_is_an_id(session):
+	comp, d3, _ = await seed_import_competition(session, 3)
+	readers = set()
+
+	def records():
+		for number, record in enumerate(IMPORT_RECORDS + [
+			# not a missing id: the username is not used in its place
+			{"discipline": "3x3", "telegram_id": 0, "username": "cuber2", "attempts": ["0.10.00"] * 5},
+		], start=1):
+			readers.add(threading.current_thread())
+			yield number, record
+
+	report = await import_results(session, comp.id, records())
+	assert threading.main_thread() not in readers
+	assert (report.imported, report.errors) == (2, [(3, "участник 0 не зарегистрирован на соревнование")])
@@ -0,0 +1,72 @@
+from typing import List, Tuple
+
+import pytest
+from sqlalchemy import event
+
+from src.services.leaderboard_service import (
+	calculate_discipline_leaderboard,
+	calculate_overall_leaderboard,
+	get_discipline_leaderboard_page,
+	get_discipline_rank,
+	get_overall_leaderboard_page,
+)
+from tests.conftest import seed_competition, submit_result
+
+# Plans are checked on SQLite with EXPLAIN QUERY PLAN; the same indexes carry INCLUDE columns on PostgreSQL.
+
+
+async def _plans(session, call) -> List[Tuple[str, str]]:
+	# (statement, query plan) of every SELECT the call runs
+	statements = []
+
+	def capture(conn, cursor, statement, parameters, context, executemany):
+		if statement.lstrip().upper().startswith("SELECT") and not executemany:
+			statements.append((statement, parameters))
+
+	engine = session.bind.sync_engine
+	event.listen(engine, "before_cursor_execute", capture)
+	try:
+		await call()
+	finally:
+		event.remove(engine, "before_cursor_execute", capture)
+	conn = await session.connection()
+	plans = []
+	for statement, parameters in statements:
+		rows = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+		plans.append((statement, "\n".join(r[-1] for r in rows)))
+	return plans
+
+
+def _plan_for(plans: List[Tuple[str, str]], *fragments: str) -> str:
+	found = [plan for statement, plan in plans if all(f in statement for f in fragments)]
+	assert found, f"no statement with {fragments}"
+	return found[0]
+
+
+@pytest.mark.asyncio
+async def test_leaderboard_queries_use_composite_indexes(session):
+	comp, disc, participants = await seed_competition(session, 8)
+	for i, (user, participant) in enumerate(participants):
+		await submit_result(session, comp, disc, user, participant, [5000 + 10 * i] * 5)
+
+	plans = await _plans(session, lambda: calculate_discipline_leaderboard(session, comp.id, disc.id, store=False))
+	plan = _plan_for(plans, "FROM users JOIN results")
+	assert "SEARCH results USING COVERING INDEX ix_results_comp_disc_rank" in plan and "participants" not in plan
+
+	plans = await _plans(session, lambda: calculate_overall_leaderboard(session, comp.id, store=False))
+	plan = _plan_for(plans, "LEFT OUTER JOIN leaderboards")
+	assert "ix_leaderboards_comp_user" in plan and "SCAN leaderboards" not in plan
+
+	plans = await _plans(session, lambda: get_discipline_leaderboard_page(session, comp.id, disc.id, 1, 3))
+	plan = _plan_for(plans, "FROM leaderboards JOIN users", "LIMIT")
+	assert "ix_leaderboards_comp_disc_order" in plan and "TEMP B-TREE" not in plan
+
+	await calculate_overall_leaderboard(session, comp.id, store=True)
+	plans = await _plans(session, lambda: get_overall_leaderboard_page(session, comp.id, 1, 3))
+	plan = _plan_for(plans, "FROM overall_leaderboard JOIN users", "LIMIT")
+	assert "ix_overall_comp_position" in plan and "TEMP B-TREE" not in plan
+
+	user, _ = participants[5]
+	plans = await _plans(session, lambda: get_discipline_rank(session, comp.id, disc.id, user.id))
+	plan = _plan_for(plans, "count(*)")
+	assert plan == "SEARCH results USING COVERING INDEX ix_results_comp_disc_rank (competition_id=? AND discipline_id=? AND average_dnf=? AND (average_time,best_time,user_id)<(?,?,?))"
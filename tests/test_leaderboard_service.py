@@ -0,0 +1,162 @@
+import random
+
+import pytest
+
+from src.bot.keyboards.inline_keyboards import pagination_kb
+from src.database.crud import result as result_crud
+from src.services.calculation_service import calculate_average_ao5, get_best_time
+from src.services.leaderboard_service import (
+	calculate_discipline_leaderboard,
+	format_leaderboard_message,
+	get_discipline_leaderboard_page,
+	get_discipline_rank,
+	get_overall_leaderboard_page,
+	get_stored_discipline_leaderboard,
+	refresh_stale_leaderboards,
+)
+from src.services.rescoring_service import rescore_competition
+from tests.conftest import seed_competition, standing, submit_result
+
+
+@pytest.mark.asyncio
+async def test_incremental_matches_full_recompute(session):
+	rng = random.Random(42)
+	comp, disc, participants = await seed_competition(session, 12)
+	# unique attempt times keep the ordering free of ties
+	times = iter(rng.sample(range(5000, 60000), 1000))
+	for _ in range(60):
+		user, participant = rng.choice(participants)
+		attempts = [None if rng.random() < 0.15 else next(times) for _ in range(5)]
+		await submit_result(session, comp, disc, user, participant, attempts)
+		stored = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+		full = await calculate_discipline_leaderboard(session, comp.id, disc.id, store=False)
+		assert standing(stored) == standing(full)
+
+
+@pytest.mark.asyncio
+async def test_rank_query_matches_full_leaderboard(session):
+	rng = random.Random(7)
+	comp, disc, participants = await seed_competition(session, 30)
+	times = iter(rng.sample(range(5000, 60000), 200))
+	for user, participant in participants[:25]:
+		attempts = [None if rng.random() < 0.2 else next(times) for _ in range(5)]
+		await submit_result(session, comp, disc, user, participant, attempts)
+	full = await calculate_discipline_leaderboard(session, comp.id, disc.id, store=False)
+	positions = {it["user_id"]: it["position"] for it in full}
+	for user, _ in participants:
+		assert await get_discipline_rank(session, comp.id, disc.id, user.id) == positions.get(user.id)
+
+
+@pytest.mark.asyncio
+async def test_exact_ties_are_broken_by_user_id_everywhere(session):
+	comp, disc, participants = await seed_competition(session, 4)
+	(u1, p1), (u2, p2), (u3, p3), (u4, p4) = participants
+	# submitted in reverse: the incremental update must not place ties by arrival
+	await submit_result(session, comp, disc, u4, p4, [9000] * 5)
+	await submit_result(session, comp, disc, u3, p3, [7000, 7000, 7000, 7000, 6000])
+	await submit_result(session, comp, disc, u2, p2, [7000, 7000, 7000, 7000, 6000])
+	await submit_result(session, comp, disc, u1, p1, [7000, 7000, 7000, 7000, 6500])
+	# u2 and u3 tie exactly; u1 has the same average and a worse single
+	expected = {u2.id: 1, u3.id: 2, u1.id: 3, u4.id: 4}
+	stored = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+	assert {it["user_id"]: it["position"] for it in stored} == expected
+	full = await calculate_discipline_leaderboard(session, comp.id, disc.id, store=False)
+	assert standing(full) == standing(stored)
+	for user_id, position in expected.items():
+		assert await get_discipline_rank(session, comp.id, disc.id, user_id) == position
+
+
+@pytest.mark.asyncio
+async def test_stored_leaderboard_order(session):
+	comp, disc, participants = await seed_competition(session, 3)
+	(u1, p1), (u2, p2), (u3, p3) = participants
+	await submit_result(session, comp, disc, u1, p1, [9000, 9000, 9000, 9000, 9000])
+	await submit_result(session, comp, disc, u2, p2, [None, None, 5000, 5000, 5000])
+	await submit_result(session, comp, disc, u3, p3, [7000, 7000, 7000, 7000, 7000])
+	stored = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+	assert [it["user_id"] for it in stored] == [u3.id, u1.id, u2.id]
+	assert [(it["position"], it["points"]) for it in stored] == [(1, 2), (2, 1), (None, 0)]
+
+
+@pytest.mark.asyncio
+async def test_views_recompute_only_when_results_changed(session):
+	comp, disc, participants = await seed_competition(session, 2)
+	(u1, p1), (u2, p2) = participants
+	attempts = [8000, 8100, 8200, 8300, 8400]
+	average_ms, average_dnf = calculate_average_ao5(attempts)
+	# result written without touching the leaderboard (e.g. before incremental mode)
+	await result_crud.upsert_result(session, p1.id, disc.id, attempts, average_ms, average_dnf, 8000)
+
+	items, _ = await get_discipline_leaderboard_page(session, comp.id, disc.id, 0, 10)
+	assert [it["user_id"] for it in items] == [u1.id]
+	items, _ = await get_overall_leaderboard_page(session, comp.id, 0, 10)
+	assert [(it["user_id"], it["total_points"]) for it in items] == [(u1.id, 1), (u2.id, 0)]
+	assert not await refresh_stale_leaderboards(session, comp.id)
+
+	# the incremental update keeps the discipline table current; the overall table is stale
+	await submit_result(session, comp, disc, u2, p2, [7000, 7100, 7200, 7300, 7400])
+	items, _ = await get_discipline_leaderboard_page(session, comp.id, disc.id, 0, 10, recompute=False)
+	assert [it["user_id"] for it in items] == [u2.id, u1.id]
+	items, _ = await get_overall_leaderboard_page(session, comp.id, 0, 10)
+	assert [(it["user_id"], it["total_points"]) for it in items] == [(u2.id, 2), (u1.id, 1)]
+	assert not await refresh_stale_leaderboards(session, comp.id)
+
+
+@pytest.mark.asyncio
+async def test_overall_ties_share_position(session):
+	comp, disc, participants = await seed_competition(session, 3)
+	(u1, p1), (u2, p2), (u3, p3) = participants
+	await submit_result(session, comp, disc, u1, p1, [6000, 6000, 6000, 6000, 6000])
+	items, _ = await get_overall_leaderboard_page(session, comp.id, 0, 10)
+	# u2 and u3 have no results: both tie on 0 points
+	assert [(it["user_id"], it["position"], it["total_points"], it["disciplines_participated"]) for it in items] == [
+		(u1.id, 1, 1, 1),
+		(u2.id, 2, 0, 0),
+		(u3.id, 2, 0, 0),
+	]
+
+
+@pytest.mark.asyncio
+async def test_pages_read_only_the_requested_rows(session):
+	comp, disc, participants = await seed_competition(session, 7)
+	for i, (user, participant) in enumerate(participants):
+		attempts = [None] * 5 if i == 0 else [5000 + 100 * i] * 5
+		await result_crud.upsert_result(session, participant.id, disc.id, attempts, *calculate_average_ao5(attempts), get_best_time(attempts))
+
+	# the stale table is calculated on the first page view
+	first, total = await get_discipline_leaderboard_page(session, comp.id, disc.id, 0, 3)
+	assert total == 7
+	pages = [first] + [(await get_discipline_leaderboard_page(session, comp.id, disc.id, n, 3))[0] for n in (1, 2)]
+	assert [[it["position"] for it in page] for page in pages] == [[1, 2, 3], [4, 5, 6], [None]]
+	full = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+	assert [it for page in pages for it in page] == full
+	assert (await get_discipline_leaderboard_page(session, comp.id, disc.id, 3, 3)) == ([], 7)
+
+	overall, total = await get_overall_leaderboard_page(session, comp.id, 1, 4)
+	assert total == 7 and [it["position"] for it in overall] == [5, 6, 7]
+	assert format_leaderboard_message(first, 0, 3).startswith("Таблица лидеров: (страница 1 из 3)\n1. ")
+	assert format_leaderboard_message(first).startswith("Таблица лидеров:\n")
+
+
+def test_pagination_keyboard():
+	def buttons(page, pages):
+		return [(b.text, b.callback_data) for row in pagination_kb("lb:1:2", page, pages).export() for b in row]
+
+	assert buttons(0, 3) == [("Вперёд ▶️", "lb:1:2:1")]
+	assert buttons(1, 3) == [("◀️ Назад", "lb:1:2:0"), ("Вперёд ▶️", "lb:1:2:2")]
+	assert buttons(2, 3) == [("◀️ Назад", "lb:1:2:1")]
+	assert buttons(0, 1) == []
+
+
+@pytest.mark.asyncio
+async def test_rescore_competition_fixes_stored_averages(session):
+	comp, disc, participants = await seed_competition(session, 3)
+	for i, (user, participant) in enumerate(participants):
+		await submit_result(session, comp, disc, user, participant, [5000 + i, 6000, 7000, 8000, 9000 - i])
+	# a stale score, e.g. written under an older rule
+	(u1, p1) = participants[0]
+	await result_crud.upsert_result(session, p1.id, disc.id, [5000, 6000, 7000, 8000, 9000], 1, False, 1)
+	assert await rescore_competition(session, comp.id) == (1, [disc.id])
+	assert await rescore_competition(session, comp.id) == (0, [])
+	stored = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+	assert [(it["user_id"], it["average_time"]) for it in stored] == [(u.id, 7000) for u, _ in participants]
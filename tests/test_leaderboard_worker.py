@@ -0,0 +1,184 @@
+import asyncio
+import random
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database.crud import result as result_crud
+from src.database.models import Base
+from src.services.calculation_service import calculate_average_ao5, get_best_time
+from src.services.leaderboard_service import (
+	calculate_discipline_leaderboard,
+	get_overall_leaderboard_page,
+	get_stored_discipline_leaderboard,
+	refresh_stale_leaderboards,
+)
+from src.services.import_service import import_results
+from src.services.leaderboard_worker import LeaderboardWorker
+from tests.conftest import IMPORT_RECORDS, seed_competition, seed_import_competition, standing
+
+
+async def _sessionmaker(tmp_path):
+	# the worker opens its own sessions, so the database has to outlive one connection
+	engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'worker.db'}")
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.create_all)
+	return engine, async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+async def _write_result(session, participant, disc, attempts):
+	average_ms, average_dnf = calculate_average_ao5(attempts)
+	await result_crud.upsert_result(session, participant.id, disc.id, attempts, average_ms, average_dnf, get_best_time(attempts))
+	await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_a_burst_of_submissions_is_recalculated_a_handful_of_times(tmp_path):
+	engine, sessionmaker = await _sessionmaker(tmp_path)
+	async with sessionmaker() as session:
+		comp, disc, participants = await seed_competition(session, 20)
+		await session.commit()
+	worker = LeaderboardWorker()
+	worker.start(sessionmaker, interval=0.2)
+
+	rng = random.Random(3)
+	started = time.monotonic()
+	async with sessionmaker() as session:
+		for i in range(500):
+			_, participant = participants[i % len(participants)]
+			await _write_result(session, participant, disc, [rng.randint(5000, 20000) for _ in range(5)])
+			worker.mark_dirty(comp.id, disc.id)
+			await asyncio.sleep(0.002)
+	await worker.stop()
+	elapsed = time.monotonic() - started
+
+	assert worker.marks == 500
+	# one pass per interval while the burst lasts, plus the start sweep and the final pass on stop
+	assert worker.recalculations <= elapsed / 0.2 + 3
+	assert worker.recalculations < 50
+	async with sessionmaker() as session:
+		stored = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+		assert standing(stored) == standing(await calculate_discipline_leaderboard(session, comp.id, disc.id, store=False))
+		# the overall table was rebuilt too, no inline recalculation needed to read it
+		items, total = await get_overall_leaderboard_page(session, comp.id, 0, 50, recompute=False)
+		assert total == 20 and sum(it["total_points"] for it in items) > 0
+	await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_start_sweeps_tables_left_stale(tmp_path):
+	engine, sessionmaker = await _sessionmaker(tmp_path)
+	async with sessionmaker() as session:
+		comp, disc, participants = await seed_competition(session, 3)
+		await session.commit()
+		for i, (_, participant) in enumerate(participants):
+			await _write_result(session, participant, disc, [6000 + i * 100] * 5)
+	# results committed by a process that never got to recalculate
+	worker = LeaderboardWorker()
+	worker.start(sessionmaker, interval=0.2)
+	await asyncio.sleep(0.2)
+	assert worker.recalculations == 1
+	await worker.stop()
+	async with sessionmaker() as session:
+		stored = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+		assert [it["position"] for it in stored] == [1, 2, 3]
+	await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_imported_results_reach_the_worker_and_its_listeners(tmp_path):
+	engine, sessionmaker = await _sessionmaker(tmp_path)
+	async with sessionmaker() as session:
+		comp, d3, d6 = await seed_import_competition(session, 3)
+		# tables up to date, so the start sweep has nothing to push
+		await refresh_stale_leaderboards(session, comp.id)
+		await session.commit()
+	notified = []
+
+	async def listener(session, competition_id, discipline_ids):
+		notified.append((competition_id, sorted(discipline_ids)))
+
+	worker = LeaderboardWorker()
+	worker.start(sessionmaker, interval=0.2, listeners=[listener])
+	await asyncio.sleep(0.05)
+	async with sessionmaker() as session:
+		# what the import handler does while the worker runs
+		report = await import_results(session, comp.id, enumerate(IMPORT_RECORDS, start=1), recalculate=False)
+		assert await get_stored_discipline_leaderboard(session, comp.id, d3.id) == []
+		await session.commit()
+		for discipline_id in report.discipline_ids:
+			worker.mark_dirty(comp.id, discipline_id)
+	await worker.stop()
+
+	assert notified == [(comp.id, [d3.id, d6.id])]
+	async with sessionmaker() as session:
+		assert len(await get_stored_discipline_leaderboard(session, comp.id, d3.id)) == 1
+		assert len(await get_stored_discipline_leaderboard(session, comp.id, d6.id)) == 1
+	await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_a_slow_listener_does_not_hold_up_recalculation(tmp_path):
+	engine, sessionmaker = await _sessionmaker(tmp_path)
+	async with sessionmaker() as session:
+		comp, disc, participants = await seed_competition(session, 2)
+		await refresh_stale_leaderboards(session, comp.id)
+		await session.commit()
+	release = asyncio.Event()
+	calls = []
+
+	async def listener(session, competition_id, discipline_ids):
+		# e.g. thousands of /follow edits paced by the send scheduler
+		calls.append(sorted(discipline_ids))
+		await release.wait()
+
+	worker = LeaderboardWorker()
+	worker.start(sessionmaker, interval=0.05, listeners=[listener])
+	worker.mark_dirty(comp.id, disc.id)
+	await asyncio.sleep(0.2)
+	assert calls == [[disc.id]]
+	recalculated = worker.recalculations
+	for _ in range(3):
+		worker.mark_dirty(comp.id, disc.id)
+		await asyncio.sleep(0.1)
+	# the passes went on while the first push was still sending
+	assert worker.recalculations == recalculated + 3
+	release.set()
+	await worker.stop()
+	# and the passes made meanwhile were handed over in one more call
+	assert calls == [[disc.id], [disc.id]]
+	await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_a_polling_worker_picks_up_writes_from_other_processes(tmp_path):
+	engine, sessionmaker = await _sessionmaker(tmp_path)
+	async with sessionmaker() as session:
+		comp, disc, participants = await seed_competition(session, 2)
+		await refresh_stale_leaderboards(session, comp.id)
+		await session.commit()
+	notified = []
+
+	async def listener(session, competition_id, discipline_ids):
+		notified.append((competition_id, sorted(discipline_ids)))
+
+	worker = LeaderboardWorker()
+	worker.start(sessionmaker, interval=0.05, listeners=[listener], poll=True)
+	# another shard defers to this worker: its marks are dropped, the write is found by the poll
+	shard = LeaderboardWorker()
+	shard.defer_to_remote()
+	assert shard.active and not shard.running
+	async with sessionmaker() as session:
+		_, participant = participants[0]
+		await _write_result(session, participant, disc, [7000] * 5)
+		shard.mark_dirty(comp.id, disc.id)
+	assert shard.marks == 1 and worker.marks == 0
+	await asyncio.sleep(0.3)
+	await worker.stop()
+
+	assert notified == [(comp.id, [disc.id])]
+	async with sessionmaker() as session:
+		stored = await get_stored_discipline_leaderboard(session, comp.id, disc.id)
+		assert [it["position"] for it in stored] == [1]
+	await engine.dispose()
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.database import _engine_options
+from src.database.pool import InstrumentedPool, pool_metrics
+
+
+def test_pool_options_only_for_server_databases():
+	assert _engine_options("sqlite+aiosqlite://") == {}
+	options = _engine_options("postgresql+asyncpg://u:p@localhost/db")
+	assert options["poolclass"] is InstrumentedPool
+	assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping"} <= options.keys()
+	assert options["connect_args"] == {"prepared_statement_cache_size": 500}
+	assert "connect_args" not in _engine_options("postgresql+psycopg://u:p@localhost/db")
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics_record_waits_and_lifetime(tmp_path):
+	pool_metrics.reset()
+	engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedPool, pool_size=1, max_overflow=1)
+	release = asyncio.Event()
+
+	async def hold() -> None:
+		async with engine.connect() as conn:
+			await conn.execute(text("select 1"))
+			await release.wait()
+
+	holders = [asyncio.create_task(hold()) for _ in range(2)]
+	await asyncio.sleep(0.05)
+	assert pool_metrics.peak_overflow == 1
+
+	async def late() -> None:
+		# pool and overflow are both taken: this checkout has to wait
+		async with engine.connect() as conn:
+			await conn.execute(text("select 1"))
+
+	waiter = asyncio.create_task(late())
+	await asyncio.sleep(0.05)
+	release.set()
+	await asyncio.gather(waiter, *holders)
+	await engine.dispose()
+
+	stats = pool_metrics.stats()
+	assert stats["checkouts"] == 3
+	assert stats["waits"] == 1 and stats["max_wait"] >= 0.04
+	assert stats["timeouts"] == 0
+	assert stats["connects"] == 2
+	# the overflow connection closes on checkin, the pooled one on dispose
+	assert stats["closes"] == 2 and stats["max_lifetime"] > 0
@@ -0,0 +1,78 @@
+import pytest
+import pytest_asyncio
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from fakeredis.aioredis import FakeRedis
+
+from src.config.settings import settings
+from src.database.crud import competition as competition_crud
+from src.database.crud.cache import SharedCache, competition_cache
+from src.database.models import Competition, User
+from src.storage import redis_pool
+from src.storage.fsm_storage import create_fsm_storage
+
+
+@pytest_asyncio.fixture
+async def fake_redis(monkeypatch):
+	client = FakeRedis()
+	monkeypatch.setattr(settings, "redis_url", "redis://fake")
+	monkeypatch.setattr(redis_pool, "_redis", client)
+	yield client
+	await client.flushall()
+	await client.aclose()
+
+
+def test_memory_storage_without_redis_url(monkeypatch):
+	monkeypatch.setattr(settings, "redis_url", None)
+	assert isinstance(create_fsm_storage(), MemoryStorage)
+
+
+@pytest.mark.asyncio
+async def test_fsm_state_in_redis(fake_redis):
+	storage = create_fsm_storage()
+	assert isinstance(storage, RedisStorage)
+	key = StorageKey(bot_id=1, chat_id=42, user_id=42)
+	await storage.set_state(key, "ResultSubmissionStates:EnterResults")
+	await storage.set_data(key, {"code": "ABCD1234", "discipline_id": 3})
+	# a second storage on the same pool sees the same flow (restart / another process)
+	other = create_fsm_storage()
+	assert await other.get_state(key) == "ResultSubmissionStates:EnterResults"
+	assert await other.get_data(key) == {"code": "ABCD1234", "discipline_id": 3}
+
+
+@pytest.mark.asyncio
+async def test_lookup_cache_in_redis(fake_redis, session):
+	u = User(telegram_id=1, first_name="Org", last_name="Org", role="organizer")
+	session.add(u)
+	await session.flush()
+	comp = Competition(name="Shared", competition_code="SHARED01", organizer_id=u.id, status="active")
+	session.add(comp)
+	await session.commit()
+
+	await competition_crud.get_by_code(session, "SHARED01")
+	assert await fake_redis.exists("cache:competitions:SHARED01")
+	session.expunge_all()
+	cached = await competition_crud.get_by_code(session, "SHARED01")
+	assert (cached.id, cached.created_at) == (comp.id, comp.created_at)
+	assert competition_cache.hits == 1
+
+	await competition_crud.complete_competition(session, comp.id)
+	await session.commit()
+	await competition_crud.invalidate_cached(comp.id, comp.competition_code)
+	assert not await fake_redis.exists("cache:competitions:SHARED01")
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_roundtrip(fake_redis):
+	cache = SharedCache("roundtrip", 10, 60)
+	items = [{"user_id": 1, "position": None, "average_dnf": True}]
+	await cache.set(("discipline", 1, 2), items)
+	assert await cache.get(("discipline", 1, 2)) == items
+	await cache.invalidate(("discipline", 1, 2))
+	assert await cache.get(("discipline", 1, 2)) is None
+	assert cache.stats() == {"hits": 1, "misses": 1}
+	# what a finished load does: an entry set meanwhile is kept
+	await cache.set(("discipline", 1, 2), items)
+	await cache.set(("discipline", 1, 2), [], only_if_absent=True)
+	assert await cache.get(("discipline", 1, 2)) == items
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from src.bot.send_scheduler import BULK, SendScheduler, TokenBucket, send_priority
+
+
+class FakeBotAPI:
+	# Local stand-in for the Bot API server: records every sendMessage and can answer 429 first
+	def __init__(self) -> None:
+		self.sent: list[tuple[int, float]] = []
+		self.flood: dict[int, int] = {}
+
+	async def handle(self, request: web.Request) -> web.Response:
+		form = await request.post()
+		chat_id = int(form["chat_id"])
+		if self.flood.get(chat_id):
+			self.flood[chat_id] -= 1
+			return web.json_response({
+				"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+				"parameters": {"retry_after": 1},
+			}, status=429)
+		self.sent.append((chat_id, time.monotonic()))
+		return web.json_response({"ok": True, "result": {
+			"message_id": len(self.sent), "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": form["text"],
+		}})
+
+
+@pytest_asyncio.fixture
+async def api():
+	fake = FakeBotAPI()
+	app = web.Application()
+	app.router.add_post("/bot{token}/{method}", fake.handle)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	site = web.TCPSite(runner, "127.0.0.1", 0)
+	await site.start()
+	fake.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+	yield fake
+	await runner.cleanup()
+
+
+async def _bot(api: FakeBotAPI, scheduler: SendScheduler) -> Bot:
+	bot = Bot(token="123456:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+	bot.session.middleware(scheduler)
+	return bot
+
+
+def test_token_bucket_burst_then_rate():
+	bucket = TokenBucket(rate=10, burst=2)
+	now = bucket.updated
+	for _ in range(2):
+		assert bucket.delay(now) == 0
+		bucket.take()
+	assert bucket.delay(now) == pytest.approx(0.1)
+	assert bucket.delay(now + 0.11) == 0
+	bucket.pause(5, now + 0.11)
+	assert bucket.delay(now + 0.11) == pytest.approx(5)
+
+
+@pytest.mark.asyncio
+async def test_interactive_sends_overtake_queued_bulk_sends(api):
+	scheduler = SendScheduler(rate=20, burst=1, chat_rate=100, chat_burst=100)
+	bot = await _bot(api, scheduler)
+	with send_priority(BULK):
+		bulk = [asyncio.create_task(bot.send_message(chat, "digest")) for chat in (1, 2, 3, 4)]
+	await asyncio.sleep(0.01)
+	replies = [asyncio.create_task(bot.send_message(chat, "reply")) for chat in (5, 6)]
+	await asyncio.gather(*bulk, *replies)
+	await bot.session.close()
+
+	assert [chat for chat, _ in api.sent] == [1, 5, 6, 2, 3, 4]
+	gaps = [b - a for (_, a), (_, b) in zip(api.sent, api.sent[1:])]
+	assert min(gaps) >= 0.04
+	stats = scheduler.stats()
+	assert stats["queued"] == 0 and stats["sent"] == 6 and stats["peak_queued"] >= 3
+	assert stats["p99"] >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_a_busy_chat_does_not_hold_up_other_chats(api):
+	scheduler = SendScheduler(rate=1000, chat_rate=10, chat_burst=1)
+	bot = await _bot(api, scheduler)
+	await asyncio.gather(*(bot.send_message(chat, "x") for chat in (1, 1, 1, 2)))
+	await bot.session.close()
+
+	assert [chat for chat, _ in api.sent] == [1, 2, 1, 1]
+	first = [at for chat, at in api.sent if chat == 1]
+	assert first[1] - first[0] >= 0.09 and first[2] - first[1] >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_only_that_chat_and_retries(api):
+	api.flood[7] = 1
+	scheduler = SendScheduler(rate=1000, chat_rate=100)
+	bot = await _bot(api, scheduler)
+	started = time.monotonic()
+	flooded = asyncio.create_task(bot.send_message(7, "x"))
+	await asyncio.sleep(0.1)
+	message = await bot.send_message(8, "y")
+	assert message.chat.id == 8 and time.monotonic() - started < 0.5
+	assert (await flooded).chat.id == 7
+	await bot.session.close()
+
+	assert time.monotonic() - started >= 1
+	assert scheduler.stats()["retries"] == 1
+	assert [chat for chat, _ in api.sent] == [8, 7]
@@ -0,0 +1,88 @@
+import pytest
+import pytest_asyncio
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import Command
+from aiogram.types import Message, Update
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.bot.middlewares.db_session import DbSessionMiddleware, after_commit
+from src.database.models import Base, User
+
+
+class CountingSessionmaker:
+	def __init__(self, sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+		self.sessionmaker = sessionmaker
+		self.opened = 0
+
+	def __call__(self) -> AsyncSession:
+		self.opened += 1
+		return self.sessionmaker()
+
+
+@pytest_asyncio.fixture
+async def sessionmaker(tmp_path):
+	engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}")
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.create_all)
+	yield CountingSessionmaker(async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession))
+	await engine.dispose()
+
+
+def _command(text: str, update_id: int = 1) -> Update:
+	return Update.model_validate({
+		"update_id": update_id,
+		"message": {
+			"message_id": update_id,
+			"date": 0,
+			"chat": {"id": 7, "type": "private"},
+			"from": {"id": 7, "is_bot": False, "first_name": "T"},
+			"text": text,
+		},
+	})
+
+
+@pytest.mark.asyncio
+async def test_one_session_per_update_committed_once(sessionmaker):
+	events = []
+	router = Router()
+
+	@router.message(Command("ping"))
+	async def ping(message: Message) -> None:
+		events.append("ping")
+
+	@router.message(Command("join"))
+	async def join(message: Message, session: AsyncSession) -> None:
+		session.add(User(telegram_id=message.from_user.id, first_name="T", last_name="T"))
+		after_commit(session, _record(events, "after_commit"))
+
+	@router.message(Command("fail"))
+	async def fail(message: Message, session: AsyncSession) -> None:
+		session.add(User(telegram_id=99, first_name="F", last_name="F"))
+		after_commit(session, _record(events, "never"))
+		await session.flush()
+		raise RuntimeError("boom")
+
+	dp = Dispatcher()
+	dp.message.middleware(DbSessionMiddleware(sessionmaker))
+	dp.include_router(router)
+	bot = Bot(token="123456:TEST")
+
+	await dp.feed_update(bot, _command("/ping"))
+	assert sessionmaker.opened == 0
+
+	await dp.feed_update(bot, _command("/join", 2))
+	assert sessionmaker.opened == 1
+	with pytest.raises(RuntimeError):
+		await dp.feed_update(bot, _command("/fail", 3))
+	await bot.session.close()
+
+	assert events == ["ping", "after_commit"]
+	async with sessionmaker() as session:
+		assert await session.scalar(select(func.count()).select_from(User)) == 1
+
+
+def _record(events, name):
+	async def callback() -> None:
+		events.append(name)
+	return callback
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import select
+
+from src.database.crud import result as result_crud
+from src.database.models import Result
+from src.database.types import pack_attempts, unpack_attempts
+from tests.conftest import seed_competition
+
+
+def test_pack_round_trip():
+	attempts = [0, 8123, None, 599990, None]
+	raw = pack_attempts(attempts)
+	assert len(raw) == 4 * len(attempts)
+	assert raw[8:12] == b"\xff\xff\xff\xff"
+	assert unpack_attempts(raw) == attempts
+	assert unpack_attempts(pack_attempts([])) == []
+
+
+@pytest.mark.asyncio
+async def test_attempts_column_keeps_the_format_length(session):
+	comp, disc, participants = await seed_competition(session, 2)
+	(_, p1), (_, p2) = participants
+	await result_crud.upsert_result(session, p1.id, disc.id, [7000, None, 8000], 7500, False, 7000)
+	# a longer format needs no schema change
+	await result_crud.upsert_result(session, p2.id, disc.id, list(range(1000, 11000, 1000)), 5500, False, 1000)
+	await session.commit()
+	session.expunge_all()
+	rows = (await session.execute(select(Result.participant_id, Result.attempts).order_by(Result.participant_id))).all()
+	assert [tuple(r) for r in rows] == [(p1.id, [7000, None, 8000]), (p2.id, list(range(1000, 11000, 1000)))]
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+from aiohttp import ClientSession, web
+
+from src.bot.update_pool import UpdatePool, update_chat_id
+from src.bot.webhook import SECRET_HEADER, WebhookServer
+from src.bot.workers import ProcessFanout
+
+
+def _update(update_id: int, chat_id: int, text: str) -> dict:
+	return {
+		"update_id": update_id,
+		"message": {
+			"message_id": update_id,
+			"date": 0,
+			"chat": {"id": chat_id, "type": "private"},
+			"from": {"id": chat_id, "is_bot": False, "first_name": "T"},
+			"text": text,
+		},
+	}
+
+
+def test_update_chat_id():
+	assert update_chat_id(_update(1, 77, "x")) == 77
+	callback = {"update_id": 2, "callback_query": {"id": "1", "from": {"id": 5}, "message": {"chat": {"id": -100}}}}
+	assert update_chat_id(callback) == -100
+	assert update_chat_id({"update_id": 3, "inline_query": {"id": "1", "from": {"id": 9}}}) == 9
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_chat_are_handled_in_order():
+	seen: dict[int, list[str]] = {}
+	router = Router()
+
+	@router.message()
+	async def record(message: Message) -> None:
+		# later updates of the same chat would overtake this one if run concurrently
+		await asyncio.sleep(0.01 if message.text == "0" else 0)
+		seen.setdefault(message.chat.id, []).append(message.text)
+
+	dp = Dispatcher()
+	dp.include_router(router)
+	bot = Bot(token="123456:TEST")
+	pool = UpdatePool(dp, bot, workers=4)
+	app = web.Application()
+	WebhookServer(pool, secret_token="s3cret").setup(app, "/webhook", dp, bot)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	site = web.TCPSite(runner, "127.0.0.1", 0)
+	await site.start()
+	port = site._server.sockets[0].getsockname()[1]
+	url = f"http://127.0.0.1:{port}/webhook"
+	async with ClientSession() as client:
+		async with client.post(url, json=_update(1, 1, "x")) as resp:
+			assert resp.status == 401
+		for i in range(5):
+			for chat in (1, 2, 3):
+				async with client.post(url, json=_update(i * 10 + chat, chat, str(i)), headers={SECRET_HEADER: "s3cret"}) as resp:
+					assert resp.status == 200
+	# shutdown drains everything that was acknowledged
+	await runner.cleanup()
+	await bot.session.close()
+	assert seen == {chat: ["0", "1", "2", "3", "4"] for chat in (1, 2, 3)}
+	assert pool.stats()["processed"] == 15
+
+
+def test_process_fanout_keeps_a_chat_on_one_shard():
+	fanout = ProcessFanout(processes=3, update_workers=1)
+	for i in range(30):
+		# the shape poll_updates forwards
+		fanout.submit(Update.model_validate(_update(i, i % 6, "x")).model_dump(mode="json", by_alias=True, exclude_none=True))
+	shards = []
+	for queue in fanout.queues:
+		chats = set()
+		for _ in range(10):
+			update = queue.get(timeout=1)
+			assert Update.model_validate(update).message.chat.id == update_chat_id(update)
+			chats.add(update_chat_id(update))
+		shards.append(chats)
+	assert sorted(c for chats in shards for c in chats) == list(range(6))